@@ -185,7 +185,10 @@ const handleSaveWorkflow = async () => {
   }))
 
   try {
-    await saveGraph( ruleName, transformedNodes, transformedEdges)
+    const result = await saveGraph(
+      ruleName, transformedNodes, transformedEdges, currentRuleId
+    )
+    setCurrentRuleId(result.rule_engine_id)
 
     alert("Workflow saved")
 
@@ -8,9 +8,15 @@ export async function loadGraph(ruleEngineId) {
   return ret;
 }
 
-export async function saveGraph(ruleName, nodes, edges) {
-  const response = await fetch("http://127.0.0.1:8000/rule_engine/rules/save/", {
-    method: "POST",
+// Saving a loaded rule updates it in place, keeping its id and its
+// incremental state
+export async function saveGraph(ruleName, nodes, edges, ruleId = null) {
+  const url = ruleId
+    ? `http://127.0.0.1:8000/rule_engine/rules/${ruleId}/`
+    : "http://127.0.0.1:8000/rule_engine/rules/save/"
+
+  const response = await fetch(url, {
+    method: ruleId ? "PUT" : "POST",
     headers: {
       "Content-Type": "application/json",
     },
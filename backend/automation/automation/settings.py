@@ -102,6 +102,20 @@ DATABASES = {
 }
 
 
+# Cache
+# The rule engine keeps cross-worker state here: plan revisions (see
+# RULE_ENGINE_PLAN_CACHE_SIZE) and the function catalog. It must be shared
+# by every worker process - the default local-memory cache is per process,
+# so an edit or delete in one worker would go unnoticed by the others. The
+# database cache needs no extra service; its table is created by
+# `python manage.py migrate`. Redis or Memcached work as well.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': 'rule_engine_cache',
+    }
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/6.0/ref/settings/#auth-password-validators
@@ -148,3 +162,81 @@ CORS_ALLOWED_ORIGINS = [
 ]
 
 CORS_ALLOW_CREDENTIALS = True
+
+# Rule engine
+# Number of compiled rule graphs kept in each worker's execution plan cache;
+# edits and deletes reach the other workers through a revision kept in
+# the Django cache, which must be shared between them (see CACHES)
+RULE_ENGINE_PLAN_CACHE_SIZE = 128
+# "sequential" walks the graph breadth-first; "dag" runs independent
+# branches concurrently on the worker pool below; "dataflow" runs like
+# "dag" but binds each node only to its upstream outputs (see
+# RuleEdge.mapping) and frees them once no node needs them
+RULE_ENGINE_EXECUTION_MODE = "sequential"
+# "thread" or "process"
+RULE_ENGINE_POOL = "thread"
+RULE_ENGINE_MAX_WORKERS = 4
+# With the process pool, ClaimBatch arguments of at least this many rows
+# are passed to workers through shared memory files instead of pickles
+RULE_ENGINE_SHARED_MEMORY = True
+RULE_ENGINE_SHARED_MIN_ROWS = 10000
+# Chunk-safe nodes are split across workers, one partition per this many
+# rows (at most one per worker)
+RULE_ENGINE_PARTITION_ROWS = 100000
+# Directory of the shared files; /dev/shm when None and available
+RULE_ENGINE_SHARED_DIR = None
+# In dataflow mode, run connected chunk-safe nodes as one segment per
+# partition of their list input (same row and worker limits), concatenating
+# the outputs; scales with cores on the process pool. ?partition=1 per run
+RULE_ENGINE_PARTITIONED = False
+# Inputs per work item when /execute_batch/ fans out over the pool
+RULE_ENGINE_BATCH_CHUNK_SIZE = 100
+# Stream list outputs through chunk-safe nodes in fixed-size chunks, computed
+# lazily and once per chunk; a stream buffers its chunks while it is still
+# referenced (overridable per request with ?stream=1)
+RULE_ENGINE_STREAMING = False
+RULE_ENGINE_STREAM_CHUNK_SIZE = 10000
+# Execution log detail: "none", "summary", "diff" or "full"
+# (overridable per request with ?trace=)
+RULE_ENGINE_TRACE_LEVEL = "diff"
+# Seconds the function palette stays in the cache; it is also invalidated
+# whenever registration changes the catalog. The invalidation reaches
+# every worker through the shared cache (see CACHES).
+RULE_ENGINE_CATALOG_CACHE_TIMEOUT = 300
+# Packages scanned for @register_function (modules are imported lazily)
+RULE_ENGINE_FUNCTION_PACKAGES = ["rule_engine.functions"]
+# Optional prebuilt function index; when the file exists it replaces the
+# package scan at startup (`manage.py build_function_manifest`)
+RULE_ENGINE_FUNCTION_MANIFEST = None
+# Asynchronous execution jobs: worker threads per process, and the longest
+# a GET /jobs/<id>/?wait= long-poll may block
+RULE_ENGINE_JOB_WORKERS = 2
+RULE_ENGINE_JOB_MAX_WAIT = 30
+RULE_ENGINE_JOB_POLL_INTERVAL = 0.5
+# Seconds after which a job still "running" is failed by run_rule_jobs
+# (its worker is assumed dead); None disables
+RULE_ENGINE_JOB_TIMEOUT = 3600
+# Memoized results of pure functions (register_function(pure=True)):
+# LRU bounded by entries and pickled bytes; TTL in seconds (None = no expiry)
+RULE_ENGINE_MEMO_MAX_ENTRIES = 1024
+RULE_ENGINE_MEMO_MAX_BYTES = 256 * 1024 * 1024
+RULE_ENGINE_MEMO_TTL = None
+# Reuse persisted node outputs of the rule's last run and only execute nodes
+# whose function, params or inputs changed (overridable with ?incremental=1)
+RULE_ENGINE_INCREMENTAL = False
+# Aggregate per-node timings and row counts into the histograms served by
+# /rule_engine/metrics/, and trace allocated memory per node (slower; also
+# per request with ?memory=1)
+RULE_ENGINE_METRICS = True
+RULE_ENGINE_PROFILE_MEMORY = False
+# Sampling interval (seconds) of ?profile=1 executions, and an optional
+# directory where their collapsed-stack profiles are also written
+RULE_ENGINE_PROFILE_INTERVAL = 0.005
+RULE_ENGINE_PROFILE_DIR = None
+# Record executions (run and per-node metrics) for /rule_engine/runs/. Each
+# recorded run costs a transaction with two INSERTs at the end of the
+# execution, so it is off by default (overridable per request with
+# ?history=1); `manage.py prune_rule_runs` rolls up and deletes runs older
+# than the retention period
+RULE_ENGINE_RUN_HISTORY = False
+RULE_ENGINE_RUN_RETENTION_DAYS = 30
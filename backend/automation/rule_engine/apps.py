@@ -1,4 +1,5 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
 
 
 class RuleEngineConfig(AppConfig):
@@ -7,5 +8,19 @@ class RuleEngineConfig(AppConfig):
 
     def ready(self):
 
-        # This forces function registration
-        import rule_engine.functions
+        # Index function modules without importing them; each module is
+        # loaded the first time one of its functions is executed
+        from rule_engine.discovery import load_function_index
+
+        load_function_index()
+
+        # The database catalog is synced once after migrations rather than
+        # on every worker boot; see also `manage.py sync_functions`
+        post_migrate.connect(_sync_functions, sender=self)
+
+
+def _sync_functions(sender, **kwargs):
+
+    from rule_engine.registry import sync_function_registry
+
+    sync_function_registry()
@@ -0,0 +1,141 @@
+import asyncio
+import time
+from collections import deque
+from functools import partial
+
+from asgiref.sync import sync_to_async
+
+from .executor import GraphRuleExecutor, stream_chunk_size
+from .metrics import row_counts
+from .plan import get_plan
+from .pools import get_pool
+from .streaming import StreamUsage, materialized, stream_outputs
+
+
+class AsyncGraphRuleExecutor(GraphRuleExecutor):
+
+    # Asyncio flavour of GraphRuleExecutor for ASGI views. async def
+    # functions are awaited on the running loop, plain functions run on a
+    # thread pool, and in dag mode every node starts as soon as its
+    # upstream nodes have finished, so one process can interleave many
+    # I/O-bound executions. Incremental re-execution and partitioned
+    # segments are not available here; they run on the sync executor.
+
+    async def execute_async(self):
+
+        plan = self.plan or await sync_to_async(get_plan)(
+            self.rule_engine_id
+        )
+
+        self.check_mode(plan)
+
+        run = self.start_run(plan)
+        self.shared = self.start_shared()
+
+        try:
+            if self.mode in ("dag", "dataflow"):
+                await self.execute_dag_async(plan)
+            else:
+                await self.execute_sequential_async(plan)
+
+            # Draining runs the remaining chunks of sync functions
+            await sync_to_async(self.finish_streams)()
+        except Exception as exc:
+            await sync_to_async(self.finish_run)(run, exc)
+            raise
+        finally:
+            self.stop_shared()
+
+        await sync_to_async(self.finish_run)(run)
+
+        return self.execution_log
+
+    async def execute_sequential_async(self, plan):
+
+        queue = deque(plan.start_nodes)
+
+        while queue:
+
+            node = queue.popleft()
+
+            result = await self.call_node_async(node)
+
+            self.record_result(node, result)
+
+            for edge in plan.adjacency.get(node.id, ()):
+
+                if self.evaluate_condition(edge.condition):
+                    queue.append(edge.target)
+
+        return self.execution_log
+
+    async def execute_dag_async(self, plan):
+
+        pending, activated, plan_order = self.start_dag(plan)
+
+        ready = list(plan.start_nodes)
+
+        # task -> node
+        running = {}
+
+        # Results are committed in plan order, as in execute_dag
+        started = {node.id: node for node in ready}
+        done = {}
+
+        try:
+            while ready or running:
+
+                for node in ready:
+                    running[asyncio.ensure_future(
+                        self.call_node_async(node)
+                    )] = node
+
+                finished, _ = await asyncio.wait(
+                    running, return_when=asyncio.FIRST_COMPLETED
+                )
+
+                for task in finished:
+                    node = running.pop(task)
+                    done[node.id] = (node, task.result())
+
+                ready = self.commit_finished(
+                    plan, started, done, pending, activated, plan_order
+                )
+        finally:
+            for task in running:
+                task.cancel()
+
+        return self.execution_log
+
+    async def call_node_async(self, node):
+
+        kwargs = self.bind_arguments(node)
+
+        if node.meta.is_async:
+
+            # Coroutines are not chunked: in streaming mode they get
+            # lists, and their list outputs are streamed on
+            arguments = materialized(kwargs) if self.streaming else kwargs
+
+            # CPU time is not attributable to a coroutine sharing the loop
+            wall = time.perf_counter()
+            result = await node.function(**arguments)
+
+            profile = {
+                "input_rows": row_counts(kwargs, exclude=("context",)),
+                "wall_ms": round((time.perf_counter() - wall) * 1000, 3)
+            }
+
+            if self.streaming:
+                usage = StreamUsage()
+                result = stream_outputs(result, stream_chunk_size(), usage)
+                self.streamed.append((result, profile, usage))
+
+            return self.profiled(node, result, profile)
+
+        loop = asyncio.get_running_loop()
+
+        return await loop.run_in_executor(
+            get_pool("thread", self.max_workers, name="async"),
+            partial(self.call_node, node, kwargs)
+        )
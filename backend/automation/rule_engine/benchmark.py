@@ -0,0 +1,376 @@
+import copy
+import platform
+import random
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+import django
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from .executor import GraphRuleExecutor
+from .memo import get_result_cache
+from .models import RuleEdge, RuleEngine, RuleList, RuleLogic
+from .plan import get_plan, invalidate_plan
+from .registry import (
+    get_all_functions, get_function_meta, sync_function_registry
+)
+from .utils import percentile
+
+
+# Synthetic benchmarks for the rule engine (see `manage.py benchmark_rules`).
+# Graphs are generated from the claim validation functions and stored as
+# rules for the duration of a benchmark, so runs load their plan through
+# get_plan like executed rules do: once cold (plan invalidated before each
+# run, so it is compiled from the database) and once warm (cached plan).
+# Every node reads the same synthetic "claims" list.
+
+GRAPH_SHAPES = ("chain", "fanout", "diamond")
+
+GRAPH_FUNCTIONS = (
+    "validate_required_fields",
+    "validate_claim_amount_range",
+    "filter_claims_by_status",
+    "calculate_claim_tax",
+    "auto_approve_claims",
+    "deduplicate_claims",
+)
+
+BENCHMARK_MODULE = "rule_engine.functions.validation"
+
+# Arguments by parameter name; list parameters not listed here receive the
+# claims dataset
+BENCHMARK_PARAMS = {
+    "required_fields": ["id", "amount", "status"],
+    "min_amount": 100,
+    "max_amount": 5000,
+    "unique_field": "id",
+    "allowed_status": ["open", "pending"],
+    "tax_rate": 0.18,
+    "approval_threshold": 1000,
+}
+
+CLAIM_STATUSES = ("open", "pending", "approved", "rejected")
+
+
+def generate_claims(rows, seed=0, duplicate_ratio=0.05, missing_ratio=0.02):
+
+    rng = random.Random(seed)
+
+    claims = []
+
+    for index in range(rows):
+
+        claim_id = index + 1
+
+        if index and rng.random() < duplicate_ratio:
+            claim_id = rng.randint(1, index)
+
+        claim = {
+            "id": claim_id,
+            "client_id": rng.randint(1, 50),
+            "amount": round(rng.uniform(10, 10000), 2),
+            "status": rng.choice(CLAIM_STATUSES)
+        }
+
+        if rng.random() < missing_ratio:
+            del claim[rng.choice(("amount", "status"))]
+
+        claims.append(claim)
+
+    return claims
+
+
+def generate_graph(shape, size):
+
+    # (node_specs, edges) in the format of build_plan, with 1-based ids
+    if shape not in GRAPH_SHAPES:
+        raise ValueError(
+            f"Unknown graph shape '{shape}', "
+            f"expected one of {list(GRAPH_SHAPES)}"
+        )
+
+    node_specs = []
+
+    for node_id in range(1, size + 1):
+
+        function_name = GRAPH_FUNCTIONS[(node_id - 1) % len(GRAPH_FUNCTIONS)]
+
+        node_specs.append((
+            node_id,
+            function_name,
+            _benchmark_params(get_function_meta(function_name))
+        ))
+
+    if shape == "chain":
+        edges = [
+            (node_id, node_id + 1, None, None) for node_id in range(1, size)
+        ]
+
+    elif shape == "fanout":
+        edges = [(1, node_id, None, None) for node_id in range(2, size + 1)]
+
+    else:
+        # source -> every middle node -> sink
+        middle = range(2, size)
+        edges = [(1, node_id, None, None) for node_id in middle] + [
+            (node_id, size, None, None) for node_id in middle
+        ]
+
+    return node_specs, edges
+
+
+def save_graph(shape, size):
+
+    # Stores a generated graph as a rule; returns its id
+    node_specs, edges = generate_graph(shape, size)
+
+    sync_function_registry()
+
+    rule_logic_map = {}
+
+    for rule_logic in RuleLogic.objects.filter(
+        function_name__in=GRAPH_FUNCTIONS
+    ).order_by("id"):
+        rule_logic_map.setdefault(rule_logic.function_name, rule_logic)
+
+    with transaction.atomic():
+
+        rule_engine = RuleEngine.objects.create(
+            rule_name=f"benchmark-{shape}-{size}"
+        )
+
+        rule_nodes = RuleList.objects.bulk_create([
+            RuleList(
+                rule_engine=rule_engine,
+                rule_logic=rule_logic_map[function_name],
+                rule_function_order=index,
+                params=params
+            )
+            for index, (_, function_name, params) in enumerate(node_specs)
+        ])
+
+        # Backends that cannot return ids from a bulk insert
+        if any(rule_node.pk is None for rule_node in rule_nodes):
+            rule_nodes = list(
+                RuleList.objects.filter(rule_engine=rule_engine)
+            )
+
+        node_map = {
+            node_id: rule_node
+            for (node_id, _, _), rule_node in zip(node_specs, rule_nodes)
+        }
+
+        RuleEdge.objects.bulk_create([
+            RuleEdge(
+                rule_engine=rule_engine,
+                source=node_map[source],
+                target=node_map[target],
+                condition=condition,
+                mapping=mapping
+            )
+            for source, target, condition, mapping in edges
+        ])
+
+    return rule_engine.id
+
+
+def benchmark_graph(shape, size, claims, mode="sequential", repeat=5):
+
+    # [cold result, warm result]; the stored rule is deleted afterwards
+    rule_id = save_graph(shape, size)
+
+    def run(claims):
+
+        GraphRuleExecutor(
+            rule_id,
+            plan=get_plan(rule_id),
+            mode=mode,
+            context={"claims": claims},
+            trace="none",
+            incremental=False,
+            history=False
+        ).execute()
+
+    def cold_setup():
+
+        # Outside the timed region: only loading the plan is measured
+        invalidate_plan(rule_id)
+
+        return copy.deepcopy(claims)
+
+    try:
+        results = [
+            ("cold", measure(run, cold_setup, repeat)),
+            ("warm", measure(run, lambda: copy.deepcopy(claims), repeat)),
+        ]
+    finally:
+        RuleEngine.objects.filter(id=rule_id).delete()
+        invalidate_plan(rule_id)
+
+    return [
+        {
+            "kind": "graph",
+            "name": shape,
+            "nodes": size,
+            "rows": len(claims),
+            "mode": mode,
+            "plan": plan,
+            **stats,
+            "rows_per_s": _rate(len(claims), stats["mean_s"]),
+            "node_rows_per_s": _rate(len(claims) * size, stats["mean_s"])
+        }
+        for plan, stats in results
+    ]
+
+
+def benchmark_function(function_name, claims, repeat=5):
+
+    meta = get_function_meta(function_name)
+    meta.load()
+
+    def arguments():
+
+        kwargs = {
+            name: copy.deepcopy(claims)
+            for name in meta.parameters
+            if name not in BENCHMARK_PARAMS
+        }
+        kwargs.update(copy.deepcopy(_benchmark_params(meta)))
+
+        return kwargs
+
+    stats = measure(lambda kwargs: meta.func(**kwargs), arguments, repeat)
+
+    return {
+        "kind": "function",
+        "name": function_name,
+        "nodes": 1,
+        "rows": len(claims),
+        "mode": None,
+        **stats,
+        "rows_per_s": _rate(len(claims), stats["mean_s"])
+    }
+
+
+def benchmark_functions(module=BENCHMARK_MODULE):
+
+    return sorted(
+        name for name, meta in get_all_functions().items()
+        if meta.module == module
+    )
+
+
+def measure(run, setup, repeat=5):
+
+    # One warm-up run, `repeat` timed runs (memo cleared before each) with
+    # SQL queries captured, then one run under tracemalloc for peak memory.
+    # setup() builds the argument of each run outside the measurement, so
+    # every run gets fresh inputs that earlier runs cannot have modified.
+    run(setup())
+
+    timings = []
+
+    with CaptureQueriesContext(connection) as queries:
+
+        for _ in range(repeat):
+
+            get_result_cache().clear()
+            argument = setup()
+
+            start = time.perf_counter()
+            run(argument)
+            timings.append(time.perf_counter() - start)
+
+    get_result_cache().clear()
+    argument = setup()
+
+    tracemalloc.start()
+
+    try:
+        run(argument)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    timings.sort()
+
+    return {
+        "repeat": repeat,
+        "mean_s": sum(timings) / len(timings),
+        "min_s": timings[0],
+        "p50_s": percentile(timings, 50),
+        "p95_s": percentile(timings, 95),
+        "p99_s": percentile(timings, 99),
+        "max_s": timings[-1],
+        "queries": len(queries) / repeat,
+        "peak_memory_bytes": peak
+    }
+
+
+def build_report(results):
+
+    return {
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "django": django.get_version(),
+        "platform": platform.platform(),
+        "results": results
+    }
+
+
+def compare_reports(baseline, current):
+
+    # [(result key, baseline mean, current mean, relative change)] for
+    # results present in both reports
+    previous = {result_key(result): result for result in baseline["results"]}
+
+    changes = []
+
+    for result in current["results"]:
+
+        before = previous.get(result_key(result))
+
+        if before is None or not before["mean_s"]:
+            continue
+
+        changes.append((
+            result_key(result),
+            before["mean_s"],
+            result["mean_s"],
+            result["mean_s"] / before["mean_s"] - 1
+        ))
+
+    return changes
+
+
+def result_key(result):
+
+    return "/".join(
+        str(part) for part in (
+            result["kind"],
+            result["name"],
+            result["nodes"],
+            result["rows"],
+            result["mode"],
+            result.get("plan")
+        )
+        if part is not None
+    )
+
+
+def _benchmark_params(meta):
+
+    meta.load()
+
+    return {
+        name: BENCHMARK_PARAMS[name]
+        for name in meta.parameters
+        if name in BENCHMARK_PARAMS
+    }
+
+
+def _rate(count, seconds):
+
+    return count / seconds if seconds else None
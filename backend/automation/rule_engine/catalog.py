@@ -0,0 +1,75 @@
+import hashlib
+import json
+
+from django.conf import settings
+from django.core.cache import cache
+
+from rule_engine.models import RuleLogic, ParamModel
+
+
+# Function palette served by the discover_functions endpoint. Built with two
+# queries, kept in the Django cache and invalidated by the registry whenever
+# the stored catalog actually changes.
+
+CATALOG_CACHE_KEY = "rule_engine:function_catalog"
+
+
+def get_function_catalog():
+
+    # Returns (payload, etag)
+    catalog = cache.get(CATALOG_CACHE_KEY)
+
+    if catalog is None:
+
+        catalog = _build_function_catalog()
+
+        cache.set(
+            CATALOG_CACHE_KEY,
+            catalog,
+            getattr(settings, "RULE_ENGINE_CATALOG_CACHE_TIMEOUT", 300)
+        )
+
+    return catalog
+
+
+def invalidate_function_catalog():
+
+    cache.delete(CATALOG_CACHE_KEY)
+
+
+def _build_function_catalog():
+
+    functions = list(RuleLogic.objects.order_by("id"))
+
+    group_ids = {
+        group_id
+        for function in functions
+        for group_id in (function.input_params, function.output_params)
+        if group_id
+    }
+
+    groups = {}
+
+    for param in ParamModel.objects.filter(
+        parameter_group_id__in=group_ids
+    ).exclude(param_name="__group__").order_by("id"):
+
+        groups.setdefault(param.parameter_group_id, []).append({
+            "name": param.param_name,
+            "type": param.param_type
+        })
+
+    payload = [
+        {
+            "function_name": function.function_name,
+            "inputs": groups.get(function.input_params, []),
+            "outputs": groups.get(function.output_params, [])
+        }
+        for function in functions
+    ]
+
+    etag = hashlib.sha1(
+        json.dumps(payload, sort_keys=True).encode()
+    ).hexdigest()
+
+    return payload, etag
@@ -0,0 +1,179 @@
+import numpy as np
+
+
+# Column-oriented claim representation used by the vectorized functions in
+# rule_engine.functions.columnar. Every field is one NumPy array, so filters
+# and derived fields are whole-column operations driven by boolean masks
+# instead of per-dict attribute access.
+
+
+class ClaimBatch:
+
+    __slots__ = ("columns", "length")
+
+    def __init__(self, columns, length=None):
+
+        if length is None:
+            length = len(next(iter(columns.values()))) if columns else 0
+
+        for name, column in columns.items():
+            if len(column) != length:
+                raise ValueError(
+                    f"Column '{name}' has {len(column)} rows, "
+                    f"expected {length}"
+                )
+
+        self.columns = columns
+        self.length = length
+
+    @classmethod
+    def from_records(cls, records):
+
+        records = list(records)
+
+        fields = {}
+
+        for record in records:
+            for field in record:
+                fields.setdefault(field, None)
+
+        columns = {
+            field: _to_column([record.get(field) for record in records])
+            for field in fields
+        }
+
+        return cls(columns, len(records))
+
+    def to_records(self):
+
+        if not self.columns:
+            return [{} for _ in range(self.length)]
+
+        names = list(self.columns)
+        values = [self.columns[name].tolist() for name in names]
+
+        # None marks a field the source record did not have
+        return [
+            {
+                name: value
+                for name, value in zip(names, row)
+                if value is not None
+            }
+            for row in zip(*values)
+        ]
+
+    # DRF's JSON encoder serializes anything exposing tolist()
+    tolist = to_records
+
+    def __len__(self):
+        return self.length
+
+    def __iter__(self):
+        return iter(self.to_records())
+
+    def __repr__(self):
+        return f"<ClaimBatch rows={self.length} fields={list(self.columns)}>"
+
+    def column(self, name, default=None):
+
+        column = self.columns.get(name)
+
+        if column is None:
+            return np.full(self.length, default, dtype=object)
+
+        return column
+
+    def numeric(self, name, default=0):
+
+        # Numeric view of a column with missing values replaced by default
+        column = self.columns.get(name)
+
+        if column is None:
+            return np.full(self.length, default, dtype=np.float64)
+
+        if column.dtype != object:
+            return column
+
+        return np.array(
+            [default if value is None else value for value in column],
+            dtype=np.float64
+        )
+
+    def filter(self, mask):
+
+        return ClaimBatch(
+            {name: column[mask] for name, column in self.columns.items()},
+            int(np.count_nonzero(mask))
+        )
+
+    def slice(self, start, stop):
+
+        # Views of the columns, nothing is copied
+        columns = {
+            name: column[start:stop] for name, column in self.columns.items()
+        }
+
+        return ClaimBatch(columns, len(range(self.length)[start:stop]))
+
+    def with_column(self, name, values):
+
+        # Other columns are shared, not copied
+        columns = dict(self.columns)
+        columns[name] = values
+
+        return ClaimBatch(columns, self.length)
+
+    @classmethod
+    def concat(cls, batches):
+
+        batches = [batch for batch in batches if len(batch)]
+
+        if not batches:
+            return cls({}, 0)
+
+        fields = {}
+
+        for batch in batches:
+            for field in batch.columns:
+                fields.setdefault(field, None)
+
+        columns = {
+            field: _concat_columns(
+                [batch.column(field) for batch in batches]
+            )
+            for field in fields
+        }
+
+        return cls(columns, sum(len(batch) for batch in batches))
+
+
+def as_claim_batch(claims):
+
+    if isinstance(claims, ClaimBatch):
+        return claims
+
+    return ClaimBatch.from_records(claims)
+
+
+def _to_column(values):
+
+    kinds = {type(value) for value in values}
+
+    if kinds <= {int}:
+        return np.array(values, dtype=np.int64)
+
+    if kinds <= {int, float}:
+        return np.array(values, dtype=np.float64)
+
+    if kinds == {bool}:
+        return np.array(values, dtype=bool)
+
+    return np.fromiter(values, dtype=object, count=len(values))
+
+
+def _concat_columns(columns):
+
+    if len({column.dtype for column in columns}) == 1:
+        return np.concatenate(columns)
+
+    return np.concatenate([column.astype(object) for column in columns])
@@ -0,0 +1,217 @@
+import ast
+from functools import lru_cache
+
+
+# Edge conditions are a small expression language evaluated against the
+# execution context:
+#
+#   approved == True
+#   len(valid_claims) > 0
+#   context["fraud_score"] < 50 and status in ["new", "open"]
+#
+# Bare names resolve to context keys, ``context`` is the context itself and
+# ``len`` is the only callable. Expressions are validated and compiled once
+# into a plain function, so evaluating an edge is a single call. Sequence
+# repetition (``[0] * 10``) and string formatting (``"%09d" % 1``) are
+# refused - ``%`` only takes numbers - so a condition cannot build
+# arbitrarily large values.
+
+
+class ConditionError(ValueError):
+    pass
+
+
+_ALLOWED_NODES = (
+    ast.Expression,
+    ast.BoolOp, ast.And, ast.Or,
+    ast.UnaryOp, ast.Not, ast.USub, ast.UAdd,
+    ast.BinOp, ast.Add, ast.Sub, ast.Mult, ast.Div, ast.Mod,
+    ast.Compare,
+    ast.Eq, ast.NotEq, ast.Lt, ast.LtE, ast.Gt, ast.GtE,
+    ast.In, ast.NotIn, ast.Is, ast.IsNot,
+    ast.Call, ast.Name, ast.Load, ast.Constant,
+    ast.Subscript, ast.List, ast.Tuple,
+)
+
+_CONTEXT_NAME = "context"
+
+_MULTIPLY_NAME = "__multiply"
+
+_MODULO_NAME = "__modulo"
+
+_SEQUENCES = (str, bytes, list, tuple)
+
+
+def _validate(tree):
+
+    for node in ast.walk(tree):
+
+        if not isinstance(node, _ALLOWED_NODES):
+            raise ConditionError(
+                f"'{type(node).__name__}' is not allowed in conditions"
+            )
+
+        if isinstance(node, ast.Call):
+
+            if (
+                not isinstance(node.func, ast.Name)
+                or node.func.id != "len"
+                or len(node.args) != 1
+                or node.keywords
+            ):
+                raise ConditionError(
+                    "Only len(<value>) calls are allowed in conditions"
+                )
+
+        if isinstance(node, ast.BinOp) and isinstance(node.op, ast.Mult) and (
+            _is_sequence_literal(node.left) or _is_sequence_literal(node.right)
+        ):
+            raise ConditionError(
+                "Sequence repetition is not allowed in conditions"
+            )
+
+        if isinstance(node, ast.BinOp) and isinstance(node.op, ast.Mod) and (
+            _is_sequence_literal(node.left)
+        ):
+            raise ConditionError(
+                "String formatting is not allowed in conditions"
+            )
+
+        if isinstance(node, ast.Subscript):
+
+            if not isinstance(node.value, (ast.Name, ast.Subscript)):
+                raise ConditionError(
+                    "Subscripts are only allowed on context values"
+                )
+
+
+def _is_sequence_literal(node):
+
+    return isinstance(node, (ast.List, ast.Tuple)) or (
+        isinstance(node, ast.Constant) and isinstance(node.value, _SEQUENCES)
+    )
+
+
+def _multiply(left, right):
+
+    # Context values are only known at runtime; the error makes the
+    # condition evaluate to False
+    if isinstance(left, _SEQUENCES) or isinstance(right, _SEQUENCES):
+        raise ConditionError(
+            "Sequence repetition is not allowed in conditions"
+        )
+
+    return left * right
+
+
+def _modulo(left, right):
+
+    # Numbers only: on a string, % is printf-style formatting, which can
+    # pad its output to any width
+    if not (
+        isinstance(left, (int, float)) and isinstance(right, (int, float))
+    ):
+        raise ConditionError("% is only allowed on numbers in conditions")
+
+    return left % right
+
+
+class _ResolveNames(ast.NodeTransformer):
+
+    # name -> context["name"], a * b -> __multiply(a, b),
+    # a % b -> __modulo(a, b)
+
+    def visit_Name(self, node):
+
+        if node.id in (_CONTEXT_NAME, "len"):
+            return node
+
+        return ast.copy_location(
+            ast.Subscript(
+                value=ast.Name(id=_CONTEXT_NAME, ctx=ast.Load()),
+                slice=ast.Constant(value=node.id),
+                ctx=ast.Load()
+            ),
+            node
+        )
+
+    def visit_BinOp(self, node):
+
+        self.generic_visit(node)
+
+        if isinstance(node.op, ast.Mult):
+            name = _MULTIPLY_NAME
+        elif isinstance(node.op, ast.Mod):
+            name = _MODULO_NAME
+        else:
+            return node
+
+        return ast.copy_location(
+            ast.Call(
+                func=ast.Name(id=name, ctx=ast.Load()),
+                args=[node.left, node.right],
+                keywords=[]
+            ),
+            node
+        )
+
+
+def parse_condition(expression):
+
+    try:
+        tree = ast.parse(expression.strip(), mode="eval")
+    except SyntaxError as exc:
+        raise ConditionError(f"Invalid syntax: {exc.msg}") from exc
+
+    _validate(tree)
+
+    return tree
+
+
+def compile_condition(expression):
+
+    if expression is None:
+        return None
+
+    if not isinstance(expression, str):
+        raise ConditionError("Conditions must be strings")
+
+    return _compile_condition(expression)
+
+
+@lru_cache(maxsize=1024)
+def _compile_condition(expression):
+
+    if not expression.strip():
+        return None
+
+    tree = _ResolveNames().visit(parse_condition(expression))
+
+    function = ast.Expression(
+        body=ast.Lambda(
+            args=ast.arguments(
+                posonlyargs=[],
+                args=[ast.arg(arg=_CONTEXT_NAME)],
+                kwonlyargs=[],
+                kw_defaults=[],
+                defaults=[]
+            ),
+            body=tree.body
+        )
+    )
+
+    code = compile(
+        ast.fix_missing_locations(function),
+        "<condition>",
+        "eval"
+    )
+
+    return eval(
+        code,
+        {
+            "__builtins__": {},
+            "len": len,
+            _MULTIPLY_NAME: _multiply,
+            _MODULO_NAME: _modulo,
+        }
+    )
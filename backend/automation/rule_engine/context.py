@@ -0,0 +1,210 @@
+from collections.abc import Mapping, MutableMapping
+
+
+# Execution context of a rule run. Values live in one dict (`data`) that is
+# updated in place as nodes finish; alongside it the context remembers
+# which node produced every key, so provenance survives the merge. A node
+# taking `context` gets a ContextScope, a view of its own params layered
+# over the context, instead of a merged copy. With versioning on (full
+# traces) every write is also appended to a log, and a snapshot is just a
+# position in that log, materialized only when it is read.
+
+# Snapshot marker for a deleted key
+_DELETED = object()
+
+
+class ExecutionContext(MutableMapping):
+
+    __slots__ = ("data", "_producers", "_initial", "_writes")
+
+    def __init__(self, values=None, versioned=False):
+
+        self.data = dict(values or {})
+
+        # key -> id of the node that wrote it, None for input values and
+        # values written directly through `context`
+        self._producers = dict.fromkeys(self.data)
+
+        # Versioned contexts keep every overwritten value alive until the
+        # run ends, so only full traces turn versioning on
+        self._initial = dict(self.data) if versioned else None
+        self._writes = [] if versioned else None
+
+    def __getitem__(self, key):
+        return self.data[key]
+
+    def get(self, key, default=None):
+        return self.data.get(key, default)
+
+    def __contains__(self, key):
+        return key in self.data
+
+    def __iter__(self):
+        return iter(self.data)
+
+    def __len__(self):
+        return len(self.data)
+
+    def __setitem__(self, key, value):
+
+        self.record(None, {key: value})
+
+    def __delitem__(self, key):
+
+        del self.data[key]
+        del self._producers[key]
+
+        if self._writes is not None:
+            self._writes.append((key, _DELETED))
+
+    def record(self, producer, values):
+
+        # Merges a node's outputs and attributes their keys to it
+        self.data.update(values)
+        self._producers.update(dict.fromkeys(values, producer))
+
+        if self._writes is not None:
+            self._writes.extend(values.items())
+
+    def producer(self, key):
+
+        if key not in self._producers:
+            raise KeyError(key)
+
+        return self._producers[key]
+
+    def provenance(self):
+
+        return dict(self._producers)
+
+    def scope(self, params):
+
+        if not params:
+            return self
+
+        return ContextScope(self, params)
+
+    def snapshot(self):
+
+        if self._writes is None:
+            return dict(self.data)
+
+        return ContextSnapshot(self._initial, self._writes, len(self._writes))
+
+    def __reduce__(self):
+
+        # Pickled (process pool arguments, batch results) as a plain dict
+        return (dict, (self.data,))
+
+    def __repr__(self):
+
+        return f"ExecutionContext({self.data!r})"
+
+
+class ContextScope(MutableMapping):
+
+    # Node params over the execution context. Reads check params first;
+    # writes go through to the context, where params cannot shadow them.
+
+    __slots__ = ("context", "params")
+
+    def __init__(self, context, params):
+
+        self.context = context
+        self.params = params
+
+    def __getitem__(self, key):
+
+        if key in self.params:
+            return self.params[key]
+
+        return self.context.data[key]
+
+    def get(self, key, default=None):
+
+        if key in self.params:
+            return self.params[key]
+
+        return self.context.data.get(key, default)
+
+    def __contains__(self, key):
+        return key in self.params or key in self.context.data
+
+    def __iter__(self):
+
+        yield from self.params
+
+        for key in self.context.data:
+            if key not in self.params:
+                yield key
+
+    def __len__(self):
+
+        return len(self.params) + sum(
+            1 for key in self.context.data if key not in self.params
+        )
+
+    def __setitem__(self, key, value):
+
+        self.context[key] = value
+
+    def __delitem__(self, key):
+
+        del self.context[key]
+
+    def __reduce__(self):
+
+        return (dict, ({**self.context.data, **self.params},))
+
+    def __repr__(self):
+
+        return f"ContextScope({dict(self)!r})"
+
+
+class ContextSnapshot(Mapping):
+
+    # The context as it was after the first `length` writes. Snapshots
+    # share the write log, so taking one is O(1); the state is replayed
+    # the first time it is read.
+
+    __slots__ = ("_initial", "_writes", "_length", "_data")
+
+    def __init__(self, initial, writes, length):
+
+        self._initial = initial
+        self._writes = writes
+        self._length = length
+        self._data = None
+
+    def to_dict(self):
+
+        if self._data is None:
+
+            data = dict(self._initial)
+
+            for key, value in self._writes[:self._length]:
+                if value is _DELETED:
+                    data.pop(key, None)
+                else:
+                    data[key] = value
+
+            self._data = data
+
+        return self._data
+
+    def __getitem__(self, key):
+        return self.to_dict()[key]
+
+    def __iter__(self):
+        return iter(self.to_dict())
+
+    def __len__(self):
+        return len(self.to_dict())
+
+    def __reduce__(self):
+
+        return (dict, (self.to_dict(),))
+
+    def __repr__(self):
+
+        return f"ContextSnapshot({self.to_dict()!r})"
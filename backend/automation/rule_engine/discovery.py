@@ -0,0 +1,189 @@
+import ast
+import importlib
+import importlib.util
+import inspect
+import json
+import logging
+from importlib.metadata import entry_points
+from pathlib import Path
+
+from django.conf import settings
+
+from .registry import register_function, register_lazy_function
+
+
+logger = logging.getLogger(__name__)
+
+ENTRY_POINT_GROUP = "rule_engine.functions"
+
+# Function discovery without importing function modules. Each module is
+# parsed and its @register_function decorators are read statically into a
+# lightweight index (name -> module + I/O metadata). The index is loaded
+# into the registry as lazy entries; a module is only imported when a node
+# using one of its functions is first compiled for execution.
+#
+# Sources:
+#   settings.RULE_ENGINE_FUNCTION_PACKAGES   packages scanned recursively
+#   "rule_engine.functions" entry points     plugin modules / packages
+#   settings.RULE_ENGINE_FUNCTION_MANIFEST   prebuilt index (JSON), see
+#                                            `manage.py build_function_manifest`
+
+
+def load_function_index():
+
+    manifest_path = getattr(settings, "RULE_ENGINE_FUNCTION_MANIFEST", None)
+
+    if manifest_path and Path(manifest_path).exists():
+        index = json.loads(Path(manifest_path).read_text())
+    else:
+        index = build_function_index()
+
+    for entry in index:
+
+        if entry.get("eager"):
+            # Decorator arguments were not literals; import to register
+            importlib.import_module(entry["module"])
+            continue
+
+        register_lazy_function(
+            entry["name"],
+            entry["module"],
+            **entry["options"]
+        )
+
+    return index
+
+
+def build_function_index():
+
+    modules = []
+
+    for package in getattr(
+        settings, "RULE_ENGINE_FUNCTION_PACKAGES", ["rule_engine.functions"]
+    ):
+        modules.extend(_package_modules(package))
+
+    for entry_point in entry_points(group=ENTRY_POINT_GROUP):
+        modules.extend(_package_modules(entry_point.value))
+
+    index = []
+
+    for module_name, path in modules:
+        index.extend(scan_module(module_name, path))
+
+    return index
+
+
+def write_function_manifest(path):
+
+    index = build_function_index()
+
+    Path(path).write_text(json.dumps(index, indent=2))
+
+    return index
+
+
+def scan_module(module_name, path):
+
+    tree = ast.parse(Path(path).read_text(), filename=str(path))
+
+    entries = []
+
+    for node in tree.body:
+
+        if not isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            continue
+
+        for decorator in node.decorator_list:
+
+            if not _is_register_call(decorator):
+                continue
+
+            try:
+                options = _decorator_options(decorator)
+            except Exception:
+                logger.warning(
+                    "Cannot read register_function arguments on %s.%s; "
+                    "module will be imported at startup",
+                    module_name, node.name
+                )
+                entries.append({"module": module_name, "eager": True})
+                break
+
+            name = options.pop("name", None) or node.name
+
+            entries.append({
+                "name": name,
+                "module": module_name,
+                "options": options
+            })
+
+    return entries
+
+
+def _decorator_options(decorator):
+
+    # register_function's arguments as keywords. Anything that is not a
+    # literal or not a parameter, *args and **kwargs included, raises.
+    parameters = list(inspect.signature(register_function).parameters)
+
+    if len(decorator.args) > len(parameters):
+        raise TypeError("Too many positional arguments")
+
+    options = {}
+
+    for parameter, argument in zip(parameters, decorator.args):
+
+        if isinstance(argument, ast.Starred):
+            raise TypeError("Unpacked positional arguments")
+
+        options[parameter] = ast.literal_eval(argument)
+
+    for keyword in decorator.keywords:
+
+        if keyword.arg not in parameters:
+            raise TypeError(f"Unexpected keyword argument {keyword.arg}")
+
+        options[keyword.arg] = ast.literal_eval(keyword.value)
+
+    return options
+
+
+def _is_register_call(decorator):
+
+    if not isinstance(decorator, ast.Call):
+        return False
+
+    func = decorator.func
+
+    if isinstance(func, ast.Attribute):
+        return func.attr == "register_function"
+
+    return isinstance(func, ast.Name) and func.id == "register_function"
+
+
+def _package_modules(name):
+
+    # (module name, file path) for a module or every module of a package,
+    # located without executing them
+    spec = importlib.util.find_spec(name)
+
+    if spec is None:
+        logger.warning("Function package %s not found", name)
+        return []
+
+    if not spec.submodule_search_locations:
+        return [(name, spec.origin)]
+
+    modules = []
+
+    for location in spec.submodule_search_locations:
+
+        for path in sorted(Path(location).rglob("*.py")):
+
+            relative = path.relative_to(location).with_suffix("")
+            parts = [part for part in relative.parts if part != "__init__"]
+
+            modules.append((".".join([name, *parts]), path))
+
+    return modules
@@ -1,44 +1,265 @@
+import time
 from collections import deque
-from .models import RuleList, RuleEdge
-from .registry import get_function
-import inspect
+from concurrent.futures import FIRST_COMPLETED, wait
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.utils import timezone
+from .context import ExecutionContext
+from .plan import GraphCycleError, PlanModeError, get_plan, wire_inputs
+from .history import record_run
+from .incremental import IncrementalRun
+from .memo import MISS, Fingerprints, get_result_cache, make_key
+from .metrics import observe_node, row_counts, timed_call
+from .partitioning import (
+    SegmentCall, find_segments, split_segment, submit_segment
+)
+from .pools import get_pool
+from .shared import SharedCalls
+from .streaming import (
+    ChunkStream, MaterializedView, StreamUsage, materialized, stream_node
+)
+
+
+# sequential: nodes run one at a time in breadth-first order
+# dag:        nodes run concurrently, each as soon as its upstream nodes
+#             have finished; results are merged into the context in plan
+#             order, whichever node finishes first
+# dataflow:   like dag, but each node is bound only to the outputs of its
+#             upstream nodes (wired through edge mappings) and the initial
+#             inputs; outputs are freed once their last consumer has run
+EXECUTION_MODES = ("sequential", "dag", "dataflow")
+
+# none:    no execution log
+# summary: output keys and sizes of each node's result
+# diff:    context keys each node added or changed, with sizes and the
+#          nodes that produced the values it overwrote (None for inputs)
+# full:    node result and a snapshot of the whole context after each node
+TRACE_LEVELS = ("none", "summary", "diff", "full")
 
 
 class GraphRuleExecutor:
 
-    def __init__(self, rule_engine_id):
+    def __init__(
+        self,
+        rule_engine_id,
+        plan=None,
+        mode=None,
+        pool=None,
+        max_workers=None,
+        context=None,
+        streaming=None,
+        trace=None,
+        incremental=None,
+        profile_memory=None,
+        sampler=None,
+        history=None,
+        shared_memory=None,
+        partitioned=None,
+        inline=False
+    ):
         self.rule_engine_id = rule_engine_id
-        self.context = {}
+        self.plan = plan
+        self.mode = mode or getattr(
+            settings, "RULE_ENGINE_EXECUTION_MODE", "sequential"
+        )
+        self.pool = pool
+        self.max_workers = max_workers
+        self.streaming = streaming if streaming is not None else getattr(
+            settings, "RULE_ENGINE_STREAMING", False
+        )
+        self.trace = trace or getattr(
+            settings, "RULE_ENGINE_TRACE_LEVEL", "diff"
+        )
+        self.incremental = incremental if incremental is not None else getattr(
+            settings, "RULE_ENGINE_INCREMENTAL", False
+        )
+        self.profile_memory = (
+            profile_memory if profile_memory is not None else getattr(
+                settings, "RULE_ENGINE_PROFILE_MEMORY", False
+            )
+        )
+        self.metrics = getattr(settings, "RULE_ENGINE_METRICS", True)
+        self.sampler = sampler
+        self.history = history if history is not None else getattr(
+            settings, "RULE_ENGINE_RUN_HISTORY", False
+        )
+        self.shared_memory = (
+            shared_memory if shared_memory is not None else getattr(
+                settings, "RULE_ENGINE_SHARED_MEMORY", True
+            )
+        )
+        self.partitioned = partitioned if partitioned is not None else getattr(
+            settings, "RULE_ENGINE_PARTITIONED", False
+        )
+
+        # Node calls run in the calling thread: streams cannot cross
+        # process boundaries, memory tracing and the sampling profiler
+        # only observe the executing thread, and batch chunks already
+        # occupy the pool
+        self.inline = bool(
+            inline or self.streaming or self.profile_memory or sampler
+        )
+        self.context = ExecutionContext(
+            context, versioned=self.trace == "full"
+        )
         self.execution_log = []
+        self.incremental_run = None
+        self.shared = None
+
+        # Dataflow mode: initial inputs, node id -> result of nodes whose
+        # outputs are still needed, node id -> edges left to consume them
+        self.inputs = dict(self.context.data)
+        self.outputs = {}
+        self.consumers = {}
+        self.incoming = {}
+
+        # Partitioned dataflow: head id -> row-wise segment, node id ->
+        # (result, profile) computed with its segment and not yet recorded
+        self.segments = {}
+        self.precomputed = {}
+
+        # node id -> timings and row counts of its last call
+        self.profiles = {}
+
+        # Streaming: (result, profile, usage) of every node called, read
+        # to the end by finish_streams(); metrics wait for the drained
+        # profiles as (function name, source, profile)
+        self.streamed = []
+        self.observations = []
+
+        # (node id, function name, source, profile) per node, for history
+        self.node_runs = []
+
+        # node id -> how its result was obtained without running it
+        # ("cached" by the memo, "reused" from the last incremental run)
+        self.hits = {}
+
+        # Memo keys hash each argument value once per execution
+        self.fingerprints = Fingerprints()
+
+        if self.mode not in EXECUTION_MODES:
+            raise ValueError(
+                f"Unknown execution mode '{self.mode}', "
+                f"expected one of {list(EXECUTION_MODES)}"
+            )
+
+        if self.trace not in TRACE_LEVELS:
+            raise ValueError(
+                f"Unknown trace level '{self.trace}', "
+                f"expected one of {list(TRACE_LEVELS)}"
+            )
+
+        if self.incremental and self.streaming:
+            raise ValueError(
+                "Incremental execution cannot be combined with streaming"
+            )
+
+        if self.incremental and self.mode == "dataflow":
+            raise ValueError(
+                "Incremental execution is not available in dataflow mode"
+            )
+
+        if self.partitioned and self.mode != "dataflow":
+            raise ValueError("Partitioned execution requires dataflow mode")
 
     def execute(self):
 
-        nodes = {
-            node.id: node
-            for node in RuleList.objects.filter(
-                rule_engine_id=self.rule_engine_id
+        plan = self.plan or get_plan(self.rule_engine_id)
+
+        self.check_mode(plan)
+
+        if self.incremental:
+            self.incremental_run = IncrementalRun(
+                self.rule_engine_id, self.context.data
             )
-        }
 
-        edges = RuleEdge.objects.filter(
-            rule_engine_id=self.rule_engine_id
+        run = self.start_run(plan)
+        self.shared = self.start_shared()
+
+        try:
+            if self.mode in ("dag", "dataflow"):
+                self.execute_dag(plan)
+            else:
+                self.execute_sequential(plan)
+
+            self.finish_streams()
+        except Exception as exc:
+            self.finish_run(run, exc)
+            raise
+        finally:
+            self.stop_shared()
+
+        if self.incremental_run is not None:
+            self.incremental_run.save()
+
+        self.finish_run(run)
+
+        return self.execution_log
+
+    def start_shared(self):
+
+        # On a process pool, large ClaimBatch arguments are handed to the
+        # workers through shared memory (see rule_engine.shared)
+        pool_kind = self.pool or getattr(
+            settings, "RULE_ENGINE_POOL", "thread"
+        )
+
+        if (
+            not self.shared_memory
+            or pool_kind != "process"
+            or self.streaming
+            or self.profile_memory
+        ):
+            return None
+
+        max_workers = self.max_workers or getattr(
+            settings, "RULE_ENGINE_MAX_WORKERS", 4
+        )
+
+        return SharedCalls(
+            get_pool(pool_kind, max_workers),
+            max_workers,
+            getattr(settings, "RULE_ENGINE_SHARED_MIN_ROWS", 10000),
+            getattr(settings, "RULE_ENGINE_PARTITION_ROWS", 100000)
         )
 
-        # Build adjacency list
-        adj = {}
-        incoming = set()
+    def stop_shared(self):
 
-        for edge in edges:
-            adj.setdefault(edge.source_id, []).append(edge)
-            incoming.add(edge.target_id)
+        if self.shared is not None:
+            self.shared.close()
+            self.shared = None
 
-        # Start nodes = no incoming edges
-        start_nodes = [
-            node for node_id, node in nodes.items()
-            if node_id not in incoming
-        ]
+    def check_mode(self, plan):
 
-        queue = deque(start_nodes)
+        # Mapped edges would silently pass every output in the other modes
+        if plan.mapped and self.mode != "dataflow":
+            raise PlanModeError(
+                f"Rule {plan.rule_engine_id} maps edge outputs and must run "
+                f"in dataflow mode"
+            )
+
+    def start_run(self, plan):
+
+        # Run history handle, None when the run is not recorded
+        if not self.history or not plan:
+            return None
+
+        return timezone.now(), time.perf_counter(), row_counts(self.context.data)
+
+    def finish_run(self, run, error=None):
+
+        if run is None:
+            return
+
+        started_at, start, input_rows = run
+
+        record_run(
+            self, started_at, time.perf_counter() - start, input_rows, error
+        )
+
+    def execute_sequential(self, plan):
+
+        queue = deque(plan.start_nodes)
 
         while queue:
 
@@ -46,50 +267,659 @@ class GraphRuleExecutor:
 
             result = self.execute_node(node)
 
-            for edge in adj.get(node.id, []):
+            for edge in plan.adjacency.get(node.id, ()):
 
                 if self.evaluate_condition(edge.condition):
                     queue.append(edge.target)
 
         return self.execution_log
 
+    def execute_dag(self, plan):
+
+        # A node starts as soon as all of its upstream nodes have been
+        # committed and at least one incoming edge was taken, so a long
+        # branch never waits for unrelated nodes. Results are committed in
+        # plan order whatever order the nodes finish in (commit_finished),
+        # so the context ends up the same on every run; a node sees the
+        # context as it was when it started.
+
+        pending, activated, plan_order = self.start_dag(plan)
+
+        ready = list(plan.start_nodes)
+
+        # node id -> (node, memo key, future or segment call)
+        running = {}
+
+        # Started nodes not yet committed, and finished results waiting
+        # for an earlier node, by node id
+        started = {node.id: node for node in ready}
+        done = {}
+
+        try:
+            while ready or running:
+
+                finished = self.start_nodes(ready, running)
+                finished.extend(self.wait_nodes(running, block=not finished))
+
+                done.update((node.id, (node, result)) for node, result in (
+                    finished
+                ))
+
+                ready = self.commit_finished(
+                    plan, started, done, pending, activated, plan_order
+                )
+        finally:
+            # After a failure, calls still queued on the pool are dropped;
+            # those already running finish on their own
+            for _, _, call in running.values():
+                for future in _futures(call):
+                    future.cancel()
+
+        return self.execution_log
+
+    def start_dag(self, plan):
+
+        if not plan.acyclic:
+            raise GraphCycleError(
+                f"Rule {plan.rule_engine_id} contains a cycle and cannot "
+                f"run in {self.mode} mode"
+            )
+
+        if self.mode == "dataflow":
+
+            self.incoming = plan.incoming
+
+            # Nodes without outgoing edges keep their outputs: they are
+            # the results of the run
+            self.consumers = {
+                node_id: len(plan.adjacency.get(node_id, ()))
+                for node_id in plan.nodes
+            }
+
+            # Inline runs run every node on its own
+            if self.partitioned and not self.inline:
+                self.segments = find_segments(plan)
+
+        return dict(plan.in_degree), set(), _plan_order(plan)
+
+    def commit_finished(
+        self, plan, started, done, pending, activated, plan_order
+    ):
+
+        # Records finished results in plan order: a result is committed
+        # once every earlier node that has started is committed. Returns
+        # the nodes this made ready, in plan order.
+        ready = []
+
+        while started:
+
+            first = min(started.values(), key=plan_order)
+
+            if first.id not in done:
+                break
+
+            node, result = done.pop(first.id)
+            del started[node.id]
+
+            self.record_result(node, result)
+
+            for target in self.resolve_edges(
+                plan, node, pending, activated
+            ):
+                started[target.id] = target
+                ready.append(target)
+
+        ready.sort(key=plan_order)
+
+        return ready
+
+    def resolve_edges(self, plan, node, pending, activated):
+
+        # Resolves the outgoing edges of a node that ran and returns the
+        # nodes this made ready. A node left without any taken incoming
+        # edge is skipped and resolves its own edges as not taken.
+        ready = []
+        resolved = deque([(node, True)])
+
+        while resolved:
+
+            node, ran = resolved.popleft()
+
+            if not ran:
+                self.release_inputs(node)
+
+            for edge in plan.adjacency.get(node.id, ()):
+
+                target = edge.target
+
+                if ran and self.evaluate_condition(edge.condition):
+                    activated.add(target.id)
+
+                pending[target.id] -= 1
+
+                if pending[target.id] == 0:
+
+                    if target.id in activated:
+                        ready.append(target)
+                    else:
+                        resolved.append((target, False))
+
+        return ready
+
+    def start_nodes(self, nodes, running):
+
+        # Starts ready nodes and returns [(node, result)] of those that
+        # completed right away (memo hits, results of partitioned segments,
+        # inline runs); the others are added to `running`.
+
+        if self.inline:
+            return [
+                (node, self.call_node(node, self.bind_arguments(node)))
+                for node in nodes
+            ]
+
+        finished = []
+        calls = []
+
+        for node in nodes:
+
+            segment = self.submit_segment(node)
+
+            if segment is not None:
+                running[node.id] = (node, None, segment)
+                continue
+
+            if node.id in self.precomputed:
+                finished.append((node, self.profiled(
+                    node, *self.precomputed.pop(node.id)
+                )))
+                continue
+
+            kwargs = self.bind_arguments(node)
+            key, cached = self.lookup_result(node, kwargs)
+
+            if cached is MISS:
+                calls.append((node, kwargs, key))
+            else:
+                finished.append((node, cached))
+
+        # A lone node with nothing else to wait for runs in this thread
+        if len(calls) == 1 and not running and not finished:
+
+            node, kwargs, key = calls[0]
+
+            return [(node, self.store_result(
+                node, key, self.profiled(node, *self.call_function(
+                    node, kwargs
+                ))
+            ))]
+
+        if calls:
+
+            pool = get_pool(self.pool, self.max_workers)
+
+            for node, kwargs, key in calls:
+                running[node.id] = (
+                    node, key, self.submit_call(pool, node, kwargs)
+                )
+
+        return finished
+
+    def wait_nodes(self, running, block=True):
+
+        # [(node, result)] of the running nodes that have completed; with
+        # `block`, waits until at least one has
+        if not running:
+            return []
+
+        if block:
+            wait(
+                [
+                    future
+                    for _, _, call in running.values()
+                    for future in _futures(call)
+                ],
+                return_when=FIRST_COMPLETED
+            )
+
+        finished = []
+
+        for node_id, (node, key, call) in list(running.items()):
+
+            if not all(future.done() for future in _futures(call)):
+                continue
+
+            del running[node_id]
+
+            if isinstance(call, SegmentCall):
+                self.precomputed.update(call.result())
+                result = self.profiled(node, *self.precomputed.pop(node_id))
+            else:
+                result = self.store_result(
+                    node, key, self.profiled(node, *call.result())
+                )
+
+            finished.append((node, result))
+
+        return finished
+
+    def submit_segment(self, node):
+
+        # Running partitioned segment when the node heads one and its list
+        # input is large enough to be split (see rule_engine.partitioning);
+        # the segment's other nodes take their results once they are ready
+        segment = self.segments.get(node.id)
+
+        if segment is None:
+            return None
+
+        shards = split_segment(
+            segment,
+            self.node_inputs(node),
+            self.inputs,
+            self.max_workers or getattr(
+                settings, "RULE_ENGINE_MAX_WORKERS", 4
+            ),
+            getattr(settings, "RULE_ENGINE_PARTITION_ROWS", 100000),
+            self.shared
+        )
+
+        if shards is None:
+            return None
+
+        return submit_segment(
+            get_pool(self.pool, self.max_workers),
+            segment,
+            shards,
+            self.shared.min_rows if self.shared is not None else None
+        )
+
     def execute_node(self, node):
 
-        function = get_function(node.rule_logic.function_name)
+        result = self.call_node(node, self.bind_arguments(node))
+
+        self.record_result(node, result)
 
-        params = node.params or {}
-        merged = {**self.context, **params}
+        return result
 
-        sig = inspect.signature(function)
+    def call_node(self, node, kwargs):
 
-        valid = {
-            k: v for k, v in merged.items()
-            if k in sig.parameters
-        }
+        if self.sampler is not None:
+            with self.sampler.node(f"node {node.id} {node.function_name}"):
+                return self.run_node(node, kwargs)
 
-        if "context" in sig.parameters:
-            valid["context"] = self.context
+        return self.run_node(node, kwargs)
 
-        result = function(**valid)
+    def run_node(self, node, kwargs):
 
-        if result:
-            self.context.update(result)
+        if self.streaming:
+
+            chunk_size = stream_chunk_size()
+            usage = StreamUsage()
+
+            result, profile = timed_call(
+                lambda **arguments: stream_node(
+                    node.meta, arguments, chunk_size, usage
+                ),
+                kwargs,
+                self.profile_memory
+            )
+
+            self.streamed.append((result, profile, usage))
+
+            return self.profiled(node, result, profile)
+
+        key, cached = self.lookup_result(node, kwargs)
+
+        if cached is not MISS:
+            return cached
+
+        return self.store_result(node, key, self.profiled(
+            node, *self.call_function(node, kwargs)
+        ))
+
+    def call_function(self, node, kwargs):
+
+        # (result, profile) of the node's function
+        if self.shared is not None and self.shared.applies(kwargs):
+            return self.shared.submit(
+                _sync_callable(node), kwargs, node.meta
+            ).result()
+
+        return timed_call(_sync_callable(node), kwargs, self.profile_memory)
+
+    def submit_call(self, pool, node, kwargs):
+
+        # Future of (result, profile) of the node's function on the pool
+        if self.shared is not None and self.shared.applies(kwargs):
+            return self.shared.submit(_sync_callable(node), kwargs, node.meta)
+
+        return pool.submit(timed_call, _sync_callable(node), kwargs)
+
+    def finish_streams(self):
+
+        # Streams no node read to the end are drained, in the order their
+        # nodes ran, so every node does all of its work and its errors
+        # fail the run; profiles then cover the chunks each node processed
+        for result, profile, usage in self.streamed:
+
+            output_rows = profile.setdefault("output_rows", {})
+
+            for key, value in (result or {}).items():
+                if isinstance(value, ChunkStream):
+                    value.drain()
+                    output_rows[key] = len(value)
 
-        self.execution_log.append({
-            "node": node.id,
-            "function": node.rule_logic.function_name,
-            "result": result,
-            "context_after": self.context.copy()
-        })
+            usage.apply(profile)
+
+        self.streamed = []
+
+        for observation in self.observations:
+            observe_node(*observation)
+
+        self.observations = []
+
+    def profiled(self, node, result, profile):
+
+        self.profiles[node.id] = profile
+
+        return result
+
+    def lookup_result(self, node, kwargs):
+
+        # (memo key, result or MISS). Outputs of the last incremental run
+        # are checked first, then the memo for pure nodes.
+        if self.incremental_run is not None:
+
+            reused = self.incremental_run.lookup(node)
+
+            if reused is not MISS:
+                self.hits[node.id] = "reused"
+                return None, reused
+
+        if not node.meta.pure:
+            return None, MISS
+
+        key = make_key(node.function_name, kwargs, self.fingerprints)
+
+        if key is None:
+            return None, MISS
+
+        cached = get_result_cache().get(key)
+
+        if cached is not MISS:
+            self.hits[node.id] = "cached"
+            self.fingerprints.derive(key, cached)
+
+        return key, cached
+
+    def store_result(self, node, key, result):
+
+        if key is not None:
+            get_result_cache().put(key, result, node.meta.cache_ttl)
+            self.fingerprints.derive(key, result)
 
         return result
 
+    def bind_arguments(self, node):
+
+        if self.mode == "dataflow":
+            return node.bind(ExecutionContext(self.node_inputs(node)))
+
+        return node.bind(self.context)
+
+    def node_inputs(self, node):
+
+        return wire_inputs(
+            self.inputs, self.incoming.get(node.id, ()), self.outputs
+        )
+
+    def release_inputs(self, node):
+
+        # Called once a node has run or was skipped: upstream outputs
+        # with no consumer left are dropped from the outputs and from the
+        # context, unless a later node has overwritten the key since
+        for edge in self.incoming.get(node.id, ()):
+
+            source_id = edge.source_id
+            self.consumers[source_id] -= 1
+
+            if self.consumers[source_id]:
+                continue
+
+            for key in self.outputs.pop(source_id, None) or ():
+                if key in self.context and (
+                    self.context.producer(key) == source_id
+                ):
+                    del self.context[key]
+
+    def record_result(self, node, result):
+
+        outputs = result or {}
+
+        if self.trace == "diff":
+            added = [key for key in outputs if key not in self.context]
+            changed = [
+                key for key in outputs
+                if key in self.context and self.context[key] is not outputs[key]
+            ]
+            overwritten = {
+                key: self.context.producer(key) for key in changed
+            }
+
+        if result:
+            self.context.record(node.id, result)
+
+        if self.incremental_run is not None:
+            self.incremental_run.record(node, result)
+
+        if self.mode == "dataflow":
+            self.outputs[node.id] = outputs
+            self.release_inputs(node)
+
+        hit = self.hits.pop(node.id, None)
+        profile = self.profiles.pop(node.id, None)
+
+        if profile is not None:
+            profile["output_rows"] = row_counts(outputs)
+
+        if self.metrics:
+            observation = (node.function_name, hit or "executed", profile)
+            if self.streaming:
+                self.observations.append(observation)
+            else:
+                observe_node(*observation)
+
+        if self.history:
+            self.node_runs.append(
+                (node.id, node.function_name, hit or "executed", profile)
+            )
+
+        if self.trace == "none":
+            return
+
+        entry = {"node": node.id, "function": node.function_name}
+
+        if hit:
+            entry[hit] = True
+
+        if profile is not None:
+            entry["profile"] = profile
+
+        if self.trace == "full":
+            # Streams are read once here rather than on serialization
+            entry["result"] = materialized(result) if (
+                self.streaming and result
+            ) else result
+            entry["context_after"] = self.context.snapshot()
+
+        elif self.trace == "summary":
+            entry["outputs"] = _sizes(outputs, list(outputs))
+
+        else:
+            entry["added"] = added
+            entry["changed"] = changed
+            entry["overwritten"] = overwritten
+            entry["sizes"] = _sizes(outputs, added + changed)
+
+        self.execution_log.append(entry)
+
     def evaluate_condition(self, condition):
 
-        if not condition:
+        if condition is None:
             return True
 
+        # Conditions see streams as lists
+        data = self.context.data
+
+        if self.streaming:
+            data = MaterializedView(data)
+
         try:
-            return eval(condition, {}, self.context)
+            return bool(condition(data))
         except Exception:
-            return False
\ No newline at end of file
+            # A node failing while its stream is read fails the run
+            if self.streaming and data.error is not None:
+                raise data.error
+            return False
+
+
+def execute_batch(
+    rule_engine_id,
+    inputs,
+    mode=None,
+    pool=None,
+    max_workers=None,
+    chunk_size=None
+):
+
+    # Runs one rule graph over many input contexts. The plan is compiled
+    # once; inputs are split into chunks that run on the worker pool, and
+    # each input inside a chunk runs on its own executor.
+
+    if mode is not None and mode not in EXECUTION_MODES:
+        raise ValueError(
+            f"Unknown execution mode '{mode}', "
+            f"expected one of {list(EXECUTION_MODES)}"
+        )
+
+    chunk_size = chunk_size or getattr(
+        settings, "RULE_ENGINE_BATCH_CHUNK_SIZE", 100
+    )
+
+    # Pools are cached per size, so the size is bounded by the setting
+    max_workers = min(
+        max_workers or getattr(settings, "RULE_ENGINE_MAX_WORKERS", 4),
+        getattr(settings, "RULE_ENGINE_MAX_WORKERS", 4)
+    )
+
+    plan = get_plan(rule_engine_id)
+
+    chunks = [
+        inputs[start:start + chunk_size]
+        for start in range(0, len(inputs), chunk_size)
+    ]
+
+    if len(chunks) <= 1 or max_workers == 1:
+        results = []
+        for chunk in chunks:
+            results.extend(
+                _execute_chunk(rule_engine_id, chunk, mode, plan)
+            )
+        return results
+
+    pool_kind = pool or getattr(settings, "RULE_ENGINE_POOL", "thread")
+    pool = get_pool(pool_kind, max_workers)
+
+    # Chunks already occupy the pool, so inputs inside a chunk run their
+    # nodes inline, in the requested mode, rather than fanning out into
+    # the same pool again. Compiled plans hold closures that cannot be
+    # pickled; process workers compile (and cache) their own copy.
+    futures = [
+        pool.submit(
+            _execute_chunk,
+            rule_engine_id,
+            chunk,
+            mode,
+            plan if pool_kind == "thread" else None,
+            True
+        )
+        for chunk in chunks
+    ]
+
+    results = []
+    for future in futures:
+        results.extend(future.result())
+
+    return results
+
+
+def _execute_chunk(rule_engine_id, chunk, mode=None, plan=None, inline=False):
+
+    results = []
+
+    for context in chunk:
+
+        executor = GraphRuleExecutor(
+            rule_engine_id,
+            plan=plan,
+            mode=mode,
+            context=context,
+            trace="none",
+            incremental=False,
+            history=False,
+            shared_memory=False,
+            inline=inline
+        )
+
+        try:
+            executor.execute()
+        except Exception as exc:
+            results.append({"error": str(exc)})
+        else:
+            results.append({"context": executor.context.data})
+
+    return results
+
+
+def stream_chunk_size():
+
+    return getattr(settings, "RULE_ENGINE_STREAM_CHUNK_SIZE", 10000)
+
+
+def _sync_callable(node):
+
+    # async def functions run to completion on a private event loop when
+    # executed by the synchronous executor
+    if node.meta.is_async:
+        return async_to_sync(node.function)
+
+    return node.function
+
+
+def _sizes(values, keys):
+
+    # Row counts for list-like values, None for scalars and lazy streams
+    return {
+        key: (
+            len(values[key])
+            if hasattr(values[key], "__len__")
+            and not isinstance(values[key], (str, bytes, ChunkStream))
+            else None
+        )
+        for key in keys
+    }
+
+
+def _futures(call):
+
+    # Pool futures behind a node call: a future, or a SharedCall /
+    # SegmentCall made of several
+    return getattr(call, "futures", None) or [call]
+
+
+def _plan_order(plan):
+
+    position = {node_id: index for index, node_id in enumerate(plan.order)}
+
+    return lambda node: position[node.id]
@@ -1,2 +1,3 @@
-from .claims import *
-from .validation import *
+# Function modules in this package are discovered statically by
+# rule_engine.discovery and imported lazily on first use; do not import
+# them here.
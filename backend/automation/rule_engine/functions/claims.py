@@ -34,7 +34,8 @@ def load_claims(client_id, context=None):
         {"name": "claims", "type": "list"},
         {"name": "min_amount", "type": "integer"}
     ],
-    outputs=[{"name": "filtered_claims", "type": "list"}]
+    outputs=[{"name": "filtered_claims", "type": "list"}],
+    chunk_safe=True
 )
 def filter_claims(claims, min_amount, context=None):
 
@@ -0,0 +1,256 @@
+import numpy as np
+
+from rule_engine.columnar import ClaimBatch, as_claim_batch
+from rule_engine.registry import register_function
+
+
+# Vectorized counterparts of the claim functions in claims.py and
+# validation.py. They accept a list of claim dicts or a ClaimBatch and
+# return ClaimBatch outputs under the same output names, so a node can be
+# switched to the columnar version without rewiring the graph.
+
+
+@register_function(
+    name="filter_claims_columnar",
+    inputs=[
+        {"name": "claims", "type": "list"},
+        {"name": "min_amount", "type": "integer"}
+    ],
+    outputs=[{"name": "filtered_claims", "type": "list"}],
+    chunk_safe=True
+)
+def filter_claims_columnar(claims, min_amount, context=None):
+
+    batch = as_claim_batch(claims)
+
+    return {
+        "filtered_claims": batch.filter(batch.numeric("amount") >= min_amount)
+    }
+
+
+@register_function(
+    name="validate_required_fields_columnar",
+    inputs=[
+        {"name": "claims", "type": "list"},
+        {"name": "required_fields", "type": "list"}
+    ],
+    outputs=[
+        {"name": "valid_claims", "type": "list"},
+        {"name": "invalid_claims", "type": "list"}
+    ],
+    chunk_safe=True
+)
+def validate_required_fields_columnar(claims, required_fields, context=None):
+
+    batch = as_claim_batch(claims)
+
+    present = {
+        field: _not_missing(batch.column(field))
+        for field in required_fields
+    }
+
+    valid = np.ones(len(batch), dtype=bool)
+
+    for mask in present.values():
+        valid &= mask
+
+    invalid = batch.filter(~valid)
+
+    missing = [
+        [field for field in required_fields if not present[field][row]]
+        for row in np.flatnonzero(~valid)
+    ]
+
+    errors = np.fromiter(
+        (f"Missing fields: {fields}" for fields in missing),
+        dtype=object,
+        count=len(missing)
+    )
+
+    return {
+        "valid_claims": batch.filter(valid),
+        "invalid_claims": invalid.with_column("_validation_error", errors)
+    }
+
+
+@register_function(
+    name="validate_claim_amount_range_columnar",
+    inputs=[
+        {"name": "claims", "type": "list"},
+        {"name": "min_amount", "type": "float"},
+        {"name": "max_amount", "type": "float"}
+    ],
+    outputs=[
+        {"name": "valid_claims", "type": "list"},
+        {"name": "invalid_claims", "type": "list"}
+    ],
+    chunk_safe=True
+)
+def validate_claim_amount_range_columnar(
+    claims, min_amount, max_amount, context=None
+):
+
+    batch = as_claim_batch(claims)
+
+    amount = batch.numeric("amount")
+
+    valid = (amount >= min_amount) & (amount <= max_amount)
+
+    invalid = batch.filter(~valid)
+
+    return {
+        "valid_claims": batch.filter(valid),
+        "invalid_claims": invalid.with_column(
+            "_validation_error",
+            np.full(len(invalid), "Amount out of range", dtype=object)
+        )
+    }
+
+
+@register_function(
+    name="deduplicate_claims_columnar",
+    inputs=[
+        {"name": "claims", "type": "list"},
+        {"name": "unique_field", "type": "string"}
+    ],
+    outputs=[
+        {"name": "unique_claims", "type": "list"},
+        {"name": "duplicate_claims", "type": "list"}
+    ]
+)
+def deduplicate_claims_columnar(claims, unique_field, context=None):
+
+    batch = as_claim_batch(claims)
+
+    keys = batch.column(unique_field)
+
+    first = np.zeros(len(batch), dtype=bool)
+
+    if keys.dtype != object:
+        _, first_index = np.unique(keys, return_index=True)
+        first[first_index] = True
+    else:
+        # Mixed / non-orderable keys: one pass over a single column
+        seen = set()
+        for row, key in enumerate(keys.tolist()):
+            if key not in seen:
+                seen.add(key)
+                first[row] = True
+
+    duplicates = batch.filter(~first)
+
+    return {
+        "unique_claims": batch.filter(first),
+        "duplicate_claims": duplicates.with_column(
+            "_validation_error",
+            np.full(len(duplicates), "Duplicate claim", dtype=object)
+        )
+    }
+
+
+@register_function(
+    name="filter_claims_by_status_columnar",
+    inputs=[
+        {"name": "claims", "type": "list"},
+        {"name": "allowed_status", "type": "list"}
+    ],
+    outputs=[
+        {"name": "filtered_claims", "type": "list"}
+    ],
+    chunk_safe=True,
+    pure=True
+)
+def filter_claims_by_status_columnar(claims, allowed_status, context=None):
+
+    batch = as_claim_batch(claims)
+
+    mask = np.isin(batch.column("status"), list(allowed_status))
+
+    return {
+        "filtered_claims": batch.filter(mask)
+    }
+
+
+@register_function(
+    name="calculate_claim_tax_columnar",
+    inputs=[
+        {"name": "claims", "type": "list"},
+        {"name": "tax_rate", "type": "float"}
+    ],
+    outputs=[
+        {"name": "claims_with_tax", "type": "list"}
+    ],
+    chunk_safe=True,
+    pure=True
+)
+def calculate_claim_tax_columnar(claims, tax_rate, context=None):
+
+    batch = as_claim_batch(claims)
+
+    return {
+        "claims_with_tax": batch.with_column(
+            "tax",
+            batch.numeric("amount") * tax_rate
+        )
+    }
+
+
+@register_function(
+    name="auto_approve_claims_columnar",
+    inputs=[
+        {"name": "claims", "type": "list"},
+        {"name": "approval_threshold", "type": "float"}
+    ],
+    outputs=[
+        {"name": "approved_claims", "type": "list"},
+        {"name": "manual_review_claims", "type": "list"}
+    ],
+    chunk_safe=True
+)
+def auto_approve_claims_columnar(claims, approval_threshold, context=None):
+
+    batch = as_claim_batch(claims)
+
+    approved = batch.numeric("amount") <= approval_threshold
+
+    status = np.where(approved, "approved", "manual_review").astype(object)
+
+    batch = batch.with_column("status", status)
+
+    return {
+        "approved_claims": batch.filter(approved),
+        "manual_review_claims": batch.filter(~approved)
+    }
+
+
+@register_function(
+    name="merge_claim_lists_columnar",
+    inputs=[
+        {"name": "claims_a", "type": "list"},
+        {"name": "claims_b", "type": "list"}
+    ],
+    outputs=[
+        {"name": "merged_claims", "type": "list"}
+    ]
+)
+def merge_claim_lists_columnar(claims_a, claims_b, context=None):
+
+    return {
+        "merged_claims": ClaimBatch.concat([
+            as_claim_batch(claims_a),
+            as_claim_batch(claims_b)
+        ])
+    }
+
+
+def _not_missing(column):
+
+    # None and NaN are missing, as in validate_required_fields
+    if column.dtype.kind == "f":
+        return ~np.isnan(column)
+
+    if column.dtype != object:
+        return np.ones(len(column), dtype=bool)
+
+    # NaN is the only value not equal to itself
+    return np.not_equal(column, None) & (column == column)
@@ -1,6 +1,12 @@
+from rule_engine.records import with_value
 from rule_engine.registry import register_function
 
 
+# Claims are never modified in place: derived fields are set on
+# copy-on-write copies (rule_engine.records), so input lists can be shared
+# by parallel branches and cached results without copying.
+
+
 # Validate claim has required fields
 @register_function(
     name="validate_required_fields",
@@ -11,7 +17,8 @@ from rule_engine.registry import register_function
     outputs=[
         {"name": "valid_claims", "type": "list"},
         {"name": "invalid_claims", "type": "list"}
-    ]
+    ],
+    chunk_safe=True
 )
 def validate_required_fields(claims, required_fields, context=None):
 
@@ -22,12 +29,13 @@ def validate_required_fields(claims, required_fields, context=None):
 
         missing = [
             field for field in required_fields
-            if field not in claim or claim[field] is None
+            if field not in claim or _is_missing(claim[field])
         ]
 
         if missing:
-            claim["_validation_error"] = f"Missing fields: {missing}"
-            invalid_claims.append(claim)
+            invalid_claims.append(with_value(
+                claim, "_validation_error", f"Missing fields: {missing}"
+            ))
         else:
             valid_claims.append(claim)
 
@@ -37,6 +45,12 @@ def validate_required_fields(claims, required_fields, context=None):
     }
 
 
+def _is_missing(value):
+
+    # NaN is how pandas and numpy sources mark an empty numeric cell
+    return value is None or (isinstance(value, float) and value != value)
+
+
 # Validate claim amount range
 @register_function(
     name="validate_claim_amount_range",
@@ -48,7 +62,8 @@ def validate_required_fields(claims, required_fields, context=None):
     outputs=[
         {"name": "valid_claims", "type": "list"},
         {"name": "invalid_claims", "type": "list"}
-    ]
+    ],
+    chunk_safe=True
 )
 def validate_claim_amount_range(claims, min_amount, max_amount, context=None):
 
@@ -62,8 +77,9 @@ def validate_claim_amount_range(claims, min_amount, max_amount, context=None):
         if min_amount <= amount <= max_amount:
             valid_claims.append(claim)
         else:
-            claim["_validation_error"] = "Amount out of range"
-            invalid_claims.append(claim)
+            invalid_claims.append(with_value(
+                claim, "_validation_error", "Amount out of range"
+            ))
 
     return {
         "valid_claims": valid_claims,
@@ -95,8 +111,9 @@ def deduplicate_claims(claims, unique_field, context=None):
         key = claim.get(unique_field)
 
         if key in seen:
-            claim["_validation_error"] = "Duplicate claim"
-            duplicate_claims.append(claim)
+            duplicate_claims.append(with_value(
+                claim, "_validation_error", "Duplicate claim"
+            ))
         else:
             seen.add(key)
             unique_claims.append(claim)
@@ -116,7 +133,9 @@ def deduplicate_claims(claims, unique_field, context=None):
     ],
     outputs=[
         {"name": "filtered_claims", "type": "list"}
-    ]
+    ],
+    chunk_safe=True,
+    pure=True
 )
 def filter_claims_by_status(claims, allowed_status, context=None):
 
@@ -139,7 +158,9 @@ def filter_claims_by_status(claims, allowed_status, context=None):
     ],
     outputs=[
         {"name": "claims_with_tax", "type": "list"}
-    ]
+    ],
+    chunk_safe=True,
+    pure=True
 )
 def calculate_claim_tax(claims, tax_rate, context=None):
 
@@ -151,9 +172,7 @@ def calculate_claim_tax(claims, tax_rate, context=None):
 
         tax = amount * tax_rate
 
-        claim["tax"] = tax
-
-        result.append(claim)
+        result.append(with_value(claim, "tax", tax))
 
     return {
         "claims_with_tax": result
@@ -170,7 +189,8 @@ def calculate_claim_tax(claims, tax_rate, context=None):
     outputs=[
         {"name": "approved_claims", "type": "list"},
         {"name": "manual_review_claims", "type": "list"}
-    ]
+    ],
+    chunk_safe=True
 )
 def auto_approve_claims(claims, approval_threshold, context=None):
 
@@ -181,15 +201,11 @@ def auto_approve_claims(claims, approval_threshold, context=None):
 
         if claim.get("amount", 0) <= approval_threshold:
 
-            claim["status"] = "approved"
-
-            approved.append(claim)
+            approved.append(with_value(claim, "status", "approved"))
 
         else:
 
-            claim["status"] = "manual_review"
-
-            manual.append(claim)
+            manual.append(with_value(claim, "status", "manual_review"))
 
     return {
         "approved_claims": approved,
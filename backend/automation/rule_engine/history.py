@@ -0,0 +1,221 @@
+import logging
+from datetime import datetime, time, timedelta
+
+from django.db import transaction
+from django.utils import timezone
+
+from .metrics import row_counts
+from .models import RuleNodeRun, RuleRun, RuleRunDaily
+from .utils import percentile
+
+
+logger = logging.getLogger(__name__)
+
+# Run history. The executor keeps one small record per node call while it
+# runs; when the run ends the run row and all of its node rows are written
+# in one transaction with a single bulk insert. Recording is opt-in
+# (RULE_ENGINE_RUN_HISTORY or ?history=1) since it adds those writes to
+# every execution. Old runs are rolled up into per-rule daily aggregates
+# and deleted by `manage.py prune_rule_runs`.
+
+# Rows per INSERT; keeps statements under SQL Server's 2100 parameter cap
+NODE_RUN_BATCH_SIZE = 200
+
+PRUNE_BATCH_SIZE = 1000
+
+
+def record_run(executor, started_at, duration, input_rows, error=None):
+
+    node_runs = executor.node_runs
+
+    counts = {"executed": 0, "cached": 0, "reused": 0}
+
+    for _, _, source, _ in node_runs:
+        counts[source] += 1
+
+    try:
+        with transaction.atomic():
+
+            run = RuleRun.objects.create(
+                rule_engine_id=executor.rule_engine_id,
+                status=(
+                    RuleRun.STATUS_FAILED if error is not None
+                    else RuleRun.STATUS_SUCCEEDED
+                ),
+                mode=executor.mode,
+                started_at=started_at,
+                duration_ms=round(duration * 1000, 3),
+                cpu_ms=round(sum(
+                    (profile or {}).get("cpu_ms") or 0
+                    for _, _, _, profile in node_runs
+                ), 3),
+                nodes_executed=counts["executed"],
+                nodes_cached=counts["cached"],
+                nodes_reused=counts["reused"],
+                input_rows=input_rows,
+                output_rows=row_counts(executor.context.data),
+                error=str(error) if error is not None else None
+            )
+
+            RuleNodeRun.objects.bulk_create(
+                [
+                    _node_run(run, node_id, function_name, source, profile)
+                    for node_id, function_name, source, profile in node_runs
+                ],
+                batch_size=NODE_RUN_BATCH_SIZE
+            )
+
+    except Exception:
+        # History must never fail an execution
+        logger.exception(
+            "Could not record run of rule %s", executor.rule_engine_id
+        )
+        return None
+
+    return run
+
+
+def prune_runs(days):
+
+    # Rolls runs that started before midnight `days` days ago up into
+    # RuleRunDaily and deletes them; returns the number of runs removed.
+    # The cutoff is day aligned, so a day is always rolled up whole.
+    cutoff = timezone.make_aware(
+        datetime.combine(
+            timezone.localdate() - timedelta(days=days), time.min
+        )
+    )
+
+    old_runs = RuleRun.objects.filter(started_at__lt=cutoff)
+
+    # Rollup and deletes commit together: a prune interrupted in between
+    # would otherwise count its runs again on the next pass
+    with transaction.atomic():
+
+        _roll_up(_group_runs(old_runs))
+
+        # Deleted in batches to keep statements under the parameter cap
+        removed = 0
+
+        while True:
+
+            batch = list(
+                old_runs.values_list("id", flat=True)[:PRUNE_BATCH_SIZE]
+            )
+
+            if not batch:
+                return removed
+
+            RuleNodeRun.objects.filter(run_id__in=batch).delete()
+            RuleRun.objects.filter(id__in=batch).delete()
+
+            removed += len(batch)
+
+
+def _group_runs(runs):
+
+    # (rule engine id, local day) -> durations, failures, executed nodes
+    groups = {}
+
+    for rule_engine_id, started_at, duration, run_status, executed in (
+        runs.values_list(
+            "rule_engine_id", "started_at", "duration_ms", "status",
+            "nodes_executed"
+        ).iterator(chunk_size=PRUNE_BATCH_SIZE)
+    ):
+        day = timezone.localdate(started_at)
+        group = groups.setdefault((rule_engine_id, day), {
+            "durations": [], "failures": 0, "nodes_executed": 0
+        })
+
+        group["durations"].append(duration)
+        group["nodes_executed"] += executed
+
+        if run_status == RuleRun.STATUS_FAILED:
+            group["failures"] += 1
+
+    return groups
+
+
+def _roll_up(groups):
+
+    existing = {
+        (rollup.rule_engine_id, rollup.day): rollup
+        for rollup in RuleRunDaily.objects.filter(
+            day__in={day for _, day in groups}
+        )
+    }
+
+    created = []
+
+    for key, group in groups.items():
+
+        rollup = existing.get(key)
+
+        if rollup is None:
+            rollup = RuleRunDaily(rule_engine_id=key[0], day=key[1])
+            created.append(rollup)
+
+        _merge_rollup(rollup, group)
+
+    RuleRunDaily.objects.bulk_create(created)
+
+    updated = [rollup for key, rollup in existing.items() if key in groups]
+
+    RuleRunDaily.objects.bulk_update(
+        updated,
+        [
+            "runs", "failures", "duration_total_ms", "duration_max_ms",
+            "duration_p50_ms", "duration_p95_ms", "nodes_executed"
+        ]
+    )
+
+
+def _node_run(run, node_id, function_name, source, profile):
+
+    profile = profile or {}
+
+    return RuleNodeRun(
+        run=run,
+        node_id=node_id,
+        function_name=function_name,
+        source=source,
+        wall_ms=profile.get("wall_ms"),
+        cpu_ms=profile.get("cpu_ms"),
+        input_rows=_total(profile.get("input_rows")),
+        output_rows=_total(profile.get("output_rows")),
+        memory_bytes=profile.get("memory_bytes")
+    )
+
+
+def _merge_rollup(rollup, group):
+
+    durations = sorted(group["durations"])
+
+    p50 = percentile(durations, 50)
+    p95 = percentile(durations, 95)
+
+    # Percentiles of a day rolled up twice are combined as weighted means
+    previous = rollup.runs
+    total = previous + len(durations)
+
+    rollup.duration_p50_ms = (
+        rollup.duration_p50_ms * previous + p50 * len(durations)
+    ) / total
+    rollup.duration_p95_ms = (
+        rollup.duration_p95_ms * previous + p95 * len(durations)
+    ) / total
+
+    rollup.runs = total
+    rollup.failures += group["failures"]
+    rollup.duration_total_ms += sum(durations)
+    rollup.duration_max_ms = max(rollup.duration_max_ms, durations[-1])
+    rollup.nodes_executed += group["nodes_executed"]
+
+
+def _total(rows):
+
+    if rows is None:
+        return None
+
+    return sum(rows.values())
@@ -0,0 +1,204 @@
+import hashlib
+import json
+import pickle
+import uuid
+
+from django.db import transaction
+from django.utils.crypto import constant_time_compare, salted_hmac
+
+from .memo import MISS
+from .models import RuleNodeState
+
+
+# Incremental re-execution. Every node gets a fingerprint of what it
+# computes: function (name and code), params, and the fingerprints of the
+# context values it is bound to. Context values are fingerprinted by
+# content - initial inputs and node outputs alike - so a node whose
+# inputs did not change is clean even when an upstream node re-ran.
+#
+# Node outputs are persisted per rule engine. A rerun reuses stored outputs
+# whose fingerprint matches and only executes dirty nodes; afterwards the
+# store holds exactly the nodes of the latest run. Editing a rule in place
+# (PUT rules/<id>/) keeps its id and therefore its store: node rows are
+# replaced, but fingerprints do not depend on them, so only edited nodes
+# and their dependents run again. Stored outputs are
+# pickles, so each is signed with the project's SECRET_KEY and a row that
+# fails verification is treated as dirty rather than unpickled.
+#
+# Nodes are assumed to be deterministic in their bound arguments; values
+# a function reads from `context` directly are not tracked.
+
+
+_SALT = "rule_engine.incremental"
+
+_MAC_SIZE = 32
+
+
+class IncrementalRun:
+
+    def __init__(self, rule_engine_id, context):
+
+        self.rule_engine_id = rule_engine_id
+
+        # context key -> fingerprint of its current value
+        self.producers = {
+            key: value_fingerprint(value) for key, value in context.items()
+        }
+
+        # fingerprint -> (signed output, output fingerprints), one query
+        self.known = {
+            fingerprint: (output, output_fingerprints)
+            for fingerprint, output, output_fingerprints
+            in RuleNodeState.objects.filter(
+                rule_engine_id=rule_engine_id
+            ).values_list("fingerprint", "output", "output_fingerprints")
+        }
+
+        self.fingerprints = {}
+        self.reused = {}
+        self.computed = {}
+
+    def lookup(self, node):
+
+        fingerprint = node_fingerprint(node, self.producers)
+
+        self.fingerprints[node.id] = fingerprint
+
+        state = self.known.get(fingerprint)
+
+        if state is None:
+            return MISS
+
+        output, output_fingerprints = state
+
+        payloads = _unsign(bytes(output))
+
+        if payloads is None:
+            return MISS
+
+        self.reused[fingerprint] = output_fingerprints
+
+        return {
+            key: pickle.loads(payload) for key, payload in payloads.items()
+        }
+
+    def record(self, node, result):
+
+        fingerprint = self.fingerprints[node.id]
+
+        if fingerprint in self.reused:
+            self.producers.update(self.reused[fingerprint])
+            return
+
+        payloads = {}
+        output_fingerprints = {}
+
+        for key, value in (result or {}).items():
+
+            try:
+                payloads[key] = pickle.dumps(
+                    value, protocol=pickle.HIGHEST_PROTOCOL
+                )
+            except Exception:
+                output_fingerprints[key] = uuid.uuid4().hex
+            else:
+                output_fingerprints[key] = _digest(payloads[key])
+
+        self.producers.update(output_fingerprints)
+
+        if len(payloads) < len(output_fingerprints):
+            return
+
+        self.computed[fingerprint] = RuleNodeState(
+            rule_engine_id=self.rule_engine_id,
+            fingerprint=fingerprint,
+            output=_sign(
+                pickle.dumps(payloads, protocol=pickle.HIGHEST_PROTOCOL)
+            ),
+            output_fingerprints=output_fingerprints
+        )
+
+    def save(self):
+
+        # Rows of dirty nodes are replaced, including any whose signature
+        # no longer matched
+        with transaction.atomic():
+
+            RuleNodeState.objects.filter(
+                rule_engine_id=self.rule_engine_id
+            ).exclude(fingerprint__in=list(self.reused)).delete()
+
+            RuleNodeState.objects.bulk_create(self.computed.values())
+
+
+def node_fingerprint(node, producers):
+
+    meta = node.meta
+
+    if meta.takes_kwargs:
+        inputs = sorted(producers.items())
+    else:
+        inputs = [
+            (name, producers.get(name))
+            for name in meta.parameters
+            if name not in node.params
+        ]
+
+    payload = json.dumps(
+        [
+            node.function_name,
+            function_fingerprint(meta.func),
+            node.params,
+            inputs
+        ],
+        sort_keys=True,
+        default=str
+    )
+
+    return _digest(payload.encode())
+
+
+def function_fingerprint(func):
+
+    # Editing a function's body dirties every node using it
+    code = getattr(func, "__code__", None)
+
+    if code is None:
+        return getattr(func, "__qualname__", repr(func))
+
+    return _digest(code.co_code + repr(code.co_consts).encode())
+
+
+def value_fingerprint(value):
+
+    try:
+        return _digest(pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL))
+    except Exception:
+        return uuid.uuid4().hex
+
+
+def _sign(payload):
+
+    return _mac(payload) + payload
+
+
+def _unsign(signed):
+
+    # Unpickled payloads of a signed output, None when the signature does
+    # not match
+    mac, payload = signed[:_MAC_SIZE], signed[_MAC_SIZE:]
+
+    if not constant_time_compare(mac, _mac(payload)):
+        return None
+
+    return pickle.loads(payload)
+
+
+def _mac(payload):
+
+    return salted_hmac(_SALT, payload, algorithm="sha256").digest()
+
+
+def _digest(payload):
+
+    return hashlib.blake2b(payload, digest_size=20).hexdigest()
@@ -0,0 +1,157 @@
+import json
+import logging
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+from rest_framework.utils.encoders import JSONEncoder
+
+from .executor import GraphRuleExecutor
+from .models import RuleEngineProcessed
+from .pools import get_pool
+
+
+logger = logging.getLogger(__name__)
+
+# Asynchronous rule executions. A job is a RuleEngineProcessed row, which
+# doubles as a database-backed queue: submit_job() stores it as pending and
+# hands it to a local worker pool; run_job() claims it with a conditional
+# update so a job runs at most once even when several processes (web
+# workers, `manage.py run_rule_jobs`) look at the same queue. Jobs whose
+# worker died while running are failed by reap_stale_jobs().
+
+
+def submit_job(rule_engine_id, context=None, options=None):
+
+    job = RuleEngineProcessed.objects.create(
+        rule_engine_id=rule_engine_id,
+        status=RuleEngineProcessed.STATUS_PENDING,
+        input_context=context or {},
+        options=options or {}
+    )
+
+    transaction.on_commit(lambda: dispatch_job(job.id))
+
+    return job
+
+
+def dispatch_job(job_id):
+
+    _job_pool().submit(run_job, job_id)
+
+
+def run_job(job_id):
+
+    close_old_connections()
+
+    try:
+
+        claimed = RuleEngineProcessed.objects.filter(
+            id=job_id,
+            status=RuleEngineProcessed.STATUS_PENDING
+        ).update(
+            status=RuleEngineProcessed.STATUS_RUNNING,
+            started_at=timezone.now()
+        )
+
+        if not claimed:
+            return
+
+        job = RuleEngineProcessed.objects.get(id=job_id)
+
+        try:
+            executor = GraphRuleExecutor(
+                job.rule_engine_id,
+                context=job.input_context,
+                **job.options
+            )
+            result = _to_json(executor.execute())
+        except Exception as exc:
+            logger.exception("Rule job %s failed", job_id)
+            job.status = RuleEngineProcessed.STATUS_FAILED
+            job.error = str(exc)
+        else:
+            job.status = RuleEngineProcessed.STATUS_SUCCEEDED
+            job.result = result
+
+        job.processed_at = timezone.now()
+        job.save(update_fields=["status", "result", "error", "processed_at"])
+
+    finally:
+        close_old_connections()
+
+
+def dispatch_pending_jobs(exclude=()):
+
+    # Picks up jobs left pending, e.g. after a restart
+    job_ids = [
+        job_id
+        for job_id in RuleEngineProcessed.objects.filter(
+            status=RuleEngineProcessed.STATUS_PENDING
+        ).order_by("submitted_at").values_list("id", flat=True)
+        if job_id not in exclude
+    ]
+
+    for job_id in job_ids:
+        dispatch_job(job_id)
+
+    return job_ids
+
+
+def reap_stale_jobs(timeout=None):
+
+    # Fails jobs left running longer than RULE_ENGINE_JOB_TIMEOUT seconds,
+    # e.g. by a worker process that died mid-run. They are not re-queued:
+    # the execution may have had side effects already.
+    if timeout is None:
+        timeout = getattr(settings, "RULE_ENGINE_JOB_TIMEOUT", 3600)
+
+    if not timeout:
+        return 0
+
+    return RuleEngineProcessed.objects.filter(
+        status=RuleEngineProcessed.STATUS_RUNNING,
+        started_at__lt=timezone.now() - timedelta(seconds=timeout)
+    ).update(
+        status=RuleEngineProcessed.STATUS_FAILED,
+        error=f"Job did not finish within {timeout} seconds",
+        processed_at=timezone.now()
+    )
+
+
+def wait_for_job(job_id, timeout):
+
+    # Long-poll: returns the job once finished or when timeout expires
+    deadline = time.monotonic() + timeout
+    interval = getattr(settings, "RULE_ENGINE_JOB_POLL_INTERVAL", 0.5)
+
+    while True:
+
+        job = RuleEngineProcessed.objects.get(id=job_id)
+
+        if job.status in RuleEngineProcessed.FINISHED_STATUSES:
+            return job
+
+        remaining = deadline - time.monotonic()
+
+        if remaining <= 0:
+            return job
+
+        time.sleep(min(interval, remaining))
+
+
+def _job_pool():
+
+    return get_pool(
+        "thread",
+        getattr(settings, "RULE_ENGINE_JOB_WORKERS", 2),
+        name="jobs"
+    )
+
+
+def _to_json(value):
+
+    # Execution results may hold numpy / columnar / stream values
+    return json.loads(json.dumps(value, cls=JSONEncoder))
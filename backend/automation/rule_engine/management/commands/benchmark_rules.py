@@ -0,0 +1,169 @@
+import json
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from rule_engine.benchmark import (
+    GRAPH_SHAPES,
+    benchmark_function,
+    benchmark_functions,
+    benchmark_graph,
+    build_report,
+    compare_reports,
+    generate_claims,
+    result_key
+)
+from rule_engine.executor import EXECUTION_MODES
+from rule_engine.pools import shutdown_pools
+
+
+class Command(BaseCommand):
+
+    help = (
+        "Benchmark the rule engine on synthetic graphs and claim datasets "
+        "and optionally compare against a previous report"
+    )
+
+    def add_arguments(self, parser):
+
+        parser.add_argument(
+            "--shapes",
+            nargs="+",
+            choices=GRAPH_SHAPES,
+            default=list(GRAPH_SHAPES)
+        )
+
+        parser.add_argument(
+            "--nodes",
+            nargs="+",
+            type=int,
+            default=[10, 100],
+            help="Graph sizes (nodes per graph)"
+        )
+
+        parser.add_argument(
+            "--rows",
+            nargs="+",
+            type=int,
+            default=[1000, 10000],
+            help="Claim dataset sizes"
+        )
+
+        parser.add_argument(
+            "--modes",
+            nargs="+",
+            choices=EXECUTION_MODES,
+            default=list(EXECUTION_MODES)
+        )
+
+        parser.add_argument("--repeat", type=int, default=5)
+
+        parser.add_argument("--seed", type=int, default=0)
+
+        parser.add_argument(
+            "--skip-graphs",
+            action="store_true",
+            help="Only benchmark the validation functions"
+        )
+
+        parser.add_argument(
+            "--skip-functions",
+            action="store_true",
+            help="Only benchmark rule graphs"
+        )
+
+        parser.add_argument(
+            "--output",
+            help="Write the report as JSON to this path"
+        )
+
+        parser.add_argument(
+            "--compare",
+            help="Baseline report (JSON) to compare mean latencies against"
+        )
+
+        parser.add_argument(
+            "--max-regression",
+            type=float,
+            default=0.2,
+            help="Fail when a result is this much slower than the baseline "
+                 "(0.2 = 20%%)"
+        )
+
+    def handle(self, *args, **options):
+
+        if options["repeat"] < 1:
+            raise CommandError("--repeat must be at least 1")
+
+        results = []
+
+        try:
+            for rows in options["rows"]:
+
+                claims = generate_claims(rows, seed=options["seed"])
+
+                if not options["skip_functions"]:
+                    for function_name in benchmark_functions():
+                        results.append(self.report(benchmark_function(
+                            function_name, claims, options["repeat"]
+                        )))
+
+                if options["skip_graphs"]:
+                    continue
+
+                for shape in options["shapes"]:
+                    for size in options["nodes"]:
+                        for mode in options["modes"]:
+                            results.extend(
+                                self.report(result)
+                                for result in benchmark_graph(
+                                    shape, size, claims, mode,
+                                    options["repeat"]
+                                )
+                            )
+
+        finally:
+            shutdown_pools()
+
+        report = build_report(results)
+
+        if options["output"]:
+            Path(options["output"]).write_text(json.dumps(report, indent=2))
+            self.stdout.write(f"Report written to {options['output']}")
+
+        if options["compare"]:
+            self.compare(options["compare"], report, options["max_regression"])
+
+    def report(self, result):
+
+        self.stdout.write(
+            f"{result_key(result):<60} "
+            f"mean {result['mean_s'] * 1000:10.2f} ms  "
+            f"p95 {result['p95_s'] * 1000:10.2f} ms  "
+            f"queries {result['queries']:g}  "
+            f"peak {result['peak_memory_bytes'] / 2 ** 20:8.1f} MiB"
+        )
+
+        return result
+
+    def compare(self, path, report, max_regression):
+
+        baseline = json.loads(Path(path).read_text())
+
+        regressions = []
+
+        for key, before, after, change in compare_reports(baseline, report):
+
+            self.stdout.write(
+                f"{key:<60} {before * 1000:10.2f} -> "
+                f"{after * 1000:10.2f} ms ({change:+.1%})"
+            )
+
+            if change > max_regression:
+                regressions.append(key)
+
+        if regressions:
+            raise CommandError(
+                f"{len(regressions)} benchmark(s) regressed by more than "
+                f"{max_regression:.0%}: {', '.join(regressions)}"
+            )
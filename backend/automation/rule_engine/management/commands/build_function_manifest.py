@@ -0,0 +1,33 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from rule_engine.discovery import write_function_manifest
+
+
+class Command(BaseCommand):
+
+    help = "Write the rule function index to RULE_ENGINE_FUNCTION_MANIFEST"
+
+    def add_arguments(self, parser):
+
+        parser.add_argument(
+            "--output",
+            help="Manifest path (defaults to RULE_ENGINE_FUNCTION_MANIFEST)"
+        )
+
+    def handle(self, *args, **options):
+
+        path = options["output"] or getattr(
+            settings, "RULE_ENGINE_FUNCTION_MANIFEST", None
+        )
+
+        if not path:
+            raise CommandError(
+                "Pass --output or set RULE_ENGINE_FUNCTION_MANIFEST"
+            )
+
+        index = write_function_manifest(path)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Wrote {len(index)} functions to {path}"
+        ))
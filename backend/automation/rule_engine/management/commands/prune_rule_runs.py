@@ -0,0 +1,30 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from rule_engine.history import prune_runs
+
+
+class Command(BaseCommand):
+
+    help = (
+        "Roll up rule runs older than the retention period into daily "
+        "aggregates and delete them"
+    )
+
+    def add_arguments(self, parser):
+
+        parser.add_argument(
+            "--days",
+            type=int,
+            default=getattr(settings, "RULE_ENGINE_RUN_RETENTION_DAYS", 30),
+            help="Days of full run history to keep"
+        )
+
+    def handle(self, *args, **options):
+
+        if options["days"] < 0:
+            raise CommandError("--days cannot be negative")
+
+        removed = prune_runs(options["days"])
+
+        self.stdout.write(f"Rolled up and removed {removed} runs")
@@ -0,0 +1,54 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from rule_engine.jobs import dispatch_pending_jobs, reap_stale_jobs
+from rule_engine.pools import shutdown_pools
+
+
+class Command(BaseCommand):
+
+    help = "Run pending rule execution jobs from the database queue"
+
+    def add_arguments(self, parser):
+
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Run the jobs pending now and exit"
+        )
+
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=2.0,
+            help="Seconds between queue polls"
+        )
+
+    def handle(self, *args, **options):
+
+        dispatched = set()
+
+        try:
+            while True:
+
+                reaped = reap_stale_jobs()
+
+                if reaped:
+                    self.stdout.write(f"Failed stale jobs: {reaped}")
+
+                job_ids = dispatch_pending_jobs(exclude=dispatched)
+
+                dispatched.update(job_ids)
+
+                if job_ids:
+                    self.stdout.write(f"Dispatched jobs: {job_ids}")
+
+                if options["once"]:
+                    break
+
+                time.sleep(options["interval"])
+
+        finally:
+            # Waits for dispatched jobs to finish
+            shutdown_pools()
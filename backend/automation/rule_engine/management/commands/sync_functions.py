@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from rule_engine.registry import sync_function_registry
+
+
+class Command(BaseCommand):
+
+    help = "Sync registered rule functions to RuleLogic / ParamModel"
+
+    def handle(self, *args, **options):
+
+        summary = sync_function_registry()
+
+        if not summary["changed"]:
+            self.stdout.write("Function catalog already up to date")
+            return
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Function catalog synced: {summary['created']} created, "
+            f"{summary['updated']} updated, "
+            f"{summary['param_groups_rewritten']} param groups rewritten"
+        ))
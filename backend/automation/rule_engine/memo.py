@@ -0,0 +1,175 @@
+import hashlib
+import pickle
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+
+
+# Memoized results of pure nodes, keyed by a hash of the function name and
+# its bound arguments. Results are stored pickled: the byte size drives the
+# size limit, and every hit returns a fresh copy, so downstream nodes that
+# mutate their inputs cannot corrupt the cached value.
+
+MISS = object()
+
+
+class ResultCache:
+
+    def __init__(self, max_entries=1024, max_bytes=None, ttl=None):
+
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+
+        with self._lock:
+
+            entry = self._entries.get(key)
+
+            if entry is None:
+                return MISS
+
+            payload, expires_at = entry
+
+            if expires_at is not None and expires_at <= time.monotonic():
+                self._remove(key)
+                return MISS
+
+            self._entries.move_to_end(key)
+
+        return pickle.loads(payload)
+
+    def put(self, key, result, ttl=None):
+
+        try:
+            payload = pickle.dumps(result, protocol=pickle.HIGHEST_PROTOCOL)
+        except Exception:
+            return False
+
+        if self.max_bytes is not None and len(payload) > self.max_bytes:
+            return False
+
+        ttl = ttl if ttl is not None else self.ttl
+        expires_at = time.monotonic() + ttl if ttl is not None else None
+
+        with self._lock:
+
+            if key in self._entries:
+                self._remove(key)
+
+            self._entries[key] = (payload, expires_at)
+            self._bytes += len(payload)
+
+            while len(self._entries) > self.max_entries or (
+                self.max_bytes is not None and self._bytes > self.max_bytes
+            ):
+                self._remove(next(iter(self._entries)))
+
+        return True
+
+    def clear(self):
+
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+
+        with self._lock:
+            return {"entries": len(self._entries), "bytes": self._bytes}
+
+    def _remove(self, key):
+
+        payload, _ = self._entries.pop(key)
+        self._bytes -= len(payload)
+
+
+class Fingerprints:
+
+    # Content fingerprints of argument values for one execution. Each
+    # object is pickled and hashed at most once, however many pure nodes
+    # read it, and outputs of memoized nodes are fingerprinted by their
+    # memo key instead of their content. Values are assumed not to be
+    # modified in place once bound (see rule_engine.records).
+
+    def __init__(self):
+
+        # id -> (value, fingerprint); holding the value keeps the id valid
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def get(self, value):
+
+        with self._lock:
+            entry = self._values.get(id(value))
+
+        if entry is not None:
+            return entry[1]
+
+        fingerprint = _digest(
+            pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        )
+
+        with self._lock:
+            self._values[id(value)] = (value, fingerprint)
+
+        return fingerprint
+
+    def derive(self, key, result):
+
+        # A memoized result is determined by its key
+        with self._lock:
+            for name, value in (result or {}).items():
+                self._values[id(value)] = (
+                    value, _digest(f"{key}:{name}".encode())
+                )
+
+
+def make_key(function_name, kwargs, fingerprints):
+
+    # None when the arguments cannot be hashed (e.g. lazy streams)
+    try:
+        arguments = sorted(
+            (name, fingerprints.get(value))
+            for name, value in kwargs.items()
+            if name != "context"
+        )
+    except Exception:
+        return None
+
+    return _digest(repr((function_name, arguments)).encode())
+
+
+def _digest(payload):
+
+    return hashlib.blake2b(payload, digest_size=16).hexdigest()
+
+
+_RESULT_CACHE = None
+
+_RESULT_CACHE_LOCK = threading.Lock()
+
+
+def get_result_cache():
+
+    global _RESULT_CACHE
+
+    with _RESULT_CACHE_LOCK:
+
+        if _RESULT_CACHE is None:
+            _RESULT_CACHE = ResultCache(
+                max_entries=getattr(
+                    settings, "RULE_ENGINE_MEMO_MAX_ENTRIES", 1024
+                ),
+                max_bytes=getattr(settings, "RULE_ENGINE_MEMO_MAX_BYTES", None),
+                ttl=getattr(settings, "RULE_ENGINE_MEMO_TTL", None)
+            )
+
+        return _RESULT_CACHE
@@ -0,0 +1,242 @@
+import threading
+import time
+import tracemalloc
+from bisect import bisect_left
+
+from .streaming import ChunkStream
+
+
+# Per-node profiling and process-wide metrics. Every node call is timed
+# (wall and CPU time of the executing thread) and, optionally, traced for
+# allocated memory. Profiles are added to the execution log and aggregated
+# into per-function histograms served in the Prometheus text format by the
+# metrics endpoint. Metrics are kept per process; scrape every worker.
+
+DURATION_BUCKETS = (
+    0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60
+)
+
+ROW_BUCKETS = (
+    0, 10, 100, 1000, 10000, 100000, 1000000, 10000000
+)
+
+MEMORY_BUCKETS = tuple(2 ** power for power in range(10, 34, 2))
+
+# name -> (help, buckets, profile field, scale)
+NODE_HISTOGRAMS = {
+    "rule_engine_node_duration_seconds": (
+        "Wall time of rule node executions", DURATION_BUCKETS,
+        "wall_ms", 0.001
+    ),
+    "rule_engine_node_cpu_seconds": (
+        "CPU time of rule node executions", DURATION_BUCKETS,
+        "cpu_ms", 0.001
+    ),
+    "rule_engine_node_input_rows": (
+        "Rows in the list arguments of rule node executions", ROW_BUCKETS,
+        "input_rows", 1
+    ),
+    "rule_engine_node_output_rows": (
+        "Rows in the list outputs of rule node executions", ROW_BUCKETS,
+        "output_rows", 1
+    ),
+    "rule_engine_node_memory_bytes": (
+        "Peak memory allocated by rule node executions", MEMORY_BUCKETS,
+        "memory_bytes", 1
+    ),
+}
+
+
+class Histogram:
+
+    __slots__ = ("buckets", "counts", "count", "sum")
+
+    def __init__(self, buckets):
+
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0
+
+    def observe(self, value):
+
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def cumulative(self):
+
+        # [(le, cumulative count)] including +Inf
+        total = 0
+        points = []
+
+        for bound, count in zip((*self.buckets, "+Inf"), self.counts):
+            total += count
+            points.append((bound, total))
+
+        return points
+
+
+_LOCK = threading.Lock()
+
+# (function, source) -> count; source is executed, cached or reused
+_NODE_RESULTS = {}
+
+# (histogram name, function) -> Histogram
+_HISTOGRAMS = {}
+
+# Held for the duration of memory-traced calls
+_MEMORY_LOCK = threading.RLock()
+
+
+def timed_call(function, kwargs, memory=False):
+
+    # (result, profile) of function(**kwargs); runs in the worker thread
+    # or process so CPU time is the executing thread's own
+    if not memory:
+        return _timed_call(function, kwargs, False)
+
+    # tracemalloc's start / reset_peak / stop act on the whole process, so
+    # traced calls run one at a time. Allocations of other threads still
+    # count towards the peak of the call being traced.
+    with _MEMORY_LOCK:
+        return _timed_call(function, kwargs, True)
+
+
+def _timed_call(function, kwargs, memory):
+
+    profile = {"input_rows": row_counts(kwargs, exclude=("context",))}
+
+    tracing = memory and not tracemalloc.is_tracing()
+
+    if tracing:
+        tracemalloc.start()
+
+    if memory:
+        tracemalloc.reset_peak()
+        baseline = tracemalloc.get_traced_memory()[0]
+
+    wall = time.perf_counter()
+    cpu = time.thread_time()
+
+    try:
+        result = function(**kwargs)
+    finally:
+        profile["wall_ms"] = round((time.perf_counter() - wall) * 1000, 3)
+        profile["cpu_ms"] = round((time.thread_time() - cpu) * 1000, 3)
+
+        if memory:
+            profile["memory_bytes"] = max(
+                0, tracemalloc.get_traced_memory()[1] - baseline
+            )
+
+        if tracing:
+            tracemalloc.stop()
+
+    return result, profile
+
+
+def row_counts(values, exclude=()):
+
+    # Row counts of the list-like values; scalars and lazy streams are left out
+    return {
+        key: len(value)
+        for key, value in values.items()
+        if key not in exclude
+        and hasattr(value, "__len__")
+        and not isinstance(value, (str, bytes, dict, ChunkStream))
+    }
+
+
+def observe_node(function_name, source, profile=None):
+
+    with _LOCK:
+
+        key = (function_name, source)
+        _NODE_RESULTS[key] = _NODE_RESULTS.get(key, 0) + 1
+
+        if profile is None:
+            return
+
+        for name, (_, buckets, field, scale) in NODE_HISTOGRAMS.items():
+
+            value = profile.get(field)
+
+            if value is None:
+                continue
+
+            if isinstance(value, dict):
+                value = sum(value.values())
+
+            histogram = _HISTOGRAMS.get((name, function_name))
+
+            if histogram is None:
+                histogram = _HISTOGRAMS[(name, function_name)] = Histogram(
+                    buckets
+                )
+
+            histogram.observe(value * scale)
+
+
+def render_metrics():
+
+    lines = [
+        "# HELP rule_engine_node_results_total Rule node results by source "
+        "(executed, cached by the memo, reused from an incremental run)",
+        "# TYPE rule_engine_node_results_total counter",
+    ]
+
+    with _LOCK:
+
+        for (function_name, source), count in sorted(_NODE_RESULTS.items()):
+            lines.append(
+                f"rule_engine_node_results_total{{"
+                f"{_labels(function=function_name, source=source)}}} {count}"
+            )
+
+        for name, (help_text, *_) in NODE_HISTOGRAMS.items():
+
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} histogram")
+
+            for (histogram_name, function_name), histogram in sorted(
+                _HISTOGRAMS.items(), key=lambda item: item[0]
+            ):
+                if histogram_name != name:
+                    continue
+
+                labels = _labels(function=function_name)
+
+                for bound, count in histogram.cumulative():
+                    lines.append(
+                        f'{name}_bucket{{{labels},le="{bound}"}} {count}'
+                    )
+
+                lines.append(f"{name}_sum{{{labels}}} {histogram.sum}")
+                lines.append(f"{name}_count{{{labels}}} {histogram.count}")
+
+    return "\n".join(lines) + "\n"
+
+
+def reset_metrics():
+
+    with _LOCK:
+        _NODE_RESULTS.clear()
+        _HISTOGRAMS.clear()
+
+
+def _labels(**labels):
+
+    return ",".join(
+        f'{key}="{_escape(value)}"' for key, value in labels.items()
+    )
+
+
+def _escape(value):
+
+    return (
+        str(value)
+        .replace("\\", "\\\\")
+        .replace("\n", "\\n")
+        .replace('"', '\\"')
+    )
@@ -0,0 +1,65 @@
+# Generated by Django 5.2.11 on 2026-10-18 15:36
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rule_engine', '0002_ruleedge'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ruleengineprocessed',
+            name='error',
+            field=models.TextField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='ruleengineprocessed',
+            name='input_context',
+            field=models.JSONField(default=dict),
+        ),
+        migrations.AddField(
+            model_name='ruleengineprocessed',
+            name='options',
+            field=models.JSONField(default=dict),
+        ),
+        migrations.AddField(
+            model_name='ruleengineprocessed',
+            name='result',
+            field=models.JSONField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='ruleengineprocessed',
+            name='started_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='ruleengineprocessed',
+            name='status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('running', 'Running'), ('succeeded', 'Succeeded'), ('failed', 'Failed')], default='succeeded', max_length=20),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='ruleengineprocessed',
+            name='submitted_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.AlterField(
+            model_name='ruleengineprocessed',
+            name='processed_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        # rows recorded before jobs existed are finished runs
+        migrations.AlterField(
+            model_name='ruleengineprocessed',
+            name='status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('running', 'Running'), ('succeeded', 'Succeeded'), ('failed', 'Failed')], default='pending', max_length=20),
+        ),
+        migrations.AddIndex(
+            model_name='ruleengineprocessed',
+            index=models.Index(fields=['status', 'submitted_at'], name='rule_job_status_idx'),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.11 on 2026-10-18 15:41
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rule_engine', '0003_rule_engine_processed_jobs'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RuleNodeState',
+            fields=[
+                ('id', models.AutoField(primary_key=True, serialize=False)),
+                ('fingerprint', models.CharField(max_length=64)),
+                ('output', models.BinaryField()),
+                ('output_fingerprints', models.JSONField(default=dict)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('rule_engine', models.ForeignKey(db_column='rule_engine_id', on_delete=django.db.models.deletion.CASCADE, to='rule_engine.ruleengine')),
+            ],
+            options={
+                'db_table': 'rule_node_state',
+                'indexes': [models.Index(fields=['rule_engine', 'fingerprint'], name='rule_node_state_fp_idx')],
+            },
+        ),
+    ]
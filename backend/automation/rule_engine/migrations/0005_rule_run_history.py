@@ -0,0 +1,91 @@
+# Generated by Django 5.2.11 on 2026-10-18 15:47
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rule_engine', '0004_rule_node_state'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RuleRun',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('status', models.CharField(choices=[('succeeded', 'Succeeded'), ('failed', 'Failed')], max_length=20)),
+                ('mode', models.CharField(max_length=20)),
+                ('started_at', models.DateTimeField()),
+                ('duration_ms', models.FloatField()),
+                ('cpu_ms', models.FloatField(default=0)),
+                ('nodes_executed', models.IntegerField(default=0)),
+                ('nodes_cached', models.IntegerField(default=0)),
+                ('nodes_reused', models.IntegerField(default=0)),
+                ('input_rows', models.JSONField(default=dict)),
+                ('output_rows', models.JSONField(default=dict)),
+                ('error', models.TextField(blank=True, null=True)),
+                ('rule_engine', models.ForeignKey(db_column='rule_engine_id', on_delete=django.db.models.deletion.CASCADE, to='rule_engine.ruleengine')),
+            ],
+            options={
+                'db_table': 'rule_run',
+            },
+        ),
+        migrations.CreateModel(
+            name='RuleNodeRun',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('node_id', models.IntegerField()),
+                ('function_name', models.CharField(max_length=255)),
+                ('source', models.CharField(max_length=10)),
+                ('wall_ms', models.FloatField(null=True)),
+                ('cpu_ms', models.FloatField(null=True)),
+                ('input_rows', models.BigIntegerField(null=True)),
+                ('output_rows', models.BigIntegerField(null=True)),
+                ('memory_bytes', models.BigIntegerField(null=True)),
+                ('run', models.ForeignKey(db_column='rule_run_id', on_delete=django.db.models.deletion.CASCADE, related_name='nodes', to='rule_engine.rulerun')),
+            ],
+            options={
+                'db_table': 'rule_node_run',
+            },
+        ),
+        migrations.CreateModel(
+            name='RuleRunDaily',
+            fields=[
+                ('id', models.AutoField(primary_key=True, serialize=False)),
+                ('day', models.DateField()),
+                ('runs', models.IntegerField(default=0)),
+                ('failures', models.IntegerField(default=0)),
+                ('duration_total_ms', models.FloatField(default=0)),
+                ('duration_max_ms', models.FloatField(default=0)),
+                ('duration_p50_ms', models.FloatField(default=0)),
+                ('duration_p95_ms', models.FloatField(default=0)),
+                ('nodes_executed', models.BigIntegerField(default=0)),
+                ('rule_engine', models.ForeignKey(db_column='rule_engine_id', on_delete=django.db.models.deletion.CASCADE, to='rule_engine.ruleengine')),
+            ],
+            options={
+                'db_table': 'rule_run_daily',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='rulerun',
+            index=models.Index(fields=['rule_engine', 'started_at'], name='rule_run_rule_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='rulerun',
+            index=models.Index(fields=['status', 'started_at'], name='rule_run_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='rulerun',
+            index=models.Index(fields=['started_at'], name='rule_run_started_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='rulenoderun',
+            index=models.Index(fields=['function_name', 'run'], name='rule_node_run_function_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='rulerundaily',
+            constraint=models.UniqueConstraint(fields=('rule_engine', 'day'), name='rule_run_daily_unique'),
+        ),
+    ]
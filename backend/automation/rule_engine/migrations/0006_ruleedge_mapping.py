@@ -0,0 +1,18 @@
+# Generated by Django 5.2.11 on 2026-10-18 17:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rule_engine', '0005_rule_run_history'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ruleedge',
+            name='mapping',
+            field=models.JSONField(blank=True, null=True),
+        ),
+    ]
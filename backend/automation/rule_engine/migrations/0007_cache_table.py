@@ -0,0 +1,27 @@
+from django.core.management import call_command
+from django.db import migrations
+
+
+# The rule engine's plan revisions and function catalog live in the
+# Django cache. With the database cache backend (see settings.CACHES) its
+# table must exist before the post-migrate registry sync writes to it;
+# createcachetable skips existing tables and non-database backends.
+
+def create_cache_table(apps, schema_editor):
+
+    call_command(
+        "createcachetable",
+        database=schema_editor.connection.alias,
+        verbosity=0
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rule_engine', '0006_ruleedge_mapping'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_cache_table, migrations.RunPython.noop),
+    ]
@@ -1,4 +1,5 @@
 from django.db import models
+from django.utils import timezone
 
 
 class ParamModel(models.Model):
@@ -49,6 +50,14 @@ class RuleEdge(models.Model):
     context["fraud_score"] < 50
     """
 
+    # Dataflow mode: {target input: source output}; None wires every
+    # output of the source to the target input of the same name and {}
+    # passes nothing. Rules with mappings only run in dataflow mode.
+    mapping = models.JSONField(
+        null=True,
+        blank=True
+    )
+
 
 
 class RuleLogic(models.Model):
@@ -108,6 +117,22 @@ class RuleList(models.Model):
 
 class RuleEngineProcessed(models.Model):
 
+    # One execution job of a rule engine (see rule_engine.jobs)
+
+    STATUS_PENDING = "pending"
+    STATUS_RUNNING = "running"
+    STATUS_SUCCEEDED = "succeeded"
+    STATUS_FAILED = "failed"
+
+    STATUS_CHOICES = [
+        (STATUS_PENDING, "Pending"),
+        (STATUS_RUNNING, "Running"),
+        (STATUS_SUCCEEDED, "Succeeded"),
+        (STATUS_FAILED, "Failed"),
+    ]
+
+    FINISHED_STATUSES = (STATUS_SUCCEEDED, STATUS_FAILED)
+
     id = models.AutoField(primary_key=True)
 
     rule_engine = models.ForeignKey(
@@ -116,7 +141,205 @@ class RuleEngineProcessed(models.Model):
         db_column="rule_engine_id"
     )
 
-    processed_at = models.DateTimeField()
+    status = models.CharField(
+        max_length=20,
+        choices=STATUS_CHOICES,
+        default=STATUS_PENDING
+    )
+
+    submitted_at = models.DateTimeField(default=timezone.now)
+
+    started_at = models.DateTimeField(null=True, blank=True)
+
+    # completion time
+    processed_at = models.DateTimeField(null=True, blank=True)
+
+    # run inputs and executor options (mode, trace, ...)
+    input_context = models.JSONField(default=dict)
+
+    options = models.JSONField(default=dict)
+
+    result = models.JSONField(null=True, blank=True)
+
+    error = models.TextField(null=True, blank=True)
 
     class Meta:
         db_table = "rule_engine_processed"
+        indexes = [
+            models.Index(
+                fields=["status", "submitted_at"],
+                name="rule_job_status_idx"
+            ),
+        ]
+
+
+class RuleNodeState(models.Model):
+
+    # Persisted node output of the latest incremental run of a rule
+    # (see rule_engine.incremental)
+
+    id = models.AutoField(primary_key=True)
+
+    rule_engine = models.ForeignKey(
+        RuleEngine,
+        on_delete=models.CASCADE,
+        db_column="rule_engine_id"
+    )
+
+    # hash of function, params and input fingerprints
+    fingerprint = models.CharField(max_length=64)
+
+    # signed pickle of {output name: pickled value}
+    output = models.BinaryField()
+
+    output_fingerprints = models.JSONField(default=dict)
+
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = "rule_node_state"
+        indexes = [
+            models.Index(
+                fields=["rule_engine", "fingerprint"],
+                name="rule_node_state_fp_idx"
+            ),
+        ]
+
+
+class RuleRun(models.Model):
+
+    # One recorded execution of a rule engine (see rule_engine.history)
+
+    STATUS_SUCCEEDED = "succeeded"
+    STATUS_FAILED = "failed"
+
+    STATUS_CHOICES = [
+        (STATUS_SUCCEEDED, "Succeeded"),
+        (STATUS_FAILED, "Failed"),
+    ]
+
+    id = models.BigAutoField(primary_key=True)
+
+    rule_engine = models.ForeignKey(
+        RuleEngine,
+        on_delete=models.CASCADE,
+        db_column="rule_engine_id"
+    )
+
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES)
+
+    mode = models.CharField(max_length=20)
+
+    started_at = models.DateTimeField()
+
+    duration_ms = models.FloatField()
+
+    # summed over node calls
+    cpu_ms = models.FloatField(default=0)
+
+    nodes_executed = models.IntegerField(default=0)
+
+    nodes_cached = models.IntegerField(default=0)
+
+    nodes_reused = models.IntegerField(default=0)
+
+    # row counts of list values in the input and final context
+    input_rows = models.JSONField(default=dict)
+
+    output_rows = models.JSONField(default=dict)
+
+    error = models.TextField(null=True, blank=True)
+
+    class Meta:
+        db_table = "rule_run"
+        indexes = [
+            models.Index(
+                fields=["rule_engine", "started_at"],
+                name="rule_run_rule_idx"
+            ),
+            models.Index(
+                fields=["status", "started_at"],
+                name="rule_run_status_idx"
+            ),
+            models.Index(
+                fields=["started_at"],
+                name="rule_run_started_idx"
+            ),
+        ]
+
+
+class RuleNodeRun(models.Model):
+
+    id = models.BigAutoField(primary_key=True)
+
+    run = models.ForeignKey(
+        RuleRun,
+        on_delete=models.CASCADE,
+        related_name="nodes",
+        db_column="rule_run_id"
+    )
+
+    # RuleList id; kept as a plain column so history survives graph edits
+    node_id = models.IntegerField()
+
+    function_name = models.CharField(max_length=255)
+
+    # executed, cached or reused
+    source = models.CharField(max_length=10)
+
+    wall_ms = models.FloatField(null=True)
+
+    cpu_ms = models.FloatField(null=True)
+
+    input_rows = models.BigIntegerField(null=True)
+
+    output_rows = models.BigIntegerField(null=True)
+
+    memory_bytes = models.BigIntegerField(null=True)
+
+    class Meta:
+        db_table = "rule_node_run"
+        indexes = [
+            models.Index(
+                fields=["function_name", "run"],
+                name="rule_node_run_function_idx"
+            ),
+        ]
+
+
+class RuleRunDaily(models.Model):
+
+    # Daily rollup of runs removed by `manage.py prune_rule_runs`
+
+    id = models.AutoField(primary_key=True)
+
+    rule_engine = models.ForeignKey(
+        RuleEngine,
+        on_delete=models.CASCADE,
+        db_column="rule_engine_id"
+    )
+
+    day = models.DateField()
+
+    runs = models.IntegerField(default=0)
+
+    failures = models.IntegerField(default=0)
+
+    duration_total_ms = models.FloatField(default=0)
+
+    duration_max_ms = models.FloatField(default=0)
+
+    duration_p50_ms = models.FloatField(default=0)
+
+    duration_p95_ms = models.FloatField(default=0)
+
+    nodes_executed = models.BigIntegerField(default=0)
+
+    class Meta:
+        db_table = "rule_run_daily"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["rule_engine", "day"],
+                name="rule_run_daily_unique"
+            ),
+        ]
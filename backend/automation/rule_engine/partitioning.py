@@ -0,0 +1,299 @@
+from collections import namedtuple
+
+import numpy as np
+
+from .columnar import ClaimBatch
+from .context import ExecutionContext
+from .metrics import timed_call
+from .plan import wire_inputs
+from .registry import get_function_meta
+from .shared import (
+    SharedBatch, concat_results, export_result, load_result, load_value
+)
+
+
+# Data-parallel execution of row-wise segments in dataflow mode. A segment
+# is a group of chunk-safe nodes with only list outputs: its head may be
+# fed by anything, every other node only by unconditional edges from
+# nodes of the same segment. When the head is reached its list input is
+# cut into shards, each shard runs the whole segment on a pool worker, and
+# the outputs of every node are concatenated in shard order - for
+# chunk-safe functions the same outputs as one run over the whole list.
+# The executor records the precomputed results as the segment's nodes
+# become ready, so conditions, tracing and the freeing of outputs work as
+# they do for any other node.
+
+Segment = namedtuple("Segment", ["head", "steps", "split"])
+
+# A segment node as sent to the workers. sources: the node's incoming
+# edges, as (source id, mapping); chunk_input: the argument it is sliced on
+Step = namedtuple(
+    "Step", ["node_id", "function_name", "params", "sources", "chunk_input"]
+)
+
+Source = namedtuple("Source", ["source_id", "mapping"])
+
+
+def find_segments(plan):
+
+    # head id -> Segment for the chunk-safe nodes of an acyclic plan
+    heads = {}
+
+    for node_id in plan.order:
+
+        node = plan.nodes[node_id]
+
+        # A chunk input fixed by the node's params is never sliced
+        if not partitionable(node.meta) or (
+            node.meta.chunk_input in node.params
+        ):
+            continue
+
+        edges = plan.incoming.get(node_id, ())
+        sources = {heads.get(edge.source_id) for edge in edges}
+
+        if edges and len(sources) == 1 and None not in sources and all(
+            edge.condition is None for edge in edges
+        ):
+            heads[node_id] = sources.pop()
+        else:
+            heads[node_id] = node_id
+
+    members = {}
+
+    for node_id, head in heads.items():
+        members.setdefault(head, []).append(node_id)
+
+    return {
+        head: _segment(plan, node_ids) for head, node_ids in members.items()
+    }
+
+
+def partitionable(meta):
+
+    outputs = meta.list_outputs
+
+    return bool(
+        meta.chunk_safe
+        and not meta.is_async
+        and meta.chunk_input is not None
+        and outputs
+        and len(outputs) == len(meta.outputs)
+    )
+
+
+def _segment(plan, node_ids):
+
+    steps = []
+
+    # Initial inputs other nodes are sliced on, because no node of the
+    # segment provides them
+    split = []
+
+    for index, node_id in enumerate(node_ids):
+
+        node = plan.nodes[node_id]
+        chunk_input = node.meta.chunk_input
+
+        sources = () if index == 0 else tuple(
+            Source(edge.source_id, edge.mapping)
+            for edge in plan.incoming.get(node_id, ())
+        )
+
+        provided = set()
+
+        for source in sources:
+            if source.mapping is None:
+                provided.update(
+                    plan.nodes[source.source_id].meta.list_outputs
+                )
+            else:
+                provided.update(name for name, _ in source.mapping)
+
+        if index and chunk_input not in provided and (
+            chunk_input not in split
+        ):
+            split.append(chunk_input)
+
+        steps.append(Step(
+            node_id, node.function_name, node.params, sources, chunk_input
+        ))
+
+    return Segment(plan.nodes[node_ids[0]], tuple(steps), tuple(split))
+
+
+def split_segment(
+    segment, head_inputs, inputs, max_workers, partition_rows, shared=None
+):
+
+    # [(head inputs, inputs)] per shard, None when the head's list input is
+    # too small to be worth splitting. ClaimBatch values are shared once
+    # and cut into row ranges of the same file when `shared` is given.
+    value = head_inputs.get(segment.steps[0].chunk_input)
+
+    if not _splittable(value):
+        return None
+
+    parts = min(max_workers, -(-len(value) // partition_rows))
+
+    if parts < 2:
+        return None
+
+    heads = [
+        {**head_inputs, segment.steps[0].chunk_input: shard}
+        for shard in _split(value, parts, shared)
+    ]
+
+    # Non-head nodes only read the initial inputs and their sources
+    if len(segment.steps) == 1:
+        return [(head, {}) for head in heads]
+
+    shards = [dict(inputs) for _ in range(parts)]
+
+    for key in segment.split:
+
+        if not _splittable(inputs.get(key)):
+            continue
+
+        for shard, part in zip(shards, _split(inputs[key], parts, shared)):
+            shard[key] = part
+
+    return list(zip(heads, shards))
+
+
+def submit_segment(pool, segment, shards, min_rows=None):
+
+    return SegmentCall(
+        segment,
+        [
+            pool.submit(run_shard, segment.steps, head, inputs, min_rows)
+            for head, inputs in shards
+        ]
+    )
+
+
+class SegmentCall:
+
+    # Future of node id -> (result, profile) for every node of a segment
+
+    def __init__(self, segment, futures):
+
+        self.segment = segment
+        self.futures = futures
+
+    def result(self):
+
+        shards = []
+
+        # Every shard is awaited and loaded, so a failing one does not
+        # leave output files of the others behind
+        error = None
+
+        for future in self.futures:
+            try:
+                shard = future.result()
+            except Exception as exc:
+                error = error or exc
+                continue
+            shards.append({
+                node_id: (load_result(result), profile)
+                for node_id, (result, profile) in shard.items()
+            })
+
+        if error is not None:
+            raise error
+
+        return {
+            step.node_id: (
+                concat_results([
+                    shard[step.node_id][0] or {} for shard in shards
+                ]),
+                _merge_profiles(
+                    [shard[step.node_id][1] for shard in shards],
+                    step.chunk_input
+                )
+            )
+            for step in self.segment.steps
+        }
+
+
+def run_shard(steps, head_inputs, inputs, min_rows=None):
+
+    # Worker side: runs the nodes of a segment over one shard and returns
+    # node id -> (result, profile). With min_rows, ClaimBatch outputs of
+    # that size go back through shared memory.
+    head_inputs = {
+        key: load_value(value) for key, value in head_inputs.items()
+    }
+    inputs = {key: load_value(value) for key, value in inputs.items()}
+
+    outputs = {}
+    results = {}
+
+    for index, step in enumerate(steps):
+
+        meta = get_function_meta(step.function_name)
+
+        values = head_inputs if index == 0 else wire_inputs(
+            inputs, step.sources, outputs
+        )
+
+        result, profile = timed_call(
+            meta.func, meta.binder(step.params)(ExecutionContext(values))
+        )
+
+        outputs[step.node_id] = result or {}
+        results[step.node_id] = (result, profile)
+
+    if min_rows is None:
+        return results
+
+    return {
+        node_id: (export_result(result, min_rows), profile)
+        for node_id, (result, profile) in results.items()
+    }
+
+
+def _splittable(value):
+
+    return isinstance(value, (list, ClaimBatch, SharedBatch)) and (
+        len(value) > 0
+    )
+
+
+def _split(value, parts, shared):
+
+    if shared is not None:
+        value = shared.share(value)
+
+    if isinstance(value, SharedBatch):
+        return value.partition(parts)
+
+    bounds = np.linspace(0, len(value), parts + 1).astype(int)
+
+    if isinstance(value, ClaimBatch):
+        return [
+            value.slice(start, stop)
+            for start, stop in zip(bounds[:-1], bounds[1:])
+        ]
+
+    return [value[start:stop] for start, stop in zip(bounds[:-1], bounds[1:])]
+
+
+def _merge_profiles(profiles, chunk_input):
+
+    # Rows of the sliced argument add up across shards; the others were
+    # passed whole to every shard
+    input_rows = dict(profiles[0]["input_rows"])
+
+    if chunk_input in input_rows:
+        input_rows[chunk_input] = sum(
+            profile["input_rows"].get(chunk_input, 0) for profile in profiles
+        )
+
+    return {
+        "input_rows": input_rows,
+        "wall_ms": max(profile["wall_ms"] for profile in profiles),
+        "cpu_ms": round(sum(profile["cpu_ms"] for profile in profiles), 3),
+        "partitions": len(profiles)
+    }
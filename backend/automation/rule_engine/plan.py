@@ -0,0 +1,285 @@
+import threading
+import uuid
+from collections import OrderedDict, namedtuple
+from types import MappingProxyType
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .conditions import ConditionError, compile_condition
+from .models import RuleList, RuleEdge
+from .registry import get_function_meta
+from .utils import topological_sort
+
+
+# Compiled, immutable view of a rule graph. Built once per rule_engine_id
+# and shared by every execution, so a warm run only reads the rule's
+# revision token from the cache.
+
+class GraphCycleError(ValueError):
+    pass
+
+
+class PlanModeError(ValueError):
+    pass
+
+
+PlanNode = namedtuple(
+    "PlanNode",
+    ["id", "function_name", "function", "meta", "params", "bind"]
+)
+
+# mapping: ((input name, output name), ...) wiring source outputs to
+# target inputs in dataflow mode, None to wire outputs by name. An empty
+# mapping passes nothing.
+PlanEdge = namedtuple(
+    "PlanEdge",
+    ["source_id", "target", "condition", "mapping"]
+)
+
+
+class ExecutionPlan:
+
+    __slots__ = (
+        "rule_engine_id", "nodes", "adjacency", "start_nodes",
+        "in_degree", "incoming", "order", "acyclic", "mapped"
+    )
+
+    def __init__(self, rule_engine_id, nodes, adjacency, start_nodes):
+
+        object.__setattr__(self, "rule_engine_id", rule_engine_id)
+        object.__setattr__(self, "nodes", MappingProxyType(nodes))
+        object.__setattr__(self, "adjacency", MappingProxyType(adjacency))
+        object.__setattr__(self, "start_nodes", tuple(start_nodes))
+
+        in_degree = dict.fromkeys(nodes, 0)
+        incoming = {}
+
+        # Incoming edges are kept in plan order of their sources
+        for source_id in nodes:
+            for edge in adjacency.get(source_id, ()):
+                in_degree[edge.target.id] += 1
+                incoming.setdefault(edge.target.id, []).append(edge)
+
+        order = topological_sort(
+            [{"id": node_id} for node_id in nodes],
+            [
+                {"source": edge.source_id, "target": edge.target.id}
+                for out_edges in adjacency.values()
+                for edge in out_edges
+            ]
+        )
+
+        object.__setattr__(self, "in_degree", MappingProxyType(in_degree))
+        object.__setattr__(self, "incoming", MappingProxyType({
+            node_id: tuple(in_edges)
+            for node_id, in_edges in incoming.items()
+        }))
+
+        # Topological order of node ids; nodes on cycles are left out
+        object.__setattr__(self, "order", tuple(order))
+        object.__setattr__(self, "acyclic", len(order) == len(nodes))
+
+        # Edge mappings are only applied in dataflow mode
+        object.__setattr__(self, "mapped", any(
+            edge.mapping is not None
+            for out_edges in adjacency.values()
+            for edge in out_edges
+        ))
+
+    def __setattr__(self, name, value):
+        raise AttributeError("ExecutionPlan is immutable")
+
+    def __len__(self):
+        return len(self.nodes)
+
+
+def compile_plan(rule_engine_id):
+
+    rule_nodes = RuleList.objects.filter(
+        rule_engine_id=rule_engine_id
+    ).select_related("rule_logic")
+
+    edges = RuleEdge.objects.filter(
+        rule_engine_id=rule_engine_id
+    ).values_list("source_id", "target_id", "condition", "mapping")
+
+    return build_plan(
+        rule_engine_id,
+        [
+            (rule_node.id, rule_node.rule_logic.function_name, rule_node.params)
+            for rule_node in rule_nodes
+        ],
+        edges
+    )
+
+
+def build_plan(rule_engine_id, node_specs, edges):
+
+    # node_specs: (id, function_name, params) in execution order
+    # edges: (source_id, target_id, condition, mapping)
+    # Also used for graphs that are not stored
+
+    nodes = {}
+
+    for node_id, function_name, params in node_specs:
+
+        meta = get_function_meta(function_name)
+
+        nodes[node_id] = PlanNode(
+            id=node_id,
+            function_name=function_name,
+            function=meta.func,
+            meta=meta,
+            params=params or {},
+            bind=meta.binder(params)
+        )
+
+    # Build adjacency list
+    adjacency = {}
+    incoming = set()
+
+    for source_id, target_id, condition, mapping in edges:
+
+        adjacency.setdefault(source_id, []).append(
+            PlanEdge(
+                source_id=source_id,
+                target=nodes[target_id],
+                condition=_compile_edge_condition(condition),
+                mapping=(
+                    None if mapping is None else tuple(mapping.items())
+                )
+            )
+        )
+
+        incoming.add(target_id)
+
+    # Start nodes = no incoming edges
+    start_nodes = [
+        node for node_id, node in nodes.items()
+        if node_id not in incoming
+    ]
+
+    return ExecutionPlan(
+        rule_engine_id,
+        nodes,
+        {
+            source_id: tuple(out_edges)
+            for source_id, out_edges in adjacency.items()
+        },
+        start_nodes
+    )
+
+
+def wire_inputs(inputs, edges, outputs):
+
+    # Dataflow inputs of a node: the initial inputs, then the outputs of
+    # every upstream node that ran (outputs: source id -> result), in the
+    # order of `edges`. A mapped edge passes only the outputs it names,
+    # under the target's input names.
+    values = dict(inputs)
+
+    for edge in edges:
+
+        result = outputs.get(edge.source_id)
+
+        if not result:
+            continue
+
+        if edge.mapping is None:
+            values.update(result)
+            continue
+
+        for name, output in edge.mapping:
+            if output in result:
+                values[name] = result[output]
+
+    return values
+
+
+def _never(context):
+    return False
+
+
+def _compile_edge_condition(condition):
+
+    # Rules saved before conditions were validated may still hold
+    # expressions that do not compile; those edges are never taken.
+    try:
+        return compile_condition(condition)
+    except ConditionError:
+        return _never
+
+
+# -------- PROCESS LEVEL PLAN CACHE (LRU) --------
+
+# Every worker keeps its own compiled plans. Each entry remembers the rule's
+# revision token, kept in the Django cache and replaced by invalidate_plan(),
+# so an invalidation in one worker makes every other worker recompile on its
+# next run. This requires a cache shared by all workers; settings.CACHES
+# configures one (a per-process cache would leave other workers stale).
+
+PLAN_REVISION_KEY = "rule_engine:plan_revision:{}"
+
+PLAN_GENERATION_KEY = "rule_engine:plan_generation"
+
+_PLAN_CACHE = OrderedDict()
+
+_PLAN_CACHE_LOCK = threading.Lock()
+
+
+def get_plan(rule_engine_id):
+
+    revision = _plan_revision(rule_engine_id)
+
+    with _PLAN_CACHE_LOCK:
+
+        entry = _PLAN_CACHE.get(rule_engine_id)
+
+        if entry is not None and entry[0] == revision:
+            _PLAN_CACHE.move_to_end(rule_engine_id)
+            return entry[1]
+
+    plan = compile_plan(rule_engine_id)
+
+    # Unknown / empty rules are not cached
+    if not plan:
+        return plan
+
+    max_size = getattr(settings, "RULE_ENGINE_PLAN_CACHE_SIZE", 128)
+
+    with _PLAN_CACHE_LOCK:
+
+        _PLAN_CACHE[rule_engine_id] = (revision, plan)
+        _PLAN_CACHE.move_to_end(rule_engine_id)
+
+        while len(_PLAN_CACHE) > max_size:
+            _PLAN_CACHE.popitem(last=False)
+
+    return plan
+
+
+def invalidate_plan(rule_engine_id=None):
+
+    with _PLAN_CACHE_LOCK:
+
+        if rule_engine_id is None:
+            _PLAN_CACHE.clear()
+        else:
+            _PLAN_CACHE.pop(rule_engine_id, None)
+
+    key = (
+        PLAN_GENERATION_KEY if rule_engine_id is None
+        else PLAN_REVISION_KEY.format(rule_engine_id)
+    )
+
+    cache.set(key, uuid.uuid4().hex, None)
+
+
+def _plan_revision(rule_engine_id):
+
+    # (generation, revision); None until the first invalidation
+    key = PLAN_REVISION_KEY.format(rule_engine_id)
+    tokens = cache.get_many([PLAN_GENERATION_KEY, key])
+
+    return tokens.get(PLAN_GENERATION_KEY), tokens.get(key)
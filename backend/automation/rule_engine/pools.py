@@ -0,0 +1,71 @@
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connections
+
+
+POOL_TYPES = {
+    "thread": ThreadPoolExecutor,
+    "process": ProcessPoolExecutor,
+}
+
+# Worker pools are created lazily and shared by every execution in the
+# process, so a run does not pay thread / process start-up costs.
+_POOLS = {}
+
+_POOLS_LOCK = threading.Lock()
+
+
+def get_pool(kind=None, max_workers=None, name="default"):
+
+    # name separates pools whose tasks may themselves submit work to the
+    # default pool (e.g. job runners), which would otherwise deadlock
+
+    kind = kind or getattr(settings, "RULE_ENGINE_POOL", "thread")
+    max_workers = max_workers or getattr(
+        settings, "RULE_ENGINE_MAX_WORKERS", 4
+    )
+
+    if kind not in POOL_TYPES:
+        raise ValueError(
+            f"Unknown pool '{kind}', expected one of {sorted(POOL_TYPES)}"
+        )
+
+    key = (name, kind, max_workers)
+
+    with _POOLS_LOCK:
+
+        pool = _POOLS.get(key)
+
+        if pool is None:
+
+            if kind == "process":
+                pool = ProcessPoolExecutor(
+                    max_workers=max_workers,
+                    initializer=_init_process_worker
+                )
+            else:
+                pool = ThreadPoolExecutor(max_workers=max_workers)
+
+            _POOLS[key] = pool
+
+    return pool
+
+
+def _init_process_worker():
+
+    # Forked workers must not reuse the parent's database sockets; drop
+    # them without closing so the parent's connections stay intact.
+    for connection in connections.all(initialized_only=True):
+        connection.connection = None
+
+
+def shutdown_pools():
+
+    with _POOLS_LOCK:
+
+        for pool in _POOLS.values():
+            pool.shutdown(wait=True)
+
+        _POOLS.clear()
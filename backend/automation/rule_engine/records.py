@@ -0,0 +1,141 @@
+from collections.abc import Mapping
+
+
+# Copy-on-write claim updates. Deriving a field never modifies the claim
+# it starts from, so upstream values seen by other branches, the memo or
+# an incremental snapshot stay intact. Small plain dicts are copied: a
+# C-level dict copy is cheaper than any Python object and downstream reads
+# stay at dict speed. Wider claims and records become a ClaimRecord, a
+# view of a base claim plus one changed field, so deriving a field costs
+# a single small object instead of a copy of the claim. Records are
+# Mappings: functions read them exactly like dicts, and they serialize to
+# JSON as plain objects. They are read-only: fields are only ever set
+# through with_value() / with_values(), never by assignment.
+
+# Chains longer than this are flattened into a new base dict
+MAX_DEPTH = 8
+
+# Plain dicts up to this many fields are copied instead of layered
+COPY_MAX_FIELDS = 16
+
+
+class ClaimRecord(Mapping):
+
+    __slots__ = ("_base", "_key", "_value", "_depth")
+
+    def __init__(self, base, key, value):
+
+        # base: claim dict or record, never modified through this record
+        self._base = base
+        self._key = key
+        self._value = value
+        self._depth = base._depth + 1 if type(base) is ClaimRecord else 1
+
+    def __getitem__(self, key):
+
+        # Exact type checks: isinstance against a Mapping subclass goes
+        # through the ABC machinery and dominates per-row costs
+        record = self
+
+        while type(record) is ClaimRecord:
+            if record._key == key:
+                return record._value
+            record = record._base
+
+        return record[key]
+
+    def get(self, key, default=None):
+
+        record = self
+
+        while type(record) is ClaimRecord:
+            if record._key == key:
+                return record._value
+            record = record._base
+
+        return record.get(key, default)
+
+    def __contains__(self, key):
+
+        record = self
+
+        while type(record) is ClaimRecord:
+            if record._key == key:
+                return True
+            record = record._base
+
+        return key in record
+
+    def __setitem__(self, key, value):
+
+        # Records are shared by every branch that derived from them, so
+        # assigning a field in place would leak into all of them
+        raise TypeError(
+            "ClaimRecord is read-only; derive a new claim with "
+            "with_value() or with_values()"
+        )
+
+    def __iter__(self):
+        return iter(self.to_dict())
+
+    def __len__(self):
+        return len(self.to_dict())
+
+    def with_values(self, **values):
+
+        return with_values(self, **values)
+
+    def to_dict(self):
+
+        changes = []
+        record = self
+
+        while type(record) is ClaimRecord:
+            changes.append((record._key, record._value))
+            record = record._base
+
+        merged = dict(record)
+        merged.update(reversed(changes))
+
+        return merged
+
+    def __reduce__(self):
+
+        # Unpickled (memo hits, incremental snapshots, process pool
+        # results) as a plain dict: those are private copies anyway, and
+        # dicts load without a Python call per row
+        return (dict, (self.to_dict(),))
+
+    def __repr__(self):
+
+        return f"ClaimRecord({self.to_dict()!r})"
+
+
+def with_value(claim, key, value):
+
+    # with_values() for a single field, without the keyword arguments:
+    # the per-row path of the built-in functions
+    if type(claim) is dict and len(claim) < COPY_MAX_FIELDS:
+        claim = claim.copy()
+        claim[key] = value
+        return claim
+
+    if type(claim) is ClaimRecord and claim._depth >= MAX_DEPTH:
+        claim = claim.to_dict()
+
+    return ClaimRecord(claim, key, value)
+
+
+def with_values(claim, **values):
+
+    # Copy-on-write update of a claim dict or record. Called once per row.
+    if type(claim) is dict and len(claim) + len(values) <= COPY_MAX_FIELDS:
+        return {**claim, **values}
+
+    if type(claim) is ClaimRecord and claim._depth + len(values) > MAX_DEPTH:
+        claim = claim.to_dict()
+
+    for key, value in values.items():
+        claim = ClaimRecord(claim, key, value)
+
+    return claim
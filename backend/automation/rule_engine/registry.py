@@ -1,7 +1,11 @@
+import dis
+import importlib
+import inspect
 import threading
 
-from django.db import models, transaction
+from django.db import transaction
 
+from rule_engine.catalog import invalidate_function_catalog
 from rule_engine.models import RuleLogic, ParamModel
 
 
@@ -9,18 +13,199 @@ FUNCTION_REGISTRY = {}
 
 _REGISTRATION_LOCK = threading.Lock()
 
-#TODO this registration function should not be called while loading the app.
 class FunctionMeta:
 
-    def __init__(self, func, name, inputs=None, outputs=None):
+    def __init__(
+        self,
+        func,
+        name,
+        inputs=None,
+        outputs=None,
+        chunk_safe=False,
+        pure=False,
+        cache_ttl=None,
+        module=None
+    ):
 
-        self.func = func
         self.name = name
         self.inputs = inputs or []
         self.outputs = outputs or []
 
+        # chunk_safe: the function can run on any slice of its list input
+        # and the concatenated outputs equal one run over the whole list,
+        # so the executor may stream it chunk by chunk
+        self.chunk_safe = chunk_safe
 
-def register_function(name=None, inputs=None, outputs=None):
+        # pure: output depends only on the bound arguments, so results may
+        # be memoized (see rule_engine.memo); such functions must neither
+        # modify their inputs nor read `context`. cache_ttl in seconds
+        # overrides RULE_ENGINE_MEMO_TTL for this function
+        self.pure = pure
+        self.cache_ttl = cache_ttl
+
+        # Functions discovered from the manifest are known by module path
+        # only; the module is imported the first time the function is used
+        self.module = module or (func.__module__ if func else None)
+
+        self._func = None
+
+        if func is not None:
+            self.attach(func)
+
+    def attach(self, func):
+
+        # Signature facts used to bind node arguments, computed once
+        parameters = inspect.signature(func).parameters.values()
+
+        self.parameters = tuple(
+            parameter.name for parameter in parameters
+            if parameter.kind in (
+                inspect.Parameter.POSITIONAL_OR_KEYWORD,
+                inspect.Parameter.KEYWORD_ONLY
+            )
+            and parameter.name != "context"
+        )
+        self.takes_context = any(
+            parameter.name == "context" for parameter in parameters
+        )
+        self.takes_kwargs = any(
+            parameter.kind == inspect.Parameter.VAR_KEYWORD
+            for parameter in parameters
+        )
+
+        self.is_async = inspect.iscoroutinefunction(func)
+
+        # Memo keys only cover the bound arguments, not the context
+        if self.pure and _reads_name(func, "context"):
+            raise ValueError(
+                f"Function '{self.name}' reads its context and cannot be "
+                "registered as pure"
+            )
+
+        self._func = func
+
+    @property
+    def loaded(self):
+        return self._func is not None
+
+    @property
+    def func(self):
+        return self.load()
+
+    def load(self):
+
+        if self._func is None:
+
+            # Importing the module runs its @register_function decorators,
+            # which attach the callable to this entry
+            importlib.import_module(self.module)
+
+            if self._func is None:
+                raise Exception(
+                    f"{self.name} not found in module {self.module}"
+                )
+
+        return self._func
+
+    def binder(self, params):
+
+        # Returns bind(context) -> kwargs for an ExecutionContext. Node
+        # params win over context values; arguments the function does not
+        # accept are dropped unless it takes **kwargs. A `context` argument
+        # is the node's scope: its params layered over the context.
+
+        params = params or {}
+        self.load()
+        takes_context = self.takes_context
+
+        if self.takes_kwargs:
+
+            def bind(context):
+                kwargs = {**context.data, **params}
+                if takes_context:
+                    kwargs["context"] = context.scope(params)
+                return kwargs
+
+            return bind
+
+        fixed = {
+            name: params[name]
+            for name in self.parameters
+            if name in params
+        }
+
+        from_context = tuple(
+            name for name in self.parameters
+            if name not in params
+        )
+
+        def bind(context):
+            kwargs = dict(fixed)
+            values = context.data
+            for name in from_context:
+                if name in values:
+                    kwargs[name] = values[name]
+            if takes_context:
+                kwargs["context"] = context.scope(params)
+            return kwargs
+
+        return bind
+
+    @property
+    def list_outputs(self):
+
+        return [
+            output["name"]
+            for output in self.outputs
+            if isinstance(output, dict) and output.get("type") == "list"
+        ]
+
+    @property
+    def chunk_input(self):
+
+        # The argument a chunk-safe function is sliced on: its first list
+        # input, None when it declares none
+        for entry in self.inputs:
+            if isinstance(entry, dict) and entry.get("type") == "list":
+                return entry.get("name")
+
+        return None
+
+
+_LOCAL_LOADS = ("LOAD_FAST", "LOAD_DEREF", "LOAD_CLOSURE")
+
+
+def _reads_name(func, name):
+
+    # Whether the function's code (nested code included) loads the name
+    code = getattr(func, "__code__", None)
+
+    if code is None:
+        return False
+
+    # LOAD_FAST_LOAD_FAST (3.13+) loads two names at once
+    return any(
+        instruction.opname.startswith(_LOCAL_LOADS) and (
+            instruction.argval == name
+            or isinstance(instruction.argval, tuple)
+            and name in instruction.argval
+        )
+        for instruction in dis.get_instructions(code)
+    )
+
+
+def register_function(
+    name=None,
+    inputs=None,
+    outputs=None,
+    chunk_safe=False,
+    pure=False,
+    cache_ttl=None
+):
+
+    # Registration is in memory only; the database catalog is brought up to
+    # date by sync_function_registry() (post_migrate hook or the
+    # sync_functions management command), never at import time.
 
     def decorator(func):
 
@@ -31,19 +216,23 @@ def register_function(name=None, inputs=None, outputs=None):
 
         with _REGISTRATION_LOCK:
 
-            # Register in memory
+            meta = FUNCTION_REGISTRY.get(function_name)
+
+            # Entry discovered from the manifest for this very function
+            if meta is not None and not meta.loaded and (
+                meta.module == func.__module__
+            ):
+                meta.attach(func)
+                return func
+
             FUNCTION_REGISTRY[function_name] = FunctionMeta(
                 func=func,
                 name=function_name,
                 inputs=input_params,
-                outputs=output_params
-            )
-
-            # Register in database #TODO comment and uncomment this for testing without db
-            _register_function_in_db(
-                function_name,
-                input_params,
-                output_params
+                outputs=output_params,
+                chunk_safe=chunk_safe,
+                pure=pure,
+                cache_ttl=cache_ttl
             )
 
         return func
@@ -51,93 +240,174 @@ def register_function(name=None, inputs=None, outputs=None):
     return decorator
 
 
-def _register_function_in_db(function_name, inputs, outputs):
+def register_lazy_function(name, module, **options):
+
+    # Index entry from discovery: metadata now, import on first use
+    with _REGISTRATION_LOCK:
+
+        if name not in FUNCTION_REGISTRY:
+            FUNCTION_REGISTRY[name] = FunctionMeta(
+                func=None,
+                name=name,
+                module=module,
+                **options
+            )
+
+
+def sync_function_registry():
+
+    # Diff the in-memory registry against RuleLogic / ParamModel and write
+    # only what changed: two reads plus at most one bulk write per table.
+
+    with _REGISTRATION_LOCK:
+        registered = list(FUNCTION_REGISTRY.values())
 
     with transaction.atomic():
 
-        input_group_id = _create_param_group(
-            function_name,
-            inputs,
-            "input"
-        )
+        rule_logic_map = {
+            rule_logic.function_name: rule_logic
+            for rule_logic in RuleLogic.objects.all()
+        }
 
-        output_group_id = _create_param_group(
-            function_name,
-            outputs,
-            "output"
-        )
+        group_ids = {}
+        group_params = {}
+        next_group_id = 1
 
-        RuleLogic.objects.update_or_create(
-            function_name=function_name,
-            defaults={
-                "input_params": input_group_id,
-                "output_params": output_group_id
-            }
-        )
+        for param in ParamModel.objects.order_by("id"):
 
-def _create_param_group(function_name, params, group_type):
+            next_group_id = max(next_group_id, param.parameter_group_id + 1)
 
-    if not params:
-        return None
+            if param.param_name == "__group__":
+                group_ids[param.param_type] = param.parameter_group_id
+            else:
+                group_params.setdefault(param.parameter_group_id, []).append(
+                    (param.param_name, param.param_type)
+                )
+
+        new_params = []
+        stale_groups = []
+        new_rule_logic = []
+        changed_rule_logic = []
+
+        for meta in registered:
+
+            resolved = {}
+
+            for group_type, params in (
+                ("input", meta.inputs),
+                ("output", meta.outputs)
+            ):
+
+                desired = _normalize_params(meta.name, params)
+
+                if not desired:
+                    resolved[group_type] = 0
+                    continue
+
+                group_key = f"{meta.name}_{group_type}"
+                group_id = group_ids.get(group_key)
 
-    group_key = f"{function_name}_{group_type}"
+                if group_id is None:
 
-    existing = ParamModel.objects.filter(
-        param_name="__group__",
-        param_type=group_key
-    ).first()
+                    group_id = next_group_id
+                    next_group_id += 1
 
-    if existing:
-        return existing.parameter_group_id
+                    new_params.append(ParamModel(
+                        parameter_group_id=group_id,
+                        param_name="__group__",
+                        param_type=group_key
+                    ))
 
-    max_group = ParamModel.objects.aggregate(
-        max_group=models.Max("parameter_group_id")
-    )["max_group"]
+                elif group_params.get(group_id, []) == desired:
+                    resolved[group_type] = group_id
+                    continue
 
-    new_group_id = (max_group or 0) + 1
+                else:
+                    stale_groups.append(group_id)
 
-    # group marker
-    ParamModel.objects.create(
-        parameter_group_id=new_group_id,
-        param_name="__group__",
-        param_type=group_key
+                new_params.extend(
+                    ParamModel(
+                        parameter_group_id=group_id,
+                        param_name=param_name,
+                        param_type=param_type
+                    )
+                    for param_name, param_type in desired
+                )
+
+                resolved[group_type] = group_id
+
+            rule_logic = rule_logic_map.get(meta.name)
+
+            if rule_logic is None:
+
+                new_rule_logic.append(RuleLogic(
+                    function_name=meta.name,
+                    input_params=resolved["input"],
+                    output_params=resolved["output"]
+                ))
+
+            elif (rule_logic.input_params, rule_logic.output_params) != (
+                resolved["input"], resolved["output"]
+            ):
+
+                rule_logic.input_params = resolved["input"]
+                rule_logic.output_params = resolved["output"]
+                changed_rule_logic.append(rule_logic)
+
+        if stale_groups:
+            ParamModel.objects.filter(
+                parameter_group_id__in=stale_groups
+            ).exclude(param_name="__group__").delete()
+
+        if new_params:
+            ParamModel.objects.bulk_create(new_params)
+
+        if new_rule_logic:
+            RuleLogic.objects.bulk_create(new_rule_logic)
+
+        if changed_rule_logic:
+            RuleLogic.objects.bulk_update(
+                changed_rule_logic,
+                ["input_params", "output_params"]
+            )
+
+    changed = bool(
+        new_params or stale_groups or new_rule_logic or changed_rule_logic
     )
 
-    # normalize params
+    if changed:
+        invalidate_function_catalog()
+
+    return {
+        "created": len(new_rule_logic),
+        "updated": len(changed_rule_logic),
+        "param_groups_rewritten": len(stale_groups),
+        "changed": changed
+    }
+
+
+def _normalize_params(function_name, params):
+
     normalized_params = []
 
     for param in params:
 
         if isinstance(param, str):
 
-            normalized_params.append({
-                "name": param,
-                "type": "string"
-            })
+            normalized_params.append((param, "string"))
 
         elif isinstance(param, dict):
 
-            normalized_params.append({
-                "name": param["name"],
-                "type": param.get("type", "string")
-            })
+            normalized_params.append(
+                (param["name"], param.get("type", "string"))
+            )
 
         else:
             raise Exception(
                 f"Invalid param format in {function_name}: {param}"
             )
 
-    # save params
-    for param in normalized_params:
-
-        ParamModel.objects.create(
-            parameter_group_id=new_group_id,
-            param_name=param["name"],
-            param_type=param["type"]
-        )
-
-    return new_group_id
-
+    return normalized_params
 
 
 def get_all_functions():
@@ -147,9 +417,14 @@ def get_all_functions():
 
 def get_function(name):
 
+    return get_function_meta(name).func
+
+
+def get_function_meta(name):
+
     meta = FUNCTION_REGISTRY.get(name)
 
     if not meta:
         raise Exception(f"{name} not registered")
 
-    return meta.func
+    return meta
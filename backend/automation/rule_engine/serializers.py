@@ -1,5 +1,12 @@
 from rest_framework import serializers
-from .models import RuleEngine, RuleList
+from .models import (
+    RuleEngine,
+    RuleEngineProcessed,
+    RuleList,
+    RuleNodeRun,
+    RuleRun,
+    RuleRunDaily
+)
 
 
 class RuleEngineSerializer(serializers.ModelSerializer):
@@ -23,3 +30,80 @@ class RuleListSerializer(serializers.ModelSerializer):
             "function_name",
             "params"
         ]
+
+
+class RuleEngineJobSerializer(serializers.ModelSerializer):
+
+    job_id = serializers.IntegerField(source="id")
+
+    rule_engine_id = serializers.IntegerField()
+
+    class Meta:
+        model = RuleEngineProcessed
+        fields = [
+            "job_id",
+            "rule_engine_id",
+            "status",
+            "submitted_at",
+            "started_at",
+            "processed_at",
+            "options",
+            "result",
+            "error"
+        ]
+
+
+class RuleRunSerializer(serializers.ModelSerializer):
+
+    rule_engine_id = serializers.IntegerField()
+
+    class Meta:
+        model = RuleRun
+        fields = [
+            "id",
+            "rule_engine_id",
+            "status",
+            "mode",
+            "started_at",
+            "duration_ms",
+            "cpu_ms",
+            "nodes_executed",
+            "nodes_cached",
+            "nodes_reused",
+            "input_rows",
+            "output_rows",
+            "error"
+        ]
+
+
+class RuleNodeRunSerializer(serializers.ModelSerializer):
+
+    class Meta:
+        model = RuleNodeRun
+        fields = [
+            "node_id",
+            "function_name",
+            "source",
+            "wall_ms",
+            "cpu_ms",
+            "input_rows",
+            "output_rows",
+            "memory_bytes"
+        ]
+
+
+class RuleRunDetailSerializer(RuleRunSerializer):
+
+    nodes = RuleNodeRunSerializer(many=True)
+
+    class Meta(RuleRunSerializer.Meta):
+        fields = RuleRunSerializer.Meta.fields + ["nodes"]
+
+
+class RuleRunDailySerializer(serializers.ModelSerializer):
+
+    rule_engine_id = serializers.IntegerField()
+
+    class Meta:
+        model = RuleRunDaily
+        exclude = ["id", "rule_engine"]
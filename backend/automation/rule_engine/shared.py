@@ -0,0 +1,529 @@
+import os
+import tempfile
+import threading
+import time
+import uuid
+from collections.abc import Mapping
+
+import numpy as np
+from django.conf import settings
+
+from .columnar import ClaimBatch
+from .metrics import row_counts, timed_call
+
+
+# Zero-copy hand-off of columnar claim data to process-pool workers.
+# ClaimBatch arguments are written once per run into a file on a memory
+# backed filesystem (/dev/shm); tasks carry SharedBatch descriptors - path,
+# column layout and a row range - and workers map the columns read-only
+# instead of unpickling them, so a task is a few hundred bytes whatever
+# the row count. A chunk-safe node is split into row ranges of the same
+# file and runs on several workers at once. ClaimBatch outputs come back
+# the same way: the worker writes them to a new file that the parent maps
+# and unlinks.
+#
+# Object columns are mapped too: ints and bools as typed values plus a
+# missing mask, strings as codes into their distinct values; they load as
+# object columns of the same Python values. Columns of mixed types (ints
+# and floats included) or free text travel pickled with the descriptor.
+
+# Column offsets in a shared file
+ALIGNMENT = 64
+
+# String columns with more distinct values travel pickled
+MAX_CATEGORIES = 4096
+
+
+class SharedBatch:
+
+    __slots__ = ("path", "length", "layout", "inline", "start", "stop")
+
+    def __init__(self, path, length, layout, inline, start=0, stop=None):
+
+        self.path = path
+        self.length = length
+
+        # (field, dtype, offset, mask offset, categories, boxed) in column
+        # order; offset None when the column is in `inline` (already cut
+        # to start:stop), mask offset None when no value is missing, boxed
+        # when the typed values stand for an object column
+        self.layout = layout
+        self.inline = inline
+
+        self.start = start
+        self.stop = length if stop is None else stop
+
+    def __len__(self):
+        return self.stop - self.start
+
+    def partition(self, parts):
+
+        bounds = np.linspace(self.start, self.stop, parts + 1).astype(int)
+
+        return [
+            SharedBatch(
+                self.path,
+                self.length,
+                self.layout,
+                {
+                    field: column[start - self.start:stop - self.start]
+                    for field, column in self.inline.items()
+                },
+                int(start),
+                int(stop)
+            )
+            for start, stop in zip(bounds[:-1], bounds[1:])
+        ]
+
+    def load(self, unlink=False):
+
+        # ClaimBatch whose typed columns are read-only views of the file;
+        # the mapping lives as long as the arrays. Unlinking right away is
+        # safe on POSIX, open mappings keep the data.
+        buffer = None
+
+        if self.path is not None:
+
+            buffer = np.memmap(self.path, dtype=np.uint8, mode="r")
+
+            if unlink:
+                os.unlink(self.path)
+
+        columns = {}
+
+        for field, dtype, offset, mask_offset, categories, boxed in (
+            self.layout
+        ):
+
+            if offset is None:
+                columns[field] = self.inline[field]
+                continue
+
+            column = np.frombuffer(
+                buffer, dtype=dtype, count=self.length, offset=offset
+            )[self.start:self.stop]
+
+            if mask_offset is not None:
+
+                missing = np.frombuffer(
+                    buffer, dtype=bool, count=self.length, offset=mask_offset
+                )[self.start:self.stop]
+
+                column = column.astype(object)
+                column[missing] = None
+
+            elif boxed:
+                column = column.astype(object)
+
+            if categories is not None:
+                column = categories.take(column)
+
+            columns[field] = column
+
+        return ClaimBatch(columns, len(self))
+
+    def __repr__(self):
+
+        return (
+            f"<SharedBatch {self.path} rows={self.start}:{self.stop} "
+            f"fields={[entry[0] for entry in self.layout]}>"
+        )
+
+
+def share_batch(batch, directory=None):
+
+    # Writes the batch's columns to a new file and returns its descriptor;
+    # whoever receives the descriptor owns the file
+    typed = {}
+    inline = {}
+
+    for field, column in batch.columns.items():
+
+        arrays = _typed(column) if len(batch) else None
+
+        if arrays is None:
+            inline[field] = column
+        else:
+            typed[field] = arrays
+
+    path = None
+    offsets = {}
+
+    if typed:
+
+        path = os.path.join(
+            directory or shared_directory(),
+            f"rule-engine-{uuid.uuid4().hex}.columns"
+        )
+
+        with open(path, "wb") as file:
+            for field, arrays in typed.items():
+                values, missing, _ = arrays
+                offsets[field] = (
+                    _write(file, values),
+                    _write(file, missing) if missing is not None else None
+                )
+
+    layout = [
+        (
+            field,
+            typed[field][0].dtype.str,
+            *offsets[field],
+            typed[field][2],
+            batch.columns[field].dtype == object and typed[field][2] is None
+        )
+        if field in typed else (field, None, None, None, None, False)
+        for field in batch.columns
+    ]
+
+    return SharedBatch(path, len(batch), layout, inline)
+
+
+def shared_directory():
+
+    directory = getattr(settings, "RULE_ENGINE_SHARED_DIR", None)
+
+    if directory:
+        return directory
+
+    if os.path.isdir("/dev/shm"):
+        return "/dev/shm"
+
+    return tempfile.gettempdir()
+
+
+class SharedCalls:
+
+    # Node calls of one run on a process pool. Each ClaimBatch value is
+    # shared once per run; the files are removed by close().
+
+    def __init__(self, pool, max_workers, min_rows, partition_rows):
+
+        self.pool = pool
+        self.max_workers = max_workers
+        self.min_rows = min_rows
+        self.partition_rows = partition_rows
+
+        self.directory = shared_directory()
+
+        # id(value) -> (value, descriptor); the value is kept so its id
+        # cannot be reused while the run lasts
+        self._shared = {}
+        self._lock = threading.Lock()
+
+    def applies(self, kwargs):
+
+        return any(
+            self._shareable(value)
+            for name, value in kwargs.items()
+            if name != "context"
+        )
+
+    def submit(self, function, kwargs, meta):
+
+        arguments = {
+            name: self.share(value) for name, value in kwargs.items()
+        }
+
+        # Context values are shared too; workers load them when read
+        if "context" in kwargs:
+            arguments["context"] = {
+                key: self.share(value)
+                for key, value in kwargs["context"].items()
+            }
+
+        parts = self._partitions(arguments, meta)
+
+        if parts is None:
+            return SharedCall(
+                [self.pool.submit(
+                    call_shared, function, arguments, self.min_rows
+                )],
+                kwargs
+            )
+
+        name, partitions = parts
+
+        return SharedCall(
+            [
+                self.pool.submit(
+                    call_shared,
+                    function,
+                    {**arguments, name: partition},
+                    self.min_rows
+                )
+                for partition in partitions
+            ],
+            kwargs
+        )
+
+    def share(self, value):
+
+        if not self._shareable(value):
+            return value
+
+        with self._lock:
+
+            entry = self._shared.get(id(value))
+
+            if entry is None:
+                entry = (value, share_batch(value, self.directory))
+                self._shared[id(value)] = entry
+
+        return entry[1]
+
+    def close(self):
+
+        with self._lock:
+
+            for _, descriptor in self._shared.values():
+                if descriptor.path is not None:
+                    _remove(descriptor.path)
+
+            self._shared.clear()
+
+    def _shareable(self, value):
+
+        return isinstance(value, ClaimBatch) and len(value) >= self.min_rows
+
+    def _partitions(self, arguments, meta):
+
+        # Chunk-safe nodes with exactly one shared argument and only list
+        # outputs are split into row ranges, at most one per worker
+        shared = [
+            name for name, value in arguments.items()
+            if isinstance(value, SharedBatch)
+        ]
+
+        outputs = meta.list_outputs
+
+        if not meta.chunk_safe or len(shared) != 1 or not outputs or (
+            len(outputs) != len(meta.outputs)
+        ):
+            return None
+
+        batch = arguments[shared[0]]
+
+        parts = min(
+            self.max_workers,
+            -(-len(batch) // self.partition_rows)
+        )
+
+        if parts < 2:
+            return None
+
+        return shared[0], batch.partition(parts)
+
+
+class SharedCall:
+
+    # Future of (result, profile) for one node call, possibly partitioned
+
+    def __init__(self, futures, kwargs):
+
+        self.futures = futures
+        self.kwargs = kwargs
+        self.started = time.perf_counter()
+
+    def result(self):
+
+        results = []
+        profiles = []
+
+        # Every future is awaited, so a failing partition does not leave
+        # output files of the others behind
+        error = None
+
+        for future in self.futures:
+            try:
+                result, profile = future.result()
+            except Exception as exc:
+                error = error or exc
+                continue
+            results.append(load_result(result))
+            profiles.append(profile)
+
+        if error is not None:
+            raise error
+
+        if len(results) == 1:
+            return results[0], profiles[0]
+
+        return concat_results(results), {
+            "input_rows": row_counts(self.kwargs, exclude=("context",)),
+            "wall_ms": round((time.perf_counter() - self.started) * 1000, 3),
+            "cpu_ms": round(sum(profile["cpu_ms"] for profile in profiles), 3),
+            "partitions": len(profiles)
+        }
+
+
+class SharedContext(Mapping):
+
+    # Worker-side context; shared values are loaded on first access, so
+    # context values a function does not read cost nothing
+
+    def __init__(self, values):
+
+        self.values = values
+
+    def __getitem__(self, key):
+
+        value = self.values[key]
+
+        if isinstance(value, SharedBatch):
+            value = self.values[key] = value.load()
+
+        return value
+
+    def __iter__(self):
+        return iter(self.values)
+
+    def __len__(self):
+        return len(self.values)
+
+
+def call_shared(function, kwargs, min_rows):
+
+    # Worker side: maps shared arguments, runs the function and writes
+    # ClaimBatch outputs of min_rows or more to files handed back to the
+    # parent
+    arguments = {name: load_value(value) for name, value in kwargs.items()}
+
+    if "context" in kwargs:
+        arguments["context"] = SharedContext(kwargs["context"])
+
+    result, profile = timed_call(function, arguments)
+
+    return export_result(result, min_rows), profile
+
+
+def export_result(result, min_rows):
+
+    # Worker side: ClaimBatch outputs of min_rows or more go back to the
+    # parent as SharedBatch descriptors, read by load_result()
+    if not result:
+        return result
+
+    directory = shared_directory()
+
+    return {
+        key: (
+            share_batch(value, directory)
+            if isinstance(value, ClaimBatch) and len(value) >= min_rows
+            else value
+        )
+        for key, value in result.items()
+    }
+
+
+def load_result(result):
+
+    if not result:
+        return result
+
+    return {
+        key: (
+            value.load(unlink=True)
+            if isinstance(value, SharedBatch) else value
+        )
+        for key, value in result.items()
+    }
+
+
+def load_value(value):
+
+    if isinstance(value, SharedBatch):
+        return value.load()
+
+    return value
+
+
+def concat_results(results):
+
+    # Outputs of the partitions of one call, concatenated in order
+    merged = {}
+
+    for key in dict.fromkeys(key for result in results for key in result):
+
+        values = [result.get(key) for result in results]
+
+        if all(isinstance(value, ClaimBatch) for value in values):
+            merged[key] = ClaimBatch.concat(values)
+        else:
+            merged[key] = [item for value in values for item in value or ()]
+
+    return merged
+
+
+def _typed(column):
+
+    # (values, missing mask, categories) for a column that can be mapped,
+    # None for object columns of other kinds. String columns are stored
+    # as codes into their distinct values (None included), so loading
+    # them is a single take instead of building a string per row.
+    if column.dtype != object:
+        return column, None, None
+
+    values = column.tolist()
+    kinds = set(map(type, values))
+    kinds.discard(type(None))
+
+    if kinds == {str}:
+
+        distinct = list(dict.fromkeys(values))
+
+        if len(distinct) > MAX_CATEGORIES:
+            return None
+
+        codes = {value: code for code, value in enumerate(distinct)}
+
+        categories = np.empty(len(distinct), dtype=object)
+        categories[:] = distinct
+
+        return (
+            np.array(list(map(codes.__getitem__, values)), dtype=np.int32),
+            None,
+            categories
+        )
+
+    # Mixed ints and floats are left alone: a float column would turn the
+    # ints into floats
+    if kinds <= {int}:
+        dtype = np.int64
+    elif kinds == {float}:
+        dtype = np.float64
+    elif kinds == {bool}:
+        dtype = bool
+    else:
+        return None
+
+    missing = np.equal(column, None)
+
+    # Ints beyond 64 bits stay Python objects
+    try:
+        if not missing.any():
+            return column.astype(dtype), None, None
+
+        typed = np.zeros(len(column), dtype=dtype)
+        typed[~missing] = column[~missing]
+    except OverflowError:
+        return None
+
+    return typed, missing, None
+
+
+def _write(file, array):
+
+    file.write(b"\0" * (-file.tell() % ALIGNMENT))
+    offset = file.tell()
+    np.ascontiguousarray(array).tofile(file)
+
+    return offset
+
+
+def _remove(path):
+
+    try:
+        os.unlink(path)
+    except FileNotFoundError:
+        pass
@@ -0,0 +1,310 @@
+import threading
+import time
+from collections.abc import Mapping
+from itertools import islice
+from types import GeneratorType
+
+
+# Streaming execution support. In streaming mode list outputs flow through
+# the graph as ChunkStreams: lazy sequences of fixed-size chunks. A
+# chunk-safe node does not run when it is reached; its outputs become
+# streams that apply the function one chunk at a time when first read.
+# The function runs once per chunk for all of its outputs, and computed
+# chunks are buffered, so fan-out consumers, conditions, traces and
+# serialization read the same chunks instead of re-running the chain.
+# A stream drops its upstream once it is exhausted, so only the chunks
+# still referenced stay alive. Streams nothing reads to the end are
+# drained when the run finishes, so every node does all of its work and
+# its errors surface; the node's profile then counts the chunks it
+# actually processed (StreamUsage).
+
+
+_END = object()
+
+
+class _Chunks:
+
+    # Chunks of a single-pass iterator, computed once and kept for every
+    # later reader
+
+    __slots__ = ("_iterator", "_chunks", "_lock")
+
+    def __init__(self, iterator):
+
+        self._iterator = iterator
+        self._chunks = []
+        self._lock = threading.Lock()
+
+    def get(self, index):
+
+        with self._lock:
+
+            while index >= len(self._chunks):
+
+                if self._iterator is None:
+                    return _END
+
+                chunk = next(self._iterator, _END)
+
+                if chunk is _END:
+                    self._iterator = None
+                    return _END
+
+                self._chunks.append(chunk)
+
+            return self._chunks[index]
+
+
+class StreamUsage:
+
+    # Work a lazy node does as its chunks are read: time spent in its
+    # function and rows read, added to its profile once it is drained
+
+    __slots__ = ("chunks", "wall", "cpu", "input_rows")
+
+    def __init__(self):
+
+        self.chunks = 0
+        self.wall = 0.0
+        self.cpu = 0.0
+        self.input_rows = {}
+
+    def timed(self, read, rows=None):
+
+        # read() under the node's clock; rows: (argument, count) read
+        wall = time.perf_counter()
+        cpu = time.thread_time()
+
+        try:
+            return read()
+        finally:
+            self.wall += time.perf_counter() - wall
+            self.cpu += time.thread_time() - cpu
+            self.chunks += 1
+
+            if rows is not None:
+                name, count = rows
+                self.input_rows[name] = self.input_rows.get(name, 0) + count
+
+    def apply(self, profile):
+
+        profile["wall_ms"] = round(profile["wall_ms"] + self.wall * 1000, 3)
+        # Coroutine profiles have no CPU time
+        if "cpu_ms" in profile:
+            profile["cpu_ms"] = round(profile["cpu_ms"] + self.cpu * 1000, 3)
+        profile["input_rows"].update(self.input_rows)
+        profile["chunks"] = self.chunks
+
+
+class _ListChunks:
+
+    # A list output is already in memory: chunks are slices of it
+
+    __slots__ = ("_items", "_chunk_size")
+
+    def __init__(self, items, chunk_size):
+
+        self._items = items
+        self._chunk_size = chunk_size
+
+    def get(self, index):
+
+        start = index * self._chunk_size
+
+        if start >= len(self._items):
+            return _END
+
+        return self._items[start:start + self._chunk_size]
+
+
+class ChunkStream:
+
+    __slots__ = ("_chunks", "_output", "chunk_size")
+
+    def __init__(self, chunks, chunk_size, output=None):
+
+        # chunks: shared chunk buffer; output: key to read when its chunks
+        # are the result dicts of a multi-output node
+        self._chunks = chunks
+        self._output = output
+        self.chunk_size = chunk_size
+
+    @classmethod
+    def from_iterable(cls, items, chunk_size, usage=None):
+
+        # usage: StreamUsage charged with producing a generator's items
+        if isinstance(items, list):
+            return cls(_ListChunks(items, chunk_size), chunk_size)
+
+        iterator = iter(items)
+
+        def read():
+            return list(islice(iterator, chunk_size))
+
+        def chunks():
+            while True:
+                chunk = read() if usage is None else usage.timed(read)
+                if not chunk:
+                    return
+                yield chunk
+
+        return cls(_Chunks(chunks()), chunk_size)
+
+    def chunks(self):
+
+        index = 0
+
+        while True:
+
+            chunk = self._chunks.get(index)
+
+            if chunk is _END:
+                return
+
+            yield chunk if self._output is None else chunk.get(
+                self._output, []
+            )
+
+            index += 1
+
+    def map_outputs(self, function, argument, kwargs, outputs, usage=None):
+
+        # Streams of function(argument=chunk, **kwargs)[output] for every
+        # output, all fed by a single call per chunk
+        def call(chunk):
+            return function(**{**kwargs, argument: chunk}) or {}
+
+        results = _Chunks(
+            call(chunk) if usage is None else usage.timed(
+                lambda: call(chunk), (argument, len(chunk))
+            )
+            for chunk in self.chunks()
+        )
+
+        return {
+            output: ChunkStream(results, self.chunk_size, output)
+            for output in outputs
+        }
+
+    def materialize(self):
+
+        items = []
+
+        for chunk in self.chunks():
+            items.extend(chunk)
+
+        return items
+
+    # DRF's JSON encoder serializes anything exposing tolist()
+    tolist = materialize
+
+    def drain(self):
+
+        # Reads the stream to its end; the chunks stay buffered
+        for _ in self.chunks():
+            pass
+
+    def __iter__(self):
+        for chunk in self.chunks():
+            yield from chunk
+
+    def __len__(self):
+
+        if type(self._chunks) is _ListChunks:
+            return len(self._chunks._items)
+
+        return sum(len(chunk) for chunk in self.chunks())
+
+    def __repr__(self):
+        return f"<ChunkStream chunk_size={self.chunk_size}>"
+
+
+class MaterializedView(Mapping):
+
+    # Read-only view of a context for conditions: streams are read as
+    # lists, each at most once per view. An error raised by a node while
+    # its stream is read is kept in `error`, so it is not mistaken for a
+    # condition that failed to evaluate.
+
+    def __init__(self, data):
+
+        self._data = data
+        self._lists = {}
+        self.error = None
+
+    def __getitem__(self, key):
+
+        value = self._data[key]
+
+        if not isinstance(value, ChunkStream):
+            return value
+
+        if key not in self._lists:
+            try:
+                self._lists[key] = value.materialize()
+            except Exception as exc:
+                self.error = exc
+                raise
+
+        return self._lists[key]
+
+    def __iter__(self):
+        return iter(self._data)
+
+    def __len__(self):
+        return len(self._data)
+
+
+def materialized(values):
+
+    # Copy of a result dict with streams read into lists
+    return {
+        key: value.materialize() if isinstance(value, ChunkStream) else value
+        for key, value in values.items()
+    }
+
+
+def is_streamable(value):
+
+    return isinstance(value, (list, GeneratorType))
+
+
+def stream_node(meta, kwargs, chunk_size, usage=None):
+
+    # Returns the node's outputs, lazily when the function is chunk-safe
+    # and exactly one argument is a stream; otherwise streams are
+    # materialized and the function runs once over full lists. Lazy work
+    # is charged to `usage`.
+
+    streams = [
+        name for name, value in kwargs.items()
+        if isinstance(value, ChunkStream)
+    ]
+
+    outputs = meta.list_outputs
+
+    if meta.chunk_safe and len(streams) == 1 and outputs and (
+        len(outputs) == len(meta.outputs)
+    ):
+        return kwargs[streams[0]].map_outputs(
+            meta.func, streams[0], kwargs, outputs, usage
+        )
+
+    return stream_outputs(
+        meta.func(**materialized(kwargs)), chunk_size, usage
+    )
+
+
+def stream_outputs(result, chunk_size, usage=None):
+
+    # List and generator outputs of a function that ran over full lists
+    if not result:
+        return result
+
+    return {
+        key: (
+            ChunkStream.from_iterable(value, chunk_size, usage)
+            if is_streamable(value) else value
+        )
+        for key, value in result.items()
+    }
@@ -1,3 +1,1828 @@
-from django.test import TestCase
+import pickle
+import tempfile
+import textwrap
+import threading
+import time
+import tracemalloc
+from collections.abc import Mapping
+from datetime import timedelta
+from pathlib import Path
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+from asgiref.sync import async_to_sync
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from .async_executor import AsyncGraphRuleExecutor
+from .benchmark import (
+    benchmark_graph, generate_claims, measure, result_key
+)
+from .columnar import ClaimBatch
+from .conditions import ConditionError, compile_condition
+from .context import ExecutionContext
+from .discovery import scan_module
+from .executor import GraphRuleExecutor
+from .memo import Fingerprints, get_result_cache
+from .metrics import timed_call
+from .history import prune_runs
+from .jobs import reap_stale_jobs, run_job
+from .models import (
+    RuleEdge, RuleEngine, RuleEngineProcessed, RuleList, RuleLogic,
+    RuleNodeRun, RuleNodeState, RuleRun, RuleRunDaily
+)
+from .partitioning import find_segments
+from .plan import (
+    PLAN_REVISION_KEY, PlanModeError, build_plan, get_plan, invalidate_plan
+)
+from .pools import _POOLS, shutdown_pools
+from .records import (
+    COPY_MAX_FIELDS, MAX_DEPTH, ClaimRecord, with_value, with_values
+)
+from .registry import (
+    FUNCTION_REGISTRY, get_function_meta, register_function,
+    sync_function_registry
+)
+from .shared import share_batch
+
+
+# Functions used by the tests only
+
+EVENTS = []
+
+_EVENTS_LOCK = threading.Lock()
+
+
+@register_function(
+    name="fn_sleep",
+    inputs=[
+        {"name": "delay", "type": "float"},
+        {"name": "label", "type": "string"}
+    ]
+)
+def fn_sleep(delay, label, context=None):
+
+    with _EVENTS_LOCK:
+        EVENTS.append(("start", label))
+
+    time.sleep(delay)
+
+    with _EVENTS_LOCK:
+        EVENTS.append(("end", label))
+
+    return {}
+
+
+@register_function(
+    name="fn_numbers",
+    inputs=[{"name": "count", "type": "integer"}],
+    outputs=[{"name": "numbers", "type": "list"}]
+)
+def fn_numbers(count, context=None):
+
+    # A single-pass source
+    return {"numbers": (number for number in range(count))}
+
+
+@register_function(
+    name="fn_split",
+    inputs=[{"name": "numbers", "type": "list"}],
+    outputs=[
+        {"name": "evens", "type": "list"},
+        {"name": "odds", "type": "list"}
+    ],
+    chunk_safe=True
+)
+def fn_split(numbers, context=None):
+
+    EVENTS.append(("split", len(numbers)))
+
+    return {
+        "evens": [number for number in numbers if number % 2 == 0],
+        "odds": [number for number in numbers if number % 2]
+    }
+
+
+@register_function(
+    name="fn_double",
+    inputs=[{"name": "evens", "type": "list"}],
+    outputs=[{"name": "doubled", "type": "list"}],
+    chunk_safe=True
+)
+def fn_double(evens, context=None):
+
+    return {"doubled": [number * 2 for number in evens]}
+
+
+@register_function(
+    name="fn_sum",
+    inputs=[{"name": "evens", "type": "list"}],
+    outputs=[{"name": "even_total", "type": "integer"}]
+)
+def fn_sum(evens, context=None):
+
+    return {"even_total": sum(evens)}
+
+
+@register_function(
+    name="fn_async_count",
+    inputs=[{"name": "evens", "type": "list"}],
+    outputs=[
+        {"name": "even_count", "type": "integer"},
+        {"name": "even_copy", "type": "list"}
+    ]
+)
+async def fn_async_count(evens, context=None):
+
+    return {"even_count": len(evens), "even_copy": evens + []}
+
+
+@register_function(
+    name="fn_write",
+    inputs=[
+        {"name": "delay", "type": "float"},
+        {"name": "value", "type": "string"}
+    ],
+    outputs=[{"name": "x", "type": "string"}]
+)
+def fn_write(delay, value, context=None):
+
+    time.sleep(delay)
+
+    return {"x": value}
+
+
+@register_function(
+    name="fn_explode",
+    inputs=[{"name": "evens", "type": "list"}],
+    outputs=[{"name": "exploded", "type": "list"}],
+    chunk_safe=True
+)
+def fn_explode(evens, context=None):
+
+    raise ValueError("exploded")
+
+
+@register_function(
+    name="fn_options",
+    inputs=[{"name": "label", "type": "string"}]
+)
+def fn_options(label, context=None, **options):
+
+    return {"options": {"label": label, **options}}
+
+
+def rule_payload(nodes, edges=(), rule_name="test rule"):
+
+    # nodes: (function_name, params); edges: (source, target, extra fields)
+    # with 1-based node positions as ids
+    return {
+        "rule_name": rule_name,
+        "nodes": [
+            {
+                "id": str(index),
+                "data": {"function_name": function_name, "params": params}
+            }
+            for index, (function_name, params) in enumerate(nodes, 1)
+        ],
+        "edges": [
+            {"source": str(source), "target": str(target), **extra}
+            for source, target, extra in edges
+        ]
+    }
+
+
+def save_rule(client, nodes, edges=(), rule_name="test rule"):
+
+    return client.post(
+        "/rule_engine/rules/save/",
+        rule_payload(nodes, edges, rule_name),
+        format="json"
+    )
+
+
+def execute(plan, context=None, **options):
+
+    executor = GraphRuleExecutor(
+        plan.rule_engine_id,
+        plan=plan,
+        context=context,
+        history=False,
+        **options
+    )
+    executor.execute()
+
+    return executor
+
+
+def model_queries(queries):
+
+    # Captured queries other than the database cache backend's own
+    # (settings.CACHES), including the savepoints around its writes
+    return [
+        query for query in queries.captured_queries
+        if "rule_engine_cache" not in query["sql"]
+        and "SAVEPOINT" not in query["sql"]
+    ]
+
+
+class RuleTestMixin:
+
+    def setUp(self):
+
+        self.client = APIClient()
+        cache.clear()
+        invalidate_plan()
+
+    def save(self, nodes, edges=(), **kwargs):
+
+        response = save_rule(self.client, nodes, edges, **kwargs)
+        self.assertEqual(response.status_code, 201, response.data)
+
+        return response.data["rule_engine_id"]
+
+    def claims_rule(self):
+
+        return self.save(
+            [
+                ("load_claims", {"client_id": "1"}),
+                ("filter_claims", {"min_amount": 30}),
+            ],
+            [(1, 2, {})]
+        )
+
+
+class RuleTestCase(RuleTestMixin, TestCase):
+    pass
+
+
+class PlanCacheTests(RuleTestCase):
+
+    def test_plan_is_compiled_once(self):
+
+        rule_id = self.claims_rule()
+
+        self.assertIs(get_plan(rule_id), get_plan(rule_id))
+
+    def test_revision_change_in_another_worker_recompiles(self):
+
+        rule_id = self.claims_rule()
+        plan = get_plan(rule_id)
+
+        # What invalidate_plan() in another process leaves behind
+        cache.set(PLAN_REVISION_KEY.format(rule_id), "other", None)
+
+        self.assertIsNot(get_plan(rule_id), plan)
+
+    def test_deleted_rule_is_not_executed_from_cache(self):
+
+        rule_id = self.claims_rule()
+        self.assertEqual(len(get_plan(rule_id)), 2)
+
+        response = self.client.delete(f"/rule_engine/rules/{rule_id}/")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(RuleEngine.objects.filter(id=rule_id).exists())
+        self.assertEqual(len(get_plan(rule_id)), 0)
+
+
+class ConditionTests(RuleTestCase):
+
+    def test_conditions_read_context_values(self):
+
+        condition = compile_condition(
+            'len(valid_claims) > 0 and context["score"] < 50'
+        )
+
+        self.assertTrue(condition({"valid_claims": [1], "score": 10}))
+        self.assertFalse(condition({"valid_claims": [], "score": 10}))
+
+    def test_empty_condition_is_always_taken(self):
+
+        self.assertIsNone(compile_condition(None))
+        self.assertIsNone(compile_condition("  "))
+
+    def test_unsafe_expressions_are_rejected(self):
+
+        for expression in (
+            "claims.__class__",
+            "__import__('os')",
+            "[0] * 1000000000",
+            "'a' * 1000000000",
+            "2 ** 10",
+            "lambda: 1",
+            'len("%0200000000d" % 1) > 0',
+        ):
+            with self.assertRaises(ConditionError, msg=expression):
+                compile_condition(expression)
+
+    def test_runtime_sequence_repetition_fails(self):
+
+        condition = compile_condition("len(claims * 1000000000) > 0")
+
+        with self.assertRaises(ConditionError):
+            condition({"claims": [1, 2]})
+
+        self.assertTrue(compile_condition("amount * 2 > 10")({"amount": 6}))
+
+    def test_modulo_only_takes_numbers(self):
+
+        condition = compile_condition("len(pattern % 1) > 0")
+
+        with self.assertRaises(ConditionError):
+            condition({"pattern": "%0200000000d"})
+
+        self.assertTrue(compile_condition("7 % 3 == 1")({}))
+        self.assertTrue(
+            compile_condition("amount % 2 == 0")({"amount": 6})
+        )
+
+    def test_non_string_conditions_are_rejected(self):
+
+        for condition in (5, {}, ["x"]):
+
+            with self.assertRaises(ConditionError):
+                compile_condition(condition)
+
+            response = save_rule(
+                self.client,
+                [("load_claims", {"client_id": "1"}), ("filter_claims", {})],
+                [(1, 2, {"condition": condition})]
+            )
+
+            self.assertEqual(response.status_code, 400)
+            self.assertIn("Conditions must be strings", response.data["error"])
+
+
+class DagTests(RuleTestCase):
+
+    def test_dag_matches_sequential(self):
+
+        rule_id = self.save(
+            [
+                ("load_claims", {"client_id": "1"}),
+                ("validate_claim_amount_range", {
+                    "min_amount": 30, "max_amount": 500
+                }),
+                ("deduplicate_claims", {"unique_field": "id"}),
+            ],
+            [(1, 2, {}), (1, 3, {})]
+        )
+
+        contexts = [
+            execute(get_plan(rule_id), mode=mode).context.data
+            for mode in ("sequential", "dag")
+        ]
+
+        self.assertEqual(
+            {key: len(value) for key, value in contexts[0].items()},
+            {key: len(value) for key, value in contexts[1].items()}
+        )
+
+    def test_nodes_start_without_waiting_for_later_nodes(self):
+
+        plan = build_plan(
+            0,
+            [
+                (1, "fn_sleep", {"delay": 0, "label": "fast"}),
+                (2, "fn_sleep", {"delay": 0, "label": "after fast"}),
+                (3, "fn_sleep", {"delay": 0.5, "label": "slow"}),
+            ],
+            [(1, 2, None, None)]
+        )
+
+        EVENTS.clear()
+        execute(plan, mode="dag", pool="thread")
+
+        self.assertLess(
+            EVENTS.index(("end", "after fast")), EVENTS.index(("end", "slow"))
+        )
+
+    def test_results_are_merged_in_plan_order(self):
+
+        # Siblings writing the same key: the later one in plan order wins,
+        # whichever finishes first
+        for delays in ((0.2, 0), (0, 0.2)):
+
+            plan = build_plan(
+                0,
+                [
+                    (1, "fn_write", {"delay": delays[0], "value": "a"}),
+                    (2, "fn_write", {"delay": delays[1], "value": "b"}),
+                ],
+                []
+            )
+
+            executor = execute(plan, mode="dag", pool="thread")
+
+            self.assertEqual(executor.context["x"], "b", delays)
+            self.assertEqual(
+                [entry["node"] for entry in executor.execution_log], [1, 2]
+            )
+
+            executor = AsyncGraphRuleExecutor(
+                0, plan=plan, mode="dag", history=False
+            )
+            async_to_sync(executor.execute_async)()
+
+            self.assertEqual(executor.context["x"], "b", delays)
+
+    def test_cycle_is_a_bad_request(self):
+
+        rule_id = self.save(
+            [
+                ("filter_claims", {"min_amount": 1}),
+                ("filter_claims", {"min_amount": 2}),
+            ],
+            [(1, 2, {}), (2, 1, {})]
+        )
+
+        response = self.client.post(
+            f"/rule_engine/rules/{rule_id}/execute/?mode=dag",
+            {"context": {}},
+            format="json"
+        )
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("cycle", response.data["error"])
+
+
+class BatchTests(RuleTestCase):
+
+    def post_batch(self, rule_id, body, query=""):
+
+        return self.client.post(
+            f"/rule_engine/rules/{rule_id}/execute_batch/{query}",
+            body,
+            format="json"
+        )
+
+    def test_batch_runs_every_input(self):
+
+        rule_id = self.claims_rule()
+
+        response = self.post_batch(rule_id, {
+            "inputs": [{"client_id": str(index)} for index in range(5)],
+            "chunk_size": 2,
+            "workers": 2
+        })
+
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual(response.data["count"], 5)
+        self.assertEqual(
+            len(response.data["results"][0]["context"]["filtered_claims"]), 4
+        )
+
+    def test_invalid_options_are_bad_requests(self):
+
+        rule_id = self.claims_rule()
+        inputs = [{"client_id": "1"}]
+
+        for body, query in (
+            ({"inputs": inputs, "workers": "4"}, ""),
+            ({"inputs": inputs, "workers": 0}, ""),
+            ({"inputs": inputs, "chunk_size": "10"}, ""),
+            ({"inputs": inputs, "chunk_size": -1}, ""),
+            ({"inputs": inputs, "chunk_size": True}, ""),
+            ({"inputs": inputs}, "?mode=nope"),
+            ([{"inputs": inputs}], ""),
+        ):
+            response = self.post_batch(rule_id, body, query)
+            self.assertEqual(response.status_code, 400, (body, query))
+
+    def test_worker_count_is_bounded(self):
+
+        rule_id = self.claims_rule()
+
+        with self.settings(RULE_ENGINE_MAX_WORKERS=2):
+            response = self.post_batch(rule_id, {
+                "inputs": [{"client_id": "1"}] * 4,
+                "chunk_size": 1,
+                "workers": 500
+            })
+
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(any(key[2] == 500 for key in _POOLS))
+
+    def test_every_chunk_runs_in_the_requested_mode(self):
+
+        rule_id = self.save(
+            [("fn_split", {}), ("fn_sum", {})],
+            [(1, 2, {"mapping": {"evens": "odds"}})]
+        )
+
+        for chunk_size in (4, 1):
+
+            response = self.post_batch(rule_id, {
+                "inputs": [{"numbers": [1, 2, 3]}] * 4,
+                "chunk_size": chunk_size,
+                "workers": 2
+            }, "?mode=dataflow")
+
+            self.assertEqual(response.status_code, 200, response.data)
+            self.assertEqual(
+                [
+                    result["context"]["even_total"]
+                    for result in response.data["results"]
+                ],
+                [4] * 4,
+                response.data["results"]
+            )
+
+
+def records(value):
+
+    # Output list -> plain dicts, without the None / NaN cells a ClaimBatch
+    # cannot tell apart from absent fields
+    if isinstance(value, ClaimBatch):
+        value = value.to_records()
+
+    return [
+        {
+            key: item for key, item in dict(record).items()
+            if item is not None and item == item
+        }
+        for record in value
+    ]
+
+
+class ColumnarParityTests(TestCase):
+
+    CLAIMS = [
+        {"id": 1, "amount": 10.0, "status": "new", "policy": "A"},
+        {"id": 2, "amount": 250.5, "status": "open", "policy": None},
+        {"id": 2, "amount": 80.0, "status": "closed", "policy": "B"},
+        {"id": 3, "amount": 1000.0, "status": "new"},
+        {"id": 4, "amount": 45.0, "status": "open", "policy": float("nan")},
+    ]
+
+    def assertParity(self, name, **params):
+
+        row = get_function_meta(name).func
+        columnar = get_function_meta(f"{name}_columnar").func
+
+        for claims in (self.CLAIMS, ClaimBatch.from_records(self.CLAIMS)):
+
+            expected = row(claims=list(self.CLAIMS), **params)
+            actual = columnar(claims=claims, **params)
+
+            self.assertEqual(set(actual), set(expected))
+
+            for output, value in expected.items():
+                self.assertEqual(
+                    records(actual[output]), records(value), (name, output)
+                )
+
+    def test_filters_and_validators_match_row_functions(self):
+
+        self.assertParity("filter_claims", min_amount=50)
+        self.assertParity(
+            "validate_claim_amount_range", min_amount=20, max_amount=500
+        )
+        self.assertParity("deduplicate_claims", unique_field="id")
+        self.assertParity(
+            "filter_claims_by_status", allowed_status=["new", "open"]
+        )
+
+    def test_derived_fields_match_row_functions(self):
+
+        self.assertParity("calculate_claim_tax", tax_rate=0.2)
+        self.assertParity("auto_approve_claims", approval_threshold=100)
+
+    def test_none_and_nan_are_missing(self):
+
+        self.assertParity(
+            "validate_required_fields", required_fields=["policy", "amount"]
+        )
+
+        result = get_function_meta("validate_required_fields_columnar").func(
+            claims=ClaimBatch.from_records([
+                {"amount": 1.0}, {"amount": float("nan")}, {"amount": 2.0}
+            ]),
+            required_fields=["amount"]
+        )
+
+        self.assertEqual(len(result["valid_claims"]), 2)
+        self.assertEqual(len(result["invalid_claims"]), 1)
+
+
+class StreamingTests(TestCase):
+
+    def execute_stream(self, mode):
+
+        # numbers -> split -> sum (conditional) and split -> double: a
+        # multi-output node whose evens are read by two nodes
+        plan = build_plan(
+            0,
+            [
+                (1, "fn_numbers", {"count": 10}),
+                (2, "fn_split", {}),
+                (3, "fn_sum", {}),
+                (4, "fn_double", {}),
+            ],
+            [
+                (1, 2, None, None),
+                (2, 3, "len(evens) > 0", None),
+                (2, 4, None, None),
+            ]
+        )
+
+        EVENTS.clear()
+
+        with self.settings(RULE_ENGINE_STREAM_CHUNK_SIZE=3):
+            return execute(plan, mode=mode, streaming=True, trace="full")
+
+    def test_each_chunk_runs_once_for_all_consumers(self):
+
+        for mode in ("sequential", "dag", "dataflow"):
+
+            executor = self.execute_stream(mode)
+            data = executor.context.data
+
+            self.assertEqual(data["even_total"], 20, mode)
+            self.assertEqual(
+                data["doubled"].tolist(), [0, 4, 8, 12, 16], mode
+            )
+            self.assertEqual(
+                executor.execution_log[1]["result"]["odds"], [1, 3, 5, 7, 9]
+            )
+
+            # One call per chunk, however often the outputs were read; the
+            # trace holds lists rather than streams
+            self.assertEqual(
+                EVENTS, [("split", 3)] * 3 + [("split", 1)], mode
+            )
+
+    def stream_plan(self, sink):
+
+        return build_plan(
+            0,
+            [
+                (1, "fn_numbers", {"count": 10}),
+                (2, "fn_split", {}),
+                (3, sink, {}),
+            ],
+            [(1, 2, None, None), (2, 3, None, None)]
+        )
+
+    def test_unread_streams_are_drained(self):
+
+        for mode in ("sequential", "dag", "dataflow"):
+
+            EVENTS.clear()
+
+            with self.settings(RULE_ENGINE_STREAM_CHUNK_SIZE=3):
+                log = execute(
+                    self.stream_plan("fn_double"),
+                    mode=mode,
+                    streaming=True,
+                    trace="summary"
+                ).execution_log
+
+            self.assertEqual(len(EVENTS), 4, mode)
+
+            numbers, split, double = [entry["profile"] for entry in log]
+
+            self.assertEqual(numbers["output_rows"], {"numbers": 10})
+            self.assertEqual(
+                (split["input_rows"], split["output_rows"], split["chunks"]),
+                ({"numbers": 10}, {"evens": 5, "odds": 5}, 4)
+            )
+            self.assertEqual(double["input_rows"], {"evens": 5})
+            self.assertEqual(double["output_rows"], {"doubled": 5})
+
+    def test_stream_errors_fail_the_run(self):
+
+        # A failing sink, and a failing node read by a condition
+        plans = [
+            self.stream_plan("fn_explode"),
+            build_plan(
+                0,
+                [
+                    (1, "fn_numbers", {"count": 10}),
+                    (2, "fn_split", {}),
+                    (3, "fn_explode", {}),
+                    (4, "fn_sum", {}),
+                ],
+                [
+                    (1, 2, None, None),
+                    (2, 3, None, None),
+                    (3, 4, "len(exploded) > 0", None),
+                ]
+            )
+        ]
+
+        for plan in plans:
+            for mode in ("sequential", "dataflow"):
+                with self.assertRaisesMessage(ValueError, "exploded"):
+                    execute(plan, mode=mode, streaming=True)
+
+
+class SaveValidationTests(RuleTestCase):
+
+    def assertBadRequest(self, nodes, edges=(), message=""):
+
+        response = save_rule(self.client, nodes, edges)
+
+        self.assertEqual(response.status_code, 400, response.data)
+        self.assertIn(message, response.data["error"])
+        self.assertFalse(RuleEngine.objects.exists())
+
+    def test_params_must_be_an_object(self):
+
+        for params in (None, [], "x"):
+            self.assertBadRequest(
+                [("filter_claims", params)], message="must be an object"
+            )
+
+    def test_duplicate_node_ids_are_rejected(self):
+
+        response = self.client.post(
+            "/rule_engine/rules/save/",
+            {
+                "rule_name": "duplicates",
+                "nodes": [
+                    {"id": "a", "data": {"function_name": "filter_claims"}},
+                    {"id": "a", "data": {"function_name": "load_claims"}},
+                ],
+                "edges": []
+            },
+            format="json"
+        )
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("unique", response.data["error"])
+
+    def test_ambiguous_function_is_rejected(self):
+
+        RuleLogic.objects.create(
+            function_name="filter_claims", input_params=2, output_params=1
+        )
+
+        self.assertBadRequest(
+            [("filter_claims", {"min_amount": 1})],
+            message="registered more than once"
+        )
+
+    def test_unknown_function_and_dangling_edge_are_rejected(self):
+
+        self.assertBadRequest(
+            [("no_such_function", {})], message="not registered"
+        )
+        self.assertBadRequest(
+            [("filter_claims", {})], [(1, 2, {})], message="Invalid target"
+        )
+
+
+class DiscoveryTests(TestCase):
+
+    def scan(self, source):
+
+        with tempfile.TemporaryDirectory() as directory:
+
+            path = Path(directory) / "plugin.py"
+            path.write_text(textwrap.dedent(source))
+
+            return scan_module("plugin", path)
+
+    def test_literal_arguments_are_indexed(self):
+
+        entries = self.scan("""
+            @register_function("positional", [{"name": "claims"}])
+            def first(claims, context=None):
+                pass
+
+            @registry.register_function(name="keyword", chunk_safe=True)
+            def second(claims, context=None):
+                pass
+        """)
+
+        self.assertEqual(entries, [
+            {
+                "name": "positional",
+                "module": "plugin",
+                "options": {"inputs": [{"name": "claims"}]}
+            },
+            {
+                "name": "keyword",
+                "module": "plugin",
+                "options": {"chunk_safe": True}
+            },
+        ])
+
+    def test_unreadable_arguments_import_the_module(self):
+
+        for decorator in (
+            "@register_function(**OPTIONS)",
+            "@register_function(*ARGS)",
+            "@register_function(name=NAME)",
+            "@register_function(nmae='typo')",
+            "@register_function('a', [], [], False, False, None, 1)",
+        ):
+            with self.assertLogs("rule_engine.discovery", "WARNING"):
+                entries = self.scan(f"""
+                    {decorator}
+                    def function(context=None):
+                        pass
+                """)
+
+            self.assertEqual(
+                entries, [{"module": "plugin", "eager": True}], decorator
+            )
+
+
+class JobTests(RuleTestMixin, TransactionTestCase):
+
+    def test_job_result_is_long_polled(self):
+
+        rule_id = self.claims_rule()
+
+        # Run on this thread: sqlite's shared-cache test database refuses
+        # writes from a worker thread while this one reads
+        with mock.patch("rule_engine.jobs.dispatch_job", run_job):
+            response = self.client.post(
+                f"/rule_engine/rules/{rule_id}/jobs/", {}, format="json"
+            )
+        self.assertEqual(response.status_code, 202)
+
+        response = self.client.get(
+            f"/rule_engine/jobs/{response.data['job_id']}/?wait=10"
+        )
+
+        self.assertEqual(response.data["status"], "succeeded", response.data)
+
+    def test_wait_must_be_a_finite_positive_number(self):
+
+        job = RuleEngineProcessed.objects.create(
+            rule_engine=RuleEngine.objects.create(
+                rule_name="jobs", reactflow_json={}
+            )
+        )
+
+        for wait in ("nan", "inf", "-1", "soon"):
+            response = self.client.get(
+                f"/rule_engine/jobs/{job.id}/?wait={wait}"
+            )
+            self.assertEqual(response.status_code, 400, wait)
+
+    def test_stale_running_jobs_are_failed(self):
+
+        rule = RuleEngine.objects.create(rule_name="jobs", reactflow_json={})
+        now = timezone.now()
+
+        stale, fresh = [
+            RuleEngineProcessed.objects.create(
+                rule_engine=rule,
+                status=RuleEngineProcessed.STATUS_RUNNING,
+                started_at=started_at
+            )
+            for started_at in (now - timedelta(hours=2), now)
+        ]
+
+        self.assertEqual(reap_stale_jobs(timeout=3600), 1)
+
+        stale.refresh_from_db()
+        fresh.refresh_from_db()
+
+        self.assertEqual(stale.status, RuleEngineProcessed.STATUS_FAILED)
+        self.assertEqual(fresh.status, RuleEngineProcessed.STATUS_RUNNING)
+
+
+class AsyncExecutionTests(RuleTestCase):
+
+    def test_async_functions_receive_lists_when_streaming(self):
+
+        plan = build_plan(
+            0,
+            [
+                (1, "fn_numbers", {"count": 10}),
+                (2, "fn_split", {}),
+                (3, "fn_async_count", {}),
+            ],
+            [(1, 2, None, None), (2, 3, None, None)]
+        )
+
+        executor = AsyncGraphRuleExecutor(
+            0, plan=plan, mode="dag", streaming=True, history=False
+        )
+        async_to_sync(executor.execute_async)()
+
+        data = executor.context.data
+
+        self.assertEqual(data["even_count"], 5)
+        self.assertEqual(list(data["even_copy"]), [0, 2, 4, 6, 8])
+
+    def test_body_and_flags_are_validated(self):
+
+        rule_id = self.claims_rule()
+        url = f"/rule_engine/rules/{rule_id}/execute_async/"
+
+        response = self.client.post(url, [1, 2], format="json")
+        self.assertEqual(response.status_code, 400)
+
+        response = self.client.post(
+            f"{url}?stream=yes&trace=none",
+            {"context": {}},
+            format="json"
+        )
+        self.assertEqual(response.status_code, 200)
+
+
+class MemoTests(RuleTestCase):
+
+    def setUp(self):
+
+        super().setUp()
+        get_result_cache().clear()
+
+    def test_pure_node_is_served_from_the_memo(self):
+
+        plan = build_plan(
+            0,
+            [
+                (1, "load_claims", {"client_id": "1"}),
+                (2, "calculate_claim_tax", {"tax_rate": 0.5}),
+                (3, "filter_claims_by_status", {"allowed_status": ["new"]}),
+            ],
+            [(1, 2, None, None), (1, 3, None, None)]
+        )
+
+        first, second = [execute(plan, trace="summary") for _ in range(2)]
+
+        self.assertNotIn("cached", first.execution_log[1])
+        self.assertTrue(second.execution_log[1]["cached"])
+        self.assertEqual(second.context["claims_with_tax"][0]["tax"], 50)
+
+        # Copy-on-write: the loaded claims were not given a tax field
+        self.assertNotIn("tax", second.context["claims"][0])
+
+    def test_each_value_is_hashed_once(self):
+
+        fingerprints = Fingerprints()
+        claims = [{"id": index} for index in range(100)]
+
+        with mock.patch(
+            "rule_engine.memo.pickle.dumps", wraps=pickle.dumps
+        ) as dumps:
+            first = fingerprints.get(claims)
+
+            self.assertEqual(fingerprints.get(claims), first)
+            self.assertEqual(dumps.call_count, 1)
+
+            # Outputs of a memoized node are keyed by the memo key
+            taxed = claims[:10]
+            fingerprints.derive("key", {"claims_with_tax": taxed})
+
+            self.assertNotEqual(fingerprints.get(taxed), first)
+            self.assertEqual(dumps.call_count, 1)
+
+    def test_context_reading_functions_cannot_be_pure(self):
+
+        def reads_context(claims, context=None):
+            return {"claims": [c for c in claims if context["flag"]]}
+
+        def ignores_context(claims, context=None):
+            return {"claims": claims}
+
+        with self.assertRaises(ValueError):
+            register_function(name="fn_pure_context", pure=True)(
+                reads_context
+            )
+
+        register_function(name="fn_pure_plain", pure=True)(ignores_context)
+
+
+class IncrementalTests(RuleTestCase):
+
+    def run_incremental(self, rule_id):
+
+        with CaptureQueriesContext(connection) as queries:
+            log = execute(
+                get_plan(rule_id), incremental=True, trace="summary"
+            ).execution_log
+
+        state_reads = [
+            query for query in queries.captured_queries
+            if query["sql"].startswith("SELECT")
+            and "rule_node_state" in query["sql"]
+        ]
+
+        return [entry.get("reused", False) for entry in log], state_reads
+
+    def test_rerun_reuses_every_node_with_one_query(self):
+
+        rule_id = self.claims_rule()
+
+        self.assertEqual(self.run_incremental(rule_id)[0], [False, False])
+
+        reused, state_reads = self.run_incremental(rule_id)
+
+        self.assertEqual(reused, [True, True])
+        self.assertEqual(len(state_reads), 1)
+
+    def test_states_are_not_shared_between_rules_of_the_same_name(self):
+
+        self.run_incremental(self.claims_rule())
+
+        self.assertEqual(
+            self.run_incremental(self.claims_rule())[0], [False, False]
+        )
+
+    def test_edited_rule_reuses_unchanged_upstream_nodes(self):
+
+        rule_id = self.claims_rule()
+        self.run_incremental(rule_id)
+
+        response = self.client.put(
+            f"/rule_engine/rules/{rule_id}/",
+            rule_payload(
+                [
+                    ("load_claims", {"client_id": "1"}),
+                    ("filter_claims", {"min_amount": 60}),
+                ],
+                [(1, 2, {})]
+            ),
+            format="json"
+        )
+
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual(response.data["rule_engine_id"], rule_id)
+        self.assertEqual(self.run_incremental(rule_id)[0], [True, False])
+        self.assertEqual(
+            RuleList.objects.get(
+                rule_engine_id=rule_id, rule_function_order=1
+            ).params,
+            {"min_amount": 60}
+        )
+
+    def test_tampered_state_is_recomputed(self):
+
+        rule_id = self.claims_rule()
+        self.run_incremental(rule_id)
+
+        state = RuleNodeState.objects.filter(rule_engine_id=rule_id).first()
+        output = bytearray(state.output)
+        output[-2] ^= 1
+        state.output = bytes(output)
+        state.save()
+
+        self.assertEqual(
+            sorted(self.run_incremental(rule_id)[0]), [False, True]
+        )
+        self.assertEqual(self.run_incremental(rule_id)[0], [True, True])
+        self.assertEqual(
+            RuleNodeState.objects.filter(rule_engine_id=rule_id).count(), 2
+        )
+
+
+class BenchmarkTests(TestCase):
+
+    def test_every_run_gets_fresh_inputs(self):
+
+        claims = generate_claims(10)
+        sizes = []
+
+        def run(claims):
+            sizes.append(len(claims))
+            claims.clear()
+
+        stats = measure(run, lambda: list(claims), repeat=3)
+
+        # warm-up, timed runs, memory run
+        self.assertEqual(sizes, [10] * 5)
+        self.assertEqual(stats["repeat"], 3)
+
+    def test_graph_benchmark_does_not_touch_the_dataset(self):
+
+        claims = generate_claims(50)
+        before = repr(claims)
+
+        results = benchmark_graph("diamond", 4, claims, repeat=2)
+
+        self.assertEqual(repr(claims), before)
+        self.assertEqual([result["rows"] for result in results], [50, 50])
+
+    def test_graph_benchmark_loads_stored_plans_cold_and_warm(self):
+
+        cold, warm = benchmark_graph(
+            "chain", 3, generate_claims(20), repeat=2
+        )
+
+        self.assertEqual((cold["plan"], warm["plan"]), ("cold", "warm"))
+        self.assertEqual(
+            result_key(cold), "graph/chain/3/20/sequential/cold"
+        )
+
+        # Cold runs compile the plan from the rule's node and edge rows
+        self.assertGreaterEqual(cold["queries"], 2)
+        self.assertLess(warm["queries"], cold["queries"])
+        self.assertFalse(
+            RuleEngine.objects.filter(rule_name="benchmark-chain-3").exists()
+        )
+
+
+class MemoryProfileTests(TestCase):
+
+    def test_traced_calls_do_not_overlap(self):
+
+        events = []
+
+        def allocate(label):
+            events.append(("start", label))
+            data = bytearray(1 << 20)
+            time.sleep(0.05)
+            events.append(("end", label))
+            return {"size": len(data)}
+
+        profiles = {}
+
+        def call(label):
+            profiles[label] = timed_call(allocate, {"label": label}, True)[1]
+
+        threads = [
+            threading.Thread(target=call, args=(label,)) for label in "ab"
+        ]
+
+        for thread in threads:
+            thread.start()
+
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(events[0][1], events[1][1])
+        self.assertFalse(tracemalloc.is_tracing())
+
+        for profile in profiles.values():
+            self.assertGreaterEqual(profile["memory_bytes"], 1 << 20)
+
+
+class HistoryTests(RuleTestCase):
+
+    def execute_rule(self, rule_id, query=""):
+
+        response = self.client.post(
+            f"/rule_engine/rules/{rule_id}/execute/{query}",
+            {"context": {}},
+            format="json"
+        )
+        self.assertEqual(response.status_code, 200)
+
+    def old_run(self, rule_id, days, run_status, duration):
+
+        return RuleRun.objects.create(
+            rule_engine_id=rule_id,
+            status=run_status,
+            mode="sequential",
+            started_at=timezone.now() - timedelta(days=days),
+            duration_ms=duration,
+            nodes_executed=2
+        )
+
+    def test_runs_are_recorded_on_request_only(self):
+
+        rule_id = self.claims_rule()
+
+        self.execute_rule(rule_id)
+        self.assertFalse(RuleRun.objects.exists())
+
+        self.execute_rule(rule_id, "?history=1")
+
+        run = RuleRun.objects.get()
+        self.assertEqual(run.nodes_executed, 2)
+        self.assertEqual(RuleNodeRun.objects.filter(run=run).count(), 2)
+
+    def test_old_runs_are_rolled_up(self):
+
+        rule_id = self.claims_rule()
+
+        for duration, run_status in ((10, "succeeded"), (30, "failed")):
+            self.old_run(rule_id, 5, run_status, duration)
+
+        recent = self.old_run(rule_id, 0, "succeeded", 20)
+
+        self.assertEqual(prune_runs(2), 2)
+        self.assertEqual(list(RuleRun.objects.all()), [recent])
+
+        rollup = RuleRunDaily.objects.get()
+
+        self.assertEqual(
+            (rollup.runs, rollup.failures, rollup.duration_total_ms),
+            (2, 1, 40)
+        )
+
+        # ?status= does not apply to rollups
+        response = self.client.get(
+            f"/rule_engine/runs/daily/?rule_id={rule_id}&status=failed"
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["count"], 1)
+
+    def test_failed_prune_keeps_runs_and_rollups_unchanged(self):
+
+        rule_id = self.claims_rule()
+        self.old_run(rule_id, 5, "succeeded", 10)
+
+        with mock.patch.object(
+            RuleNodeRun.objects, "filter", side_effect=RuntimeError
+        ):
+            with self.assertRaises(RuntimeError):
+                prune_runs(2)
+
+        self.assertEqual(RuleRun.objects.count(), 1)
+        self.assertFalse(RuleRunDaily.objects.exists())
+
+
+class RecordTests(TestCase):
+
+    def wide_claim(self):
+
+        return {f"field_{index}": index for index in range(COPY_MAX_FIELDS)}
+
+    def test_updates_leave_the_original_claim_unchanged(self):
+
+        for claim in ({"claim_id": 1}, self.wide_claim()):
+
+            original = dict(claim)
+            updated = with_values(with_value(claim, "tax", 5), status="ok")
+
+            self.assertEqual(claim, original)
+            self.assertEqual(
+                dict(updated), {**original, "tax": 5, "status": "ok"}
+            )
+
+        self.assertIsInstance(with_value(self.wide_claim(), "x", 1), Mapping)
+        self.assertIs(type(with_value({"claim_id": 1}, "x", 1)), dict)
+
+    def test_assignment_is_rejected(self):
+
+        base = self.wide_claim()
+        first = ClaimRecord(base, "tax", 5)
+        second = ClaimRecord(first, "status", "ok")
+
+        with self.assertRaises(TypeError):
+            second["tax"] = 7
+
+        self.assertEqual(base, self.wide_claim())
+        self.assertEqual((second["tax"], first["tax"]), (5, 5))
+
+        # Long chains of writes flatten instead of growing the chain
+        for index in range(20):
+            second = with_value(second, f"extra_{index}", index)
+
+        self.assertLessEqual(second._depth, MAX_DEPTH)
+        self.assertEqual(second["extra_19"], 19)
+        self.assertEqual(second["field_0"], 0)
+        self.assertEqual(len(second), COPY_MAX_FIELDS + 22)
+        self.assertEqual(
+            pickle.loads(pickle.dumps(second)), second.to_dict()
+        )
+
+
+class MappingTests(RuleTestCase):
+
+    def mapped_rule(self, mapping):
+
+        # split -> sum, where sum may also read the context
+        return self.save(
+            [("fn_split", {}), ("fn_sum", {})],
+            [(1, 2, {"mapping": mapping})]
+        )
+
+    def even_total(self, rule_id):
+
+        executor = execute(
+            get_plan(rule_id),
+            context={"numbers": list(range(10)), "evens": [100]},
+            mode="dataflow"
+        )
+
+        return executor.context.data["even_total"]
+
+    def test_mappings_select_outputs(self):
+
+        self.assertEqual(self.even_total(self.mapped_rule(None)), 20)
+        self.assertEqual(
+            self.even_total(self.mapped_rule({"evens": "odds"})), 25
+        )
+
+    def test_empty_mapping_passes_nothing(self):
+
+        rule_id = self.mapped_rule({})
+
+        self.assertEqual(
+            RuleEdge.objects.get(rule_engine_id=rule_id).mapping, {}
+        )
+        self.assertEqual(self.even_total(rule_id), 100)
+
+    def test_mappings_require_dataflow_mode(self):
+
+        rule_id = self.mapped_rule({})
+
+        for mode in ("sequential", "dag"):
+
+            with self.assertRaises(PlanModeError):
+                execute(get_plan(rule_id), mode=mode)
+
+            response = self.client.post(
+                f"/rule_engine/rules/{rule_id}/execute/?mode={mode}",
+                {"context": {}},
+                format="json"
+            )
+            self.assertEqual(response.status_code, 400)
+
+
+class SharedBatchTests(TestCase):
+
+    def object_column(self, values):
+
+        column = np.empty(len(values), dtype=object)
+        column[:] = values
+
+        return column
+
+    def test_columns_load_with_their_types_and_values(self):
+
+        columns = {
+            "amount": np.array([1, 2, 3], dtype=np.int64),
+            "count": self.object_column([1, 2, 3]),
+            "flag": self.object_column([True, False, True]),
+            "sparse": self.object_column([1, None, 3]),
+            "mixed": self.object_column([1, 2.5, None]),
+            "rate": self.object_column([0.5, None, 1.5]),
+            "status": self.object_column(["a", None, "a"]),
+        }
+
+        with tempfile.TemporaryDirectory() as directory:
+            loaded = share_batch(
+                ClaimBatch(columns, 3), directory
+            ).load(unlink=True).columns
+
+        for field, column in columns.items():
+            self.assertEqual(loaded[field].dtype, column.dtype, field)
+            self.assertEqual(
+                [type(value) for value in loaded[field].tolist()],
+                [type(value) for value in column.tolist()],
+                field
+            )
+            self.assertEqual(
+                loaded[field].tolist(), column.tolist(), field
+            )
+
+
+class TraceTests(TestCase):
+
+    def execute_traced(self, trace):
+
+        # split overwrites the `evens` input, double adds `doubled`
+        plan = build_plan(
+            0,
+            [(1, "fn_split", {}), (2, "fn_double", {})],
+            [(1, 2, None, None)]
+        )
+
+        return execute(
+            plan,
+            context={"numbers": list(range(10)), "evens": []},
+            trace=trace
+        ).execution_log
+
+    def test_none_and_summary(self):
+
+        self.assertEqual(self.execute_traced("none"), [])
+        self.assertEqual(
+            [entry["outputs"] for entry in self.execute_traced("summary")],
+            [{"evens": 5, "odds": 5}, {"doubled": 5}]
+        )
+
+    def test_diff_is_the_default(self):
+
+        split, double = self.execute_traced(None)
+
+        self.assertEqual(
+            (split["added"], split["changed"], split["overwritten"]),
+            (["odds"], ["evens"], {"evens": None})
+        )
+        self.assertEqual(split["sizes"], {"evens": 5, "odds": 5})
+        self.assertEqual(
+            (double["added"], double["changed"]), (["doubled"], [])
+        )
+
+        with self.settings(RULE_ENGINE_TRACE_LEVEL="summary"):
+            self.assertIn("outputs", self.execute_traced(None)[0])
+
+    def test_full_snapshots_are_not_changed_by_later_nodes(self):
+
+        split, double = self.execute_traced("full")
+
+        self.assertEqual(split["result"]["odds"], [1, 3, 5, 7, 9])
+        self.assertNotIn("doubled", split["context_after"])
+        self.assertEqual(split["context_after"]["evens"], [0, 2, 4, 6, 8])
+        self.assertEqual(double["context_after"]["doubled"], [0, 4, 8, 12, 16])
+
+    def test_unknown_level_is_rejected(self):
+
+        with self.assertRaises(ValueError):
+            GraphRuleExecutor(0, trace="verbose")
+
+
+class BinderTests(TestCase):
+
+    def test_signatures_are_read_once_at_registration(self):
+
+        meta = get_function_meta("fn_double")
+
+        self.assertEqual(meta.parameters, ("evens",))
+        self.assertTrue(meta.takes_context)
+        self.assertFalse(meta.takes_kwargs)
+        self.assertTrue(get_function_meta("fn_options").takes_kwargs)
+
+    def test_params_win_over_context_values(self):
+
+        context = ExecutionContext({"evens": [1], "odds": [2], "limit": 3})
+        meta = get_function_meta("fn_double")
+
+        kwargs = meta.binder({})(context)
+
+        self.assertEqual(set(kwargs), {"evens", "context"})
+        self.assertEqual(kwargs["evens"], [1])
+        self.assertIs(kwargs["context"], context)
+
+        kwargs = meta.binder({"evens": [9], "limit": 5})(context)
+
+        self.assertEqual(kwargs["evens"], [9])
+        self.assertEqual(kwargs["context"]["limit"], 5)
+        self.assertEqual(context["limit"], 3)
+
+        # Missing arguments are left to the function's defaults
+        self.assertEqual(
+            meta.binder(None)(ExecutionContext()),
+            {"context": ExecutionContext()}
+        )
+
+    def test_kwargs_functions_get_every_value(self):
+
+        context = ExecutionContext({"label": "a", "rate": 1})
+
+        kwargs = get_function_meta("fn_options").binder({"rate": 2})(
+            context
+        )
+
+        self.assertEqual(
+            fn_options(**kwargs),
+            {"options": {"label": "a", "rate": 2}}
+        )
+
+
+class CatalogTests(RuleTestCase):
+
+    def test_catalog_is_cached_and_tagged(self):
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get("/rule_engine/functions/")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(model_queries(queries)), 2)
+
+        names = [function["function_name"] for function in response.data]
+        self.assertIn("fn_split", names)
+
+        split = response.data[names.index("fn_split")]
+        self.assertEqual(
+            [output["name"] for output in split["outputs"]],
+            ["evens", "odds"]
+        )
+
+        with CaptureQueriesContext(connection) as queries:
+            cached = self.client.get(
+                "/rule_engine/functions/",
+                HTTP_IF_NONE_MATCH=response["ETag"]
+            )
+
+        self.assertEqual(cached.status_code, 304)
+        self.assertEqual(model_queries(queries), [])
+
+    def test_catalog_changes_with_the_registry(self):
+
+        etag = self.client.get("/rule_engine/functions/")["ETag"]
+
+        RuleLogic.objects.get(function_name="fn_sum").delete()
+        sync_function_registry()
+
+        response = self.client.get(
+            "/rule_engine/functions/", HTTP_IF_NONE_MATCH=etag
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+
+
+class RegistrySyncTests(RuleTestCase):
+
+    def register(self, inputs):
+
+        # Registered under a name the other tests never see
+        self.addCleanup(FUNCTION_REGISTRY.pop, "fn_synced", None)
+
+        with self.assertNumQueries(0):
+            register_function(name="fn_synced", inputs=inputs)(
+                lambda **values: {}
+            )
+
+    def test_sync_writes_only_what_changed(self):
+
+        sync_function_registry()
+        self.register(["label"])
+
+        self.assertEqual(
+            save_rule(self.client, [("fn_synced", {})]).status_code, 400
+        )
+
+        result = sync_function_registry()
+        self.assertEqual((result["created"], result["updated"]), (1, 0))
+
+        self.save([("fn_synced", {})])
+
+        self.register([{"name": "label", "type": "string"}, "limit"])
+
+        result = sync_function_registry()
+        self.assertEqual((result["created"], result["updated"]), (0, 0))
+        self.assertEqual(result["param_groups_rewritten"], 1)
+
+        response = self.client.get("/rule_engine/functions/")
+        synced = next(
+            function for function in response.data
+            if function["function_name"] == "fn_synced"
+        )
+        self.assertEqual(
+            [param["name"] for param in synced["inputs"]],
+            ["label", "limit"]
+        )
+
+    def test_unchanged_registry_is_not_written(self):
+
+        sync_function_registry()
+
+        with CaptureQueriesContext(connection) as queries:
+            self.assertFalse(sync_function_registry()["changed"])
+
+        self.assertFalse([
+            query for query in queries.captured_queries
+            if query["sql"].split()[0] in ("INSERT", "UPDATE", "DELETE")
+        ])
+
+        # Functions without outputs store group 0
+        self.assertEqual(
+            RuleLogic.objects.get(function_name="fn_sleep").output_params,
+            0
+        )
+
+
+class SamplingProfilerTests(RuleTestCase):
+
+    def test_samples_are_attributed_to_nodes(self):
+
+        rule_id = self.save([("fn_sleep", {"delay": 0.1, "label": "a"})])
+        node_id = get_plan(rule_id).start_nodes[0].id
+
+        with tempfile.TemporaryDirectory() as directory:
+
+            with self.settings(
+                RULE_ENGINE_PROFILE_INTERVAL=0.001,
+                RULE_ENGINE_PROFILE_DIR=directory
+            ):
+                response = self.client.post(
+                    f"/rule_engine/rules/{rule_id}/execute/?profile=1",
+                    {"context": {}},
+                    format="json"
+                )
+
+            self.assertEqual(response.status_code, 200)
+
+            profile = response.data["profile"]
+            label = f"node {node_id} fn_sleep"
+
+            self.assertGreater(profile["nodes"].get(label, 0), 10)
+            self.assertEqual(profile["samples"], sum(
+                profile["nodes"].values()
+            ))
+            self.assertIn(f"{label};", profile["stacks"])
+            self.assertIn("fn_sleep (tests.py:", profile["stacks"])
+            self.assertEqual(
+                Path(profile["path"]).read_text(), profile["stacks"] + "\n"
+            )
+
+        self.assertEqual(len(response.data["execution_log"]), 1)
+
+    def test_unprofiled_runs_return_the_log_only(self):
+
+        rule_id = self.save([("fn_sleep", {"delay": 0, "label": "a"})])
+
+        response = self.client.post(
+            f"/rule_engine/rules/{rule_id}/execute/",
+            {"context": {}},
+            format="json"
+        )
+
+        self.assertIsInstance(response.data, list)
+
+
+class ExecutionContextTests(TestCase):
+
+    def test_values_keep_their_producers(self):
+
+        context = ExecutionContext({"claims": [1]})
+        context.record(3, {"claims": [2], "total": 2})
+        context["note"] = "manual"
+
+        self.assertEqual(
+            context.provenance(), {"claims": 3, "total": 3, "note": None}
+        )
+        self.assertEqual(context.data["claims"], [2])
+
+        del context["total"]
+
+        with self.assertRaises(KeyError):
+            context.producer("total")
+
+    def test_scopes_layer_params_over_the_context(self):
+
+        context = ExecutionContext({"limit": 1, "rate": 2})
+        scope = context.scope({"limit": 5})
+
+        self.assertIs(context.scope({}), context)
+        self.assertEqual(dict(scope), {"limit": 5, "rate": 2})
+        self.assertEqual(len(scope), 2)
+
+        # Writes reach the context, where params do not shadow them
+        scope["limit"] = 7
+        scope["extra"] = 3
+
+        self.assertEqual(scope["limit"], 5)
+        self.assertEqual((context["limit"], context["extra"]), (7, 3))
+
+    def test_snapshots_replay_the_writes_up_to_them(self):
+
+        context = ExecutionContext({"a": 1}, versioned=True)
+
+        context.record(1, {"a": 2, "b": 3})
+        first = context.snapshot()
+
+        del context["b"]
+        context.record(2, {"a": 4})
+        second = context.snapshot()
+
+        self.assertEqual(dict(first), {"a": 2, "b": 3})
+        self.assertEqual(dict(second), {"a": 4})
+
+        # Unversioned contexts copy; everything pickles as a plain dict
+        self.assertEqual(ExecutionContext({"a": 1}).snapshot(), {"a": 1})
+
+        for value in (context, context.scope({"c": 5}), first):
+            self.assertIs(type(pickle.loads(pickle.dumps(value))), dict)
+
+
+class PartitioningTests(TestCase):
+
+    def split_plan(self, condition=None):
+
+        # split -> double (row-wise) and split -> sum (not chunk-safe)
+        return build_plan(
+            0,
+            [
+                (1, "fn_split", {}),
+                (2, "fn_double", {}),
+                (3, "fn_sum", {}),
+            ],
+            [(1, 2, condition, None), (1, 3, None, None)]
+        )
+
+    def test_segments_follow_unconditional_row_wise_edges(self):
+
+        segments = find_segments(self.split_plan())
+
+        self.assertEqual(list(segments), [1])
+        self.assertEqual(
+            [step.node_id for step in segments[1].steps], [1, 2]
+        )
+
+        segments = find_segments(self.split_plan("len(evens) > 0"))
+
+        self.assertEqual(sorted(segments), [1, 2])
+
+    def test_partitioned_run_matches_a_whole_run(self):
+
+        plan = self.split_plan()
+        context = {"numbers": list(range(100))}
+        results = []
+
+        for partitioned in (False, True):
+
+            EVENTS.clear()
+
+            with self.settings(RULE_ENGINE_PARTITION_ROWS=25):
+                executor = execute(
+                    plan,
+                    context=context,
+                    mode="dataflow",
+                    pool="thread",
+                    max_workers=4,
+                    partitioned=partitioned
+                )
+
+            results.append(executor.context.data)
+
+        self.assertEqual(sorted(EVENTS), [("split", 25)] * 4)
+        self.assertEqual(results[0], results[1])
+        self.assertEqual(results[1]["even_total"], 2450)
+        self.assertEqual(results[1]["doubled"][:3], [0, 4, 8])
+
+    def test_partitioning_requires_dataflow_mode(self):
+
+        with self.assertRaises(ValueError):
+            GraphRuleExecutor(0, mode="dag", partitioned=True)
+
+
+class NodeProfileTests(RuleTestCase):
+
+    def test_profiles_are_logged_and_exported(self):
+
+        plan = build_plan(
+            0,
+            [(1, "fn_split", {}), (2, "fn_double", {})],
+            [(1, 2, None, None)]
+        )
+
+        log = execute(
+            plan, context={"numbers": list(range(10))}, trace="summary"
+        ).execution_log
+
+        profile = log[0]["profile"]
+
+        self.assertEqual(profile["input_rows"], {"numbers": 10})
+        self.assertEqual(profile["output_rows"], {"evens": 5, "odds": 5})
+        self.assertGreaterEqual(profile["wall_ms"], 0)
+        self.assertGreaterEqual(profile["cpu_ms"], 0)
+
+        response = self.client.get("/rule_engine/metrics/")
+        body = response.content.decode()
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(
+            'rule_engine_node_output_rows_bucket{function="fn_split",'
+            'le="10"}',
+            body
+        )
+
+
+class ProcessPoolTests(TestCase):
+
+    def test_shared_batches_match_thread_pool_results(self):
+
+        self.addCleanup(shutdown_pools)
+
+        plan = build_plan(
+            0,
+            [
+                (1, "filter_claims_columnar", {"min_amount": 50}),
+                (2, "calculate_claim_tax_columnar", {"tax_rate": 0.1}),
+            ],
+            [(1, 2, None, None)]
+        )
+
+        claims = ClaimBatch.from_records(generate_claims(500))
+        results = []
+
+        with tempfile.TemporaryDirectory() as directory:
+
+            for pool in ("thread", "process"):
+
+                with self.settings(
+                    RULE_ENGINE_SHARED_MIN_ROWS=100,
+                    RULE_ENGINE_SHARED_DIR=directory
+                ), mock.patch(
+                    "rule_engine.shared.share_batch", wraps=share_batch
+                ) as shared:
+                    executor = execute(
+                        plan,
+                        context={"claims": claims},
+                        pool=pool,
+                        max_workers=2,
+                        shared_memory=True
+                    )
+
+                # Only the process pool hands batches over in files
+                self.assertEqual(shared.called, pool == "process")
+                results.append(
+                    records(executor.context.data["claims_with_tax"])
+                )
+
+            # Input files are removed when the run ends
+            self.assertEqual(list(Path(directory).iterdir()), [])
+
+        self.assertEqual(results[0], results[1])
+        self.assertTrue(results[1])
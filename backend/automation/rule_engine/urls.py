@@ -29,4 +29,44 @@ urlpatterns = [
         "rules/<int:rule_id>/execute/",
         views.execute_rule
     ),
+
+    path(
+        "rules/<int:rule_id>/execute_async/",
+        views.execute_rule_async
+    ),
+
+    path(
+        "rules/<int:rule_id>/execute_batch/",
+        views.execute_rule_batch
+    ),
+
+    path(
+        "rules/<int:rule_id>/jobs/",
+        views.submit_rule_job
+    ),
+
+    path(
+        "jobs/<int:job_id>/",
+        views.job_details
+    ),
+
+    path(
+        "metrics/",
+        views.node_metrics
+    ),
+
+    path(
+        "runs/",
+        views.list_runs
+    ),
+
+    path(
+        "runs/daily/",
+        views.list_daily_runs
+    ),
+
+    path(
+        "runs/<int:run_id>/",
+        views.run_details
+    ),
 ]
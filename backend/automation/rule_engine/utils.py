@@ -35,3 +35,11 @@ def topological_sort(nodes, edges):
                 queue.append(neighbor)
 
     return order
+
+
+def percentile(values, percent):
+
+    # Nearest-rank percentile of sorted values
+    rank = max(1, -(-len(values) * percent // 100))
+
+    return values[int(rank) - 1]
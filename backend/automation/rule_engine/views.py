@@ -1,67 +1,75 @@
 import json
-
+import math
+from datetime import datetime, time
+
+from django.http import HttpResponse, JsonResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import etag, require_GET, require_POST
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
 from rest_framework.decorators import api_view
+from rest_framework.pagination import PageNumberPagination
 from rest_framework.response import Response
+from rest_framework.utils.encoders import JSONEncoder
 
 from .models import RuleEdge, RuleEngine, RuleLogic, RuleList
 from .registry import get_all_functions
-from .executor import GraphRuleExecutor as RuleExecutor
+from .executor import GraphRuleExecutor as RuleExecutor, execute_batch
+from .async_executor import AsyncGraphRuleExecutor
+from .plan import GraphCycleError, PlanModeError, invalidate_plan
+from .catalog import get_function_catalog
+from .metrics import render_metrics
+from .profiler import SamplingProfiler
+from .conditions import ConditionError, compile_condition
 from .utils import topological_sort
-from .serializers import RuleEngineSerializer, RuleListSerializer
+from .serializers import (
+    RuleEngineJobSerializer,
+    RuleEngineSerializer,
+    RuleListSerializer,
+    RuleRunDailySerializer,
+    RuleRunDetailSerializer,
+    RuleRunSerializer
+)
+from .jobs import submit_job, wait_for_job
 
 from rest_framework.decorators import api_view
 from rest_framework.response import Response
 
-from rule_engine.models import RuleLogic, ParamModel
+from rule_engine.models import RuleLogic
 
 # API 1: Discover Functions
 
 
-@api_view(["GET"])
-def discover_functions(request):
-
-    functions = RuleLogic.objects.all()
-
-    result = []
-
-    for function in functions:
-
-        inputs = _get_params(function.input_params)
-
-        outputs = _get_params(function.output_params)
-
-        result.append({
-            "function_name": function.function_name,
-            "inputs": inputs,
-            "outputs": outputs
-        })
+def _function_catalog_etag(request):
 
-    return Response(result)
+    return get_function_catalog()[1]
 
 
-def _get_params(parameter_group_id):
+@api_view(["GET"])
+@etag(_function_catalog_etag)
+def discover_functions(request):
 
-    if not parameter_group_id:
-        return []
+    # Unchanged catalogs are answered with 304 by the etag decorator
+    payload, _ = get_function_catalog()
 
-    params = ParamModel.objects.filter(
-        parameter_group_id=parameter_group_id
-    ).exclude(param_name="__group__")
-
-    return [
-        {
-            "name": param.param_name,
-            "type": param.param_type
-        }
-        for param in params
-    ]
+    return Response(payload)
 
 
+from django.conf import settings
+from django.db import transaction
 from rest_framework.decorators import api_view
 from rest_framework.response import Response
 from rest_framework import status
 
-from .models import RuleEngine, RuleList, RuleLogic, RuleEdge
+from .models import (
+    RuleEngine,
+    RuleEngineProcessed,
+    RuleList,
+    RuleLogic,
+    RuleEdge,
+    RuleRun,
+    RuleRunDaily
+)
 
 
 @api_view(["POST"])
@@ -71,119 +79,618 @@ def save_rule(request):
     nodes = request.data.get("nodes")
     edges = request.data.get("edges")
 
+    error, rule_logic_map = _validate_rule(rule_name, nodes, edges)
+
+    if error:
+        return error
+
+    # -------- WRITE (single transaction) --------
+    with transaction.atomic():
+
+        rule_engine = RuleEngine.objects.create(
+            rule_name=rule_name,
+            reactflow_json={
+                "nodes": nodes,
+                "edges": edges
+            }
+        )
+
+        _write_rule_graph(rule_engine, nodes, edges, rule_logic_map)
+
+    return Response(
+        {
+            "message": "Rule saved successfully",
+            "rule_engine_id": rule_engine.id
+        },
+        status=status.HTTP_201_CREATED
+    )
+
+
+def _validate_rule(rule_name, nodes, edges):
+
+    # (error response, rule_logic_map) of a rule graph being saved
     # -------- VALIDATION --------
     if not rule_name:
         return Response(
             {"error": "rule_name is required"},
             status=status.HTTP_400_BAD_REQUEST
-        )
+        ), None
 
     if not nodes:
         return Response(
             {"error": "nodes are required"},
             status=status.HTTP_400_BAD_REQUEST
-        )
+        ), None
 
     if edges is None:
         return Response(
             {"error": "edges are required (can be empty list)"},
             status=status.HTTP_400_BAD_REQUEST
-        )
+        ), None
 
     # Add IDs to edges if missing
     for i, edge in enumerate(edges):
         if "id" not in edge:
             edge["id"] = f"edge-{i+1}"
 
-    # -------- CREATE RULE ENGINE --------
-    rule_engine = RuleEngine.objects.create(
-        rule_name=rule_name,
-        reactflow_json={
-            "nodes": nodes,
-            "edges": edges
-        }
-    )
+    # Conditions are compiled here so bad expressions fail the save
+    # instead of silently evaluating to False at runtime
+    for edge in edges:
+        try:
+            compile_condition(edge.get("condition"))
+        except ConditionError as exc:
+            return Response(
+                {"error": f"Invalid condition on edge {edge['id']}: {exc}"},
+                status=status.HTTP_400_BAD_REQUEST
+            ), None
+
+    # -------- RESOLVE FUNCTIONS (one query) --------
+    for node in nodes:
+        if not node.get("data", {}).get("function_name"):
+            return Response(
+                {"error": f"function_name missing in node {node.get('id')}"},
+                status=status.HTTP_400_BAD_REQUEST
+            ), None
+
+        if not isinstance(node["data"].get("params", {}), dict):
+            return Response(
+                {"error": f"params must be an object (node {node.get('id')})"},
+                status=status.HTTP_400_BAD_REQUEST
+            ), None
 
-    # -------- CREATE NODES --------
-    node_instance_map = {}
+    node_ids = {node.get("id") for node in nodes}
 
-    for index,node in enumerate(nodes):
+    # Edges and node rows are matched by id
+    if len(node_ids) != len(nodes):
+        return Response(
+            {"error": "Node ids must be unique"},
+            status=status.HTTP_400_BAD_REQUEST
+        ), None
 
-        node_id = node.get("id")
-        data = node.get("data", {})
+    function_names = {node["data"]["function_name"] for node in nodes}
 
-        function_name = data.get("function_name")
-        params = data.get("params", {})
+    rule_logic_map = {}
 
-        if not function_name:
+    for rule_logic in RuleLogic.objects.filter(
+        function_name__in=function_names
+    ):
+        if rule_logic.function_name in rule_logic_map:
             return Response(
-                {"error": f"function_name missing in node {node_id}"},
+                {"error": (
+                    f"Function '{rule_logic.function_name}' is registered "
+                    "more than once"
+                )},
                 status=status.HTTP_400_BAD_REQUEST
-            )
+            ), None
 
-        try:
-            rule_logic = RuleLogic.objects.get(
-                function_name=function_name
-            )
-        except RuleLogic.DoesNotExist:
+        rule_logic_map[rule_logic.function_name] = rule_logic
+
+    for function_name in function_names:
+        if function_name not in rule_logic_map:
             return Response(
                 {"error": f"Function '{function_name}' not registered"},
                 status=status.HTTP_400_BAD_REQUEST
-            )
+            ), None
 
-        rule_node = RuleList.objects.create(
-            rule_engine=rule_engine,
-            rule_logic=rule_logic,
-            rule_function_order=index,
-            params=params
-        )
-
-        node_instance_map[node_id] = rule_node
-
-    # -------- CREATE EDGES --------
     for edge in edges:
 
         source_id = edge.get("source")
         target_id = edge.get("target")
-        condition = edge.get("condition")
 
-        if source_id not in node_instance_map:
+        if source_id not in node_ids:
             return Response(
                 {"error": f"Invalid source node: {source_id}"},
                 status=status.HTTP_400_BAD_REQUEST
-            )
+            ), None
 
-        if target_id not in node_instance_map:
+        if target_id not in node_ids:
             return Response(
                 {"error": f"Invalid target node: {target_id}"},
                 status=status.HTTP_400_BAD_REQUEST
-            )
+            ), None
+
+    # Dataflow mappings name declared outputs of the source and declared
+    # inputs of the target; undeclared functions are not checked
+    node_functions = {
+        node.get("id"): node["data"]["function_name"] for node in nodes
+    }
+    functions = get_all_functions()
+
+    for edge in edges:
+
+        error = _mapping_error(
+            edge.get("mapping"),
+            functions.get(node_functions[edge.get("source")]),
+            functions.get(node_functions[edge.get("target")])
+        )
+
+        if error:
+            return Response(
+                {"error": f"Invalid mapping on edge {edge['id']}: {error}"},
+                status=status.HTTP_400_BAD_REQUEST
+            ), None
+
+    return None, rule_logic_map
+
+
+def _write_rule_graph(rule_engine, nodes, edges, rule_logic_map):
+
+    rule_nodes = RuleList.objects.bulk_create([
+        RuleList(
+            rule_engine=rule_engine,
+            rule_logic=rule_logic_map[node["data"]["function_name"]],
+            rule_function_order=index,
+            params=node["data"].get("params", {})
+        )
+        for index, node in enumerate(nodes)
+    ])
+
+    # Backends that cannot return ids from a bulk insert
+    if any(rule_node.pk is None for rule_node in rule_nodes):
+        rule_nodes = list(
+            RuleList.objects.filter(rule_engine=rule_engine)
+        )
 
-        RuleEdge.objects.create(
+    node_instance_map = {
+        node.get("id"): rule_node
+        for node, rule_node in zip(nodes, rule_nodes)
+    }
+
+    RuleEdge.objects.bulk_create([
+        RuleEdge(
             rule_engine=rule_engine,
-            source=node_instance_map[source_id],
-            target=node_instance_map[target_id],
-            condition=condition
+            source=node_instance_map[edge.get("source")],
+            target=node_instance_map[edge.get("target")],
+            condition=edge.get("condition"),
+            mapping=edge.get("mapping")
         )
+        for edge in edges
+    ])
+
+
+def _mapping_error(mapping, source_meta, target_meta):
+
+    if mapping is None:
+        return None
+
+    if not isinstance(mapping, dict) or not all(
+        isinstance(name, str) and isinstance(output, str)
+        for name, output in mapping.items()
+    ):
+        return "mapping must be an object of input name -> output name"
+
+    outputs = _declared_names(getattr(source_meta, "outputs", ()))
+    inputs = _declared_names(getattr(target_meta, "inputs", ()))
+
+    for name, output in mapping.items():
+
+        if outputs and output not in outputs:
+            return f"'{output}' is not an output of the source function"
+
+        if inputs and name not in inputs:
+            return f"'{name}' is not an input of the target function"
+
+    return None
+
+
+def _declared_names(entries):
+
+    return {entry["name"] for entry in entries if isinstance(entry, dict)}
 
-    return Response(
-        {
-            "message": "Rule saved successfully",
-            "rule_engine_id": rule_engine.id
-        },
-        status=status.HTTP_201_CREATED
-    )
 
 # API 3: Execute Rule (Debug)
 
 @api_view(["POST"])
 def execute_rule(request, rule_id):
 
-    executor = RuleExecutor(rule_id)
+    if not isinstance(request.data, dict):
+        return Response(
+            {"error": "request body must be an object"},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    context = request.data.get("context") or {}
+
+    if not isinstance(context, dict):
+        return Response(
+            {"error": "context must be an object"},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    # ?profile=1 samples the execution; node calls then run inline
+    sampler = None
+
+    if _query_flag(request, "profile"):
+        sampler = SamplingProfiler(
+            getattr(settings, "RULE_ENGINE_PROFILE_INTERVAL", 0.005)
+        )
+
+    try:
+        executor = RuleExecutor(
+            rule_id,
+            mode=request.query_params.get("mode"),
+            context=context,
+            streaming=_query_flag(request, "stream"),
+            trace=request.query_params.get("trace"),
+            incremental=_query_flag(request, "incremental"),
+            profile_memory=_query_flag(request, "memory"),
+            sampler=sampler,
+            partitioned=_query_flag(request, "partition"),
+            history=_query_flag(request, "history")
+        )
+    except ValueError as exc:
+        return Response(
+            {"error": str(exc)},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    # Cycles and mappings outside dataflow mode are only found once the
+    # plan is loaded
+    try:
+        if sampler is None:
+            return Response(executor.execute())
+
+        with sampler:
+            result = executor.execute()
+    except (GraphCycleError, PlanModeError) as exc:
+        return Response(
+            {"error": str(exc)},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    profile = sampler.to_dict()
+
+    profile_dir = getattr(settings, "RULE_ENGINE_PROFILE_DIR", None)
+
+    if profile_dir:
+        profile["path"] = sampler.save(profile_dir, f"rule-{rule_id}")
+
+    return Response({"execution_log": result, "profile": profile})
+
+
+def _query_flag(request, name):
+
+    # request.GET, so plain Django requests (async views) work as well
+    value = request.GET.get(name)
+
+    if value is None:
+        return None
+
+    return value.lower() in ("1", "true", "yes")
+
+
+# API 3a: Execute Rule (native async, for ASGI deployments)
+
+@csrf_exempt
+@require_POST
+async def execute_rule_async(request, rule_id):
+
+    try:
+        body = json.loads(request.body or b"{}")
+    except ValueError:
+        return JsonResponse({"error": "Invalid JSON body"}, status=400)
+
+    if not isinstance(body, dict):
+        return JsonResponse(
+            {"error": "request body must be an object"},
+            status=400
+        )
+
+    context = body.get("context") or {}
+
+    if not isinstance(context, dict):
+        return JsonResponse(
+            {"error": "context must be an object"},
+            status=400
+        )
+
+    try:
+        executor = AsyncGraphRuleExecutor(
+            rule_id,
+            mode=request.GET.get("mode"),
+            context=context,
+            streaming=_query_flag(request, "stream"),
+            trace=request.GET.get("trace"),
+            history=_query_flag(request, "history")
+        )
+    except ValueError as exc:
+        return JsonResponse({"error": str(exc)}, status=400)
+
+    try:
+        result = await executor.execute_async()
+    except (GraphCycleError, PlanModeError) as exc:
+        return JsonResponse({"error": str(exc)}, status=400)
+
+    return JsonResponse(result, safe=False, encoder=JSONEncoder)
+
+
+# API 3b: Execute Rule over many inputs
+
+@api_view(["POST"])
+def execute_rule_batch(request, rule_id):
+
+    if not isinstance(request.data, dict):
+        return Response(
+            {"error": "request body must be an object"},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    inputs = request.data.get("inputs")
+
+    if not isinstance(inputs, list) or not all(
+        isinstance(item, dict) for item in inputs
+    ):
+        return Response(
+            {"error": "inputs must be a list of objects"},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    options = {}
+
+    for name, option in (
+        ("workers", "max_workers"),
+        ("chunk_size", "chunk_size")
+    ):
+
+        value = request.data.get(name)
+
+        if value is None:
+            continue
+
+        if type(value) is not int or value < 1:
+            return Response(
+                {"error": f"{name} must be a positive integer"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        options[option] = value
+
+    try:
+        results = execute_batch(
+            rule_id,
+            inputs,
+            mode=request.query_params.get("mode"),
+            **options
+        )
+    except ValueError as exc:
+        return Response(
+            {"error": str(exc)},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    return Response({
+        "rule_engine_id": rule_id,
+        "count": len(results),
+        "results": results
+    })
+
+
+# API 3c: Execute Rule asynchronously (jobs)
+
+@api_view(["POST"])
+def submit_rule_job(request, rule_id):
+
+    if not isinstance(request.data, dict):
+        return Response(
+            {"error": "request body must be an object"},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    context = request.data.get("context") or {}
+
+    if not isinstance(context, dict):
+        return Response(
+            {"error": "context must be an object"},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    options = {
+        key: value
+        for key, value in {
+            "mode": request.query_params.get("mode"),
+            "trace": request.query_params.get("trace"),
+            "streaming": _query_flag(request, "stream"),
+            "incremental": _query_flag(request, "incremental"),
+            "profile_memory": _query_flag(request, "memory"),
+            "partitioned": _query_flag(request, "partition"),
+            "history": _query_flag(request, "history"),
+        }.items()
+        if value is not None
+    }
+
+    # Reject bad options now rather than in the worker
+    try:
+        RuleExecutor(rule_id, **options)
+    except ValueError as exc:
+        return Response(
+            {"error": str(exc)},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    if not RuleEngine.objects.filter(id=rule_id).exists():
+        return Response(
+            {"error": "Rule not found"},
+            status=status.HTTP_404_NOT_FOUND
+        )
+
+    job = submit_job(rule_id, context, options)
+
+    return Response(
+        RuleEngineJobSerializer(job).data,
+        status=status.HTTP_202_ACCEPTED
+    )
+
+
+@api_view(["GET"])
+def job_details(request, job_id):
+
+    # ?wait=<seconds> long-polls until the job finishes
+    try:
+        wait = float(request.query_params.get("wait", 0))
+    except ValueError:
+        wait = None
+
+    # nan / inf would slip past the min() below
+    if wait is None or not math.isfinite(wait) or wait < 0:
+        return Response(
+            {"error": "wait must be a number of seconds"},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    wait = min(wait, getattr(settings, "RULE_ENGINE_JOB_MAX_WAIT", 30))
+
+    try:
+        job = wait_for_job(job_id, wait)
+    except RuleEngineProcessed.DoesNotExist:
+        return Response(
+            {"error": "Job not found"},
+            status=status.HTTP_404_NOT_FOUND
+        )
+
+    return Response(RuleEngineJobSerializer(job).data)
+
+
+# API 3d: Node metrics (Prometheus text format)
+
+@require_GET
+def node_metrics(request):
+
+    return HttpResponse(
+        render_metrics(),
+        content_type="text/plain; version=0.0.4; charset=utf-8"
+    )
+
+
+# API 3e: Run history
+
+class RunPagination(PageNumberPagination):
+
+    page_size = 50
+    page_size_query_param = "page_size"
+    max_page_size = 500
 
-    result = executor.execute()
 
-    return Response(result)
+def _filter_runs(request, queryset, time_field, by_status=True):
+
+    # ?rule_id=, ?status= (unless by_status is False), ?since= / ?until=
+    # (ISO 8601)
+    rule_id = request.query_params.get("rule_id")
+
+    if rule_id:
+        if not rule_id.isdigit():
+            raise ValueError("rule_id must be an integer")
+        queryset = queryset.filter(rule_engine_id=int(rule_id))
+
+    run_status = request.query_params.get("status")
+
+    if run_status and by_status:
+        queryset = queryset.filter(status=run_status)
+
+    for name, lookup in (("since", "gte"), ("until", "lt")):
+
+        value = request.query_params.get(name)
+
+        if not value:
+            continue
+
+        try:
+            moment = parse_datetime(value) or datetime.combine(
+                parse_date(value), time.min
+            )
+        except (TypeError, ValueError):
+            raise ValueError(f"{name} must be an ISO 8601 date or datetime")
+
+        if time_field == "day":
+            moment = moment.date()
+        elif timezone.is_naive(moment):
+            moment = timezone.make_aware(moment)
+
+        queryset = queryset.filter(**{f"{time_field}__{lookup}": moment})
+
+    return queryset
+
+
+@api_view(["GET"])
+def list_runs(request):
+
+    try:
+        runs = _filter_runs(request, RuleRun.objects.all(), "started_at")
+    except ValueError as exc:
+        return Response(
+            {"error": str(exc)},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    paginator = RunPagination()
+
+    page = paginator.paginate_queryset(
+        runs.order_by("-started_at", "-id"),
+        request
+    )
+
+    return paginator.get_paginated_response(
+        RuleRunSerializer(page, many=True).data
+    )
+
+
+@api_view(["GET"])
+def run_details(request, run_id):
+
+    run = RuleRun.objects.prefetch_related("nodes").filter(id=run_id).first()
+
+    if run is None:
+        return Response(
+            {"error": "Run not found"},
+            status=status.HTTP_404_NOT_FOUND
+        )
+
+    return Response(RuleRunDetailSerializer(run).data)
+
+
+@api_view(["GET"])
+def list_daily_runs(request):
+
+    # Rollups of pruned runs; ?status= does not apply
+    try:
+        rollups = _filter_runs(
+            request, RuleRunDaily.objects.all(), "day", by_status=False
+        )
+    except ValueError as exc:
+        return Response(
+            {"error": str(exc)},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    paginator = RunPagination()
+
+    page = paginator.paginate_queryset(
+        rollups.order_by("-day", "rule_engine_id"),
+        request
+    )
+
+    return paginator.get_paginated_response(
+        RuleRunDailySerializer(page, many=True).data
+    )
 
 
 # API 4: List Rules
@@ -204,12 +711,16 @@ def list_rules(request):
 
 # API 5: Rule Details
 
-@api_view(["GET","DELETE"])
+@api_view(["GET","PUT","DELETE"])
 def rule_details(request, rule_id):
+    if request.method == "PUT":
+        return _update_rule(request, rule_id)
+
     if request.method == "DELETE":
         try:
             rule = RuleEngine.objects.get(id=rule_id)
             rule.delete()
+            invalidate_plan(rule_id)
             return Response(
                 {"message": "Rule deleted successfully"},
                 status=status.HTTP_200_OK
@@ -244,3 +755,49 @@ def rule_details(request, rule_id):
             "reactflow_json": reactflow_json,
             "steps": steps_serializer.data
         })
+
+
+def _update_rule(request, rule_id):
+
+    # Edits keep the rule id, so the rule's incremental state survives:
+    # nodes are matched by content fingerprint and only the changed ones
+    # and their dependents are recomputed by the next incremental run
+    rule_name = request.data.get("rule_name")
+    nodes = request.data.get("nodes")
+    edges = request.data.get("edges")
+
+    error, rule_logic_map = _validate_rule(rule_name, nodes, edges)
+
+    if error:
+        return error
+
+    with transaction.atomic():
+
+        rule = RuleEngine.objects.select_for_update().filter(
+            id=rule_id
+        ).first()
+
+        if rule is None:
+            return Response(
+                {"error": "Rule not found"},
+                status=status.HTTP_404_NOT_FOUND
+            )
+
+        rule.rule_name = rule_name
+        rule.reactflow_json = {"nodes": nodes, "edges": edges}
+        rule.save(update_fields=["rule_name", "reactflow_json"])
+
+        RuleEdge.objects.filter(rule_engine=rule).delete()
+        RuleList.objects.filter(rule_engine=rule).delete()
+
+        _write_rule_graph(rule, nodes, edges, rule_logic_map)
+
+    invalidate_plan(rule_id)
+
+    return Response(
+        {
+            "message": "Rule updated successfully",
+            "rule_engine_id": rule_id
+        },
+        status=status.HTTP_200_OK
+    )